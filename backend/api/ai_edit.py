@@ -1,7 +1,8 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from services.voice_to_text_service import generate_ai_edit
+from services.voice_to_text_service import generate_ai_edit, stream_ai_edit
 from dependencies import get_logger, get_genai_client
+from .sse import sse_response
 
 router = APIRouter()
 
@@ -22,3 +23,12 @@ async def edit_transcript(req: EditRequest, logger=Depends(get_logger), genai_cl
     except Exception as e:
         logger.error(f"AI edit failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/edit-transcript/stream")
+async def stream_edit_transcript(req: EditRequest, logger=Depends(get_logger), genai_client=Depends(get_genai_client)):
+    """Server-sent events: "delta" text chunks, then "done" with the full edited transcript."""
+    logger.info("/edit-transcript/stream called")
+    if not req.transcript or not req.transcript.strip():
+        raise HTTPException(status_code=400, detail="Empty transcript")
+    return sse_response(stream_ai_edit(req.transcript, genai_client=genai_client))
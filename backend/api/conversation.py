@@ -1,8 +1,10 @@
 # conversation.py
-from fastapi import APIRouter, File, UploadFile, Depends
+from fastapi import APIRouter, File, UploadFile, Depends, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from services.voice_to_text_service import process_conversation_audio
-from dependencies import get_logger, get_genai_client
+from services.uploads import save_upload, temp_upload_path, UploadTooLarge
+from services.job_queue import QueueFull, TERMINAL_STATUSES, public_view
+from dependencies import get_logger, get_genai_client, get_job_queue, get_recordings_index
 import os
 
 router = APIRouter()
@@ -12,18 +14,32 @@ async def analyze_conversation(
     audio: UploadFile = File(...),
     logger=Depends(get_logger),
     genai_client=Depends(get_genai_client),
+    recordings=Depends(get_recordings_index),
 ):
-    temp_path = f"temp_conversation_{audio.filename}"
+    temp_path = temp_upload_path("temp_conversation", audio.filename)
     try:
-        with open(temp_path, "wb") as f:
-            f.write(await audio.read())
-        result = await process_conversation_audio(temp_path, genai_client=genai_client)
+        saved = await save_upload(audio, temp_path)
+        logger.info(f"Conversation upload saved: {saved.size} bytes, duration={saved.duration_seconds}s")
+        result = await process_conversation_audio(
+            temp_path, genai_client=genai_client, audio_sha256=saved.sha256
+        )
         os.remove(temp_path)
+        await recordings.set_transcript_status(saved.sha256, "failed" if "error" in result else "done")
         if "error" in result:
             return JSONResponse(result, status_code=500)
 
         result["success"] = True
         return JSONResponse(result)
+    except UploadTooLarge as e:
+        logger.warning(f"analyze_conversation rejected upload: {e}")
+        return JSONResponse({
+            "success": False,
+            "error": str(e),
+            "transcript": "",
+            "doctor_transcript": "",
+            "patient_transcript": "",
+            "full_conversation": []
+        }, status_code=413)
     except Exception as e:
         if os.path.exists(temp_path):
             os.remove(temp_path)
@@ -37,3 +53,73 @@ async def analyze_conversation(
             "full_conversation": []
         }, status_code=500)
 
+
+@router.post("/analyze-conversation/jobs/", status_code=202)
+async def submit_analysis_job(
+    audio: UploadFile = File(...),
+    logger=Depends(get_logger),
+    jobs=Depends(get_job_queue),
+):
+    """Queue a recording for background analysis and return its job id.
+
+    Poll `/jobs/{job_id}` or subscribe on `/jobs/{job_id}/ws` for progress
+    (queued, transcribing, diarizing, done/failed) and the final result.
+    """
+    audio_path = jobs.new_audio_path(audio.filename)
+    try:
+        saved = await save_upload(audio, audio_path)
+        job = await jobs.submit(audio_path, audio_sha256=saved.sha256, filename=audio.filename)
+    except UploadTooLarge as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=413)
+    except QueueFull as e:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        logger.warning(f"submit_analysis_job rejected: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=503, headers={"Retry-After": "30"})
+    except Exception as e:
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        logger.error(f"submit_analysis_job failed: {e}")
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+    job_id = job["id"]
+    return JSONResponse({
+        "success": True,
+        **public_view(job),
+        "status_url": f"/api/v1/conversation/jobs/{job_id}",
+        "ws_url": f"/api/v1/conversation/jobs/{job_id}/ws",
+    }, status_code=202)
+
+
+@router.get("/jobs/{job_id}")
+async def get_analysis_job(job_id: str, jobs=Depends(get_job_queue)):
+    job = await jobs.get(job_id)
+    if job is None:
+        return JSONResponse({"success": False, "error": "Job not found"}, status_code=404)
+    return JSONResponse({"success": True, **public_view(job)})
+
+
+@router.websocket("/jobs/{job_id}/ws")
+async def watch_analysis_job(websocket: WebSocket, job_id: str):
+    """Push job state on every progress change; closes once the job finishes."""
+    jobs = get_job_queue()
+    await websocket.accept()
+    events = jobs.subscribe(job_id)
+    try:
+        job = await jobs.get(job_id)
+        if job is None:
+            await websocket.send_json({"job_id": job_id, "error": "Job not found"})
+            return
+        state = public_view(job)
+        await websocket.send_json(state)
+        while state["status"] not in TERMINAL_STATUSES:
+            state = await jobs.next_state(job_id, events, state)
+            await websocket.send_json(state)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        jobs.unsubscribe(job_id, events)
+        try:
+            await websocket.close()
+        except Exception:
+            pass
@@ -0,0 +1,126 @@
+import asyncio
+import os
+from email.utils import formatdate
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+RANGE_CHUNK_SIZE = 256 * 1024
+
+# Recordings never change once written (a replaced file gets a new ETag), so
+# browsers may reuse them but must revalidate.
+FILE_CACHE_HEADERS = {"Accept-Ranges": "bytes", "Cache-Control": "private, max-age=0, must-revalidate"}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(st: os.stat_result, sha256: Optional[str] = None) -> str:
+    """Strong ETag from the content hash when known, else from size and mtime."""
+    if sha256:
+        return f'"{sha256}"'
+    return f'"{st.st_size:x}-{int(st.st_mtime_ns):x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Inclusive (start, end) for a single `bytes=` range, or None to send the whole file.
+
+    Multi-range requests and other units are answered with the full body,
+    which RFC 9110 allows.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # Suffix range: the last N bytes.
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+async def _read_range(path: str, start: int, length: int) -> AsyncIterator[bytes]:
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def ranged_file_response(
+    request: Request,
+    path: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    sha256: Optional[str] = None,
+) -> Response:
+    """Serve a file with ETag, conditional GET (304) and single byte-range (206) support.
+
+    File reads run off the event loop in fixed-size chunks, so seeking in a
+    player only transfers the requested span.
+    """
+    st = await asyncio.to_thread(os.stat, path)
+    size = st.st_size
+    etag = file_etag(st, sha256)
+    headers = {
+        **FILE_CACHE_HEADERS,
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+    }
+    if filename:
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # A stale If-Range validator means the client's partial copy is outdated.
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    if request.method == "HEAD":
+        return Response(status_code=200, headers={**headers, "Content-Length": str(size)}, media_type=media_type)
+    if byte_range is None:
+        return StreamingResponse(
+            _read_range(path, 0, size),
+            media_type=media_type,
+            headers={**headers, "Content-Length": str(size)},
+        )
+    start, end = byte_range
+    length = end - start + 1
+    return StreamingResponse(
+        _read_range(path, start, length),
+        status_code=206,
+        media_type=media_type,
+        headers={**headers, "Content-Length": str(length), "Content-Range": f"bytes {start}-{end}/{size}"},
+    )
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from .schemas import GenerateSOAPRequest
 from services.voice_to_text_service import generate_soap_note
 from services.logger import logger
+from api.voice_recording import download_recording
+from dependencies import get_genai_client
 
 router = APIRouter()
 
+# The old direct file URL goes through the download handler so it gets the
+# same byte ranges, ETag and conditional GET as /api/v1/voice-recording/download/.
+router.add_api_route(
+    "/recordings/{filename}", download_recording, methods=["GET", "HEAD"], include_in_schema=False
+)
+
 @router.post("/generate_soap", response_model=None)
-async def legacy_generate_soap(request: GenerateSOAPRequest):
+async def legacy_generate_soap(request: GenerateSOAPRequest, genai_client=Depends(get_genai_client)):
     """Legacy root-level endpoint for backward compatibility.
 
     This forwards to the same generator used by `/api/v1/summary/generate_soap`.
@@ -24,7 +32,7 @@ async def legacy_generate_soap(request: GenerateSOAPRequest):
             "transcript": combined_text,
             "timeline": jsonable_encoder(request.timeline or [])
         }
-        result = await generate_soap_note(data)
+        result = await generate_soap_note(data, genai_client=genai_client)
         logger.info("Legacy SOAP note generated successfully.")
         return JSONResponse(content=jsonable_encoder(result))
     except Exception as e:
@@ -0,0 +1,86 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse, Response
+
+from services import metrics
+from services.genai_limits import get_limiter
+from services.job_queue import get_job_queue
+from services.llm_cache import get_response_cache
+from services.llm_schemas import parse_stats
+from services.logger import queue_handler
+from services.prompts.registry import get_context_caches
+from services.stream_sessions import get_stream_registry
+from services.transcript_cache import get_transcript_cache
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _collect_caches():
+    help_text = "Cache lookups by cache and result"
+    response_cache = get_response_cache()
+    if response_cache is not None:
+        stats = response_cache.stats()
+        for result in ("hits", "misses", "coalesced"):
+            yield "cache_requests_total", "counter", help_text, {"cache": "llm_response", "result": result}, stats[result]
+    transcript_cache = get_transcript_cache()
+    if transcript_cache is not None:
+        stats = transcript_cache.stats()
+        for result in ("hits", "misses"):
+            yield "cache_requests_total", "counter", help_text, {"cache": "transcript", "result": result}, stats[result]
+    context_caches = get_context_caches()
+    if context_caches is not None:
+        stats = context_caches.stats()
+        yield "cache_requests_total", "counter", help_text, {"cache": "prompt_context", "result": "hits"}, stats["hits"]
+
+
+def _collect_jobs():
+    stats = get_job_queue().stats()
+    yield "jobs_queued", "gauge", "Analysis jobs waiting for a worker", {}, stats["queued"]
+    yield "jobs_running", "gauge", "Analysis jobs being processed", {}, stats["running"]
+
+
+def _collect_streams():
+    stats = get_stream_registry().stats()
+    yield "stream_sessions", "gauge", "Live streaming WebSocket sessions", {}, stats["active"]
+    yield "stream_outbox_messages", "gauge", "Messages queued for streaming clients", {}, stats["queued"]
+    for policy in ("merged", "dropped"):
+        yield "stream_partials_shed_total", "counter", "Partial transcripts merged or dropped under backpressure", {"action": policy}, stats[f"partials_{policy}"]
+    for reason, count in stats["closed"].items():
+        yield "stream_sessions_closed_total", "counter", "Streaming sessions closed by reason", {"reason": reason}, count
+    yield "stream_sessions_rejected_total", "counter", "Streaming sessions refused (duplicate id or worker full)", {}, stats["rejected"]
+
+
+def _collect_genai():
+    models = get_limiter().stats()["models"]
+    for name, state in models.items():
+        yield "genai_in_flight", "gauge", "Gemini calls in flight per model", {"model": name}, state["in_flight"]
+    for name, state in models.items():
+        yield "genai_retries_total", "counter", "Gemini calls retried after a quota or transient error", {"model": name}, state["retries"]
+    for name, state in models.items():
+        yield "genai_breaker_rejections_total", "counter", "Gemini calls rejected by an open circuit", {"model": name}, state["rejected"]
+
+
+def _collect_llm_json():
+    for kind, counts in parse_stats.snapshot().items():
+        for outcome in parse_stats.OUTCOMES:
+            yield "llm_json_parse_total", "counter", "Structured LLM responses by parse outcome", {"kind": kind, "outcome": outcome}, counts[outcome]
+
+
+def _collect_logging():
+    stats = queue_handler.stats()
+    yield "log_queue_records", "gauge", "Log records waiting for the writer thread", {}, stats["queued"]
+    for level, count in stats["dropped"].items():
+        yield "log_records_dropped_total", "counter", "Log records dropped because the log queue was full", {"level": level}, count
+
+
+for _collector in (_collect_caches, _collect_jobs, _collect_streams, _collect_genai, _collect_llm_json, _collect_logging):
+    metrics.registry.add_collector(_collector)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint."""
+    if not metrics.METRICS_ENABLED:
+        return Response(status_code=404)
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, ConfigDict, model_validator
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Literal
 
 class GenerateSummaryRequest(BaseModel):
     doctor_conversation: str
@@ -17,6 +17,10 @@ class GenerateSOAPRequest(BaseModel):
     full_transcript: str
     timeline: Optional[List[TimelineItem]] = None
 
+class BatchGenerateRequest(BaseModel):
+    task: Literal["soap", "summary"] = "soap"
+    items: List[GenerateSOAPRequest]
+
 class SummaryResponse(BaseModel):
      model_config = ConfigDict(extra='forbid')
      summary: Optional[str] = None
@@ -0,0 +1,28 @@
+import json
+from typing import AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+from services.logger import logger
+
+# Disable proxy buffering so each event reaches the browser as soon as it is written.
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_event(event: dict) -> str:
+    """Encode an event dict as one SSE message named after its "type"."""
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def _encode(events: AsyncIterator[dict]) -> AsyncIterator[str]:
+    try:
+        async for event in events:
+            yield format_event(event)
+    except Exception as e:
+        logger.error(f"SSE stream failed: {e}")
+        yield format_event({"type": "error", "error": str(e)})
+
+
+def sse_response(events: AsyncIterator[dict]) -> StreamingResponse:
+    """Stream service events to the client as `text/event-stream`."""
+    return StreamingResponse(_encode(events), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -0,0 +1,41 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.llm_cache import get_response_cache
+from services.transcript_cache import get_transcript_cache
+from services.job_queue import get_job_queue
+from services.llm_schemas import parse_stats
+from services.prompts.registry import get_context_caches
+from services.genai_limits import get_limiter
+
+router = APIRouter()
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Hit/miss/coalesced counters for the LLM response, transcript and prompt context caches."""
+    response_cache = get_response_cache()
+    transcript_cache = get_transcript_cache()
+    context_caches = get_context_caches()
+    return JSONResponse({
+        "llm_response_cache": response_cache.stats() if response_cache else {"enabled": False},
+        "transcript_cache": transcript_cache.stats() if transcript_cache else {"enabled": False},
+        "prompt_context_cache": context_caches.stats() if context_caches else {"enabled": False},
+    })
+
+
+@router.get("/jobs")
+async def job_stats():
+    """Queue depth and worker utilisation of the background analysis queue."""
+    return JSONResponse(get_job_queue().stats())
+
+
+@router.get("/llm-json")
+async def llm_json_stats():
+    """How structured LLM responses were recovered: clean, repaired locally, or retried."""
+    return JSONResponse(parse_stats.snapshot())
+
+
+@router.get("/genai")
+async def genai_stats():
+    """Rate limiter, retry and circuit-breaker state per Gemini model."""
+    return JSONResponse(get_limiter().stats())
@@ -1,45 +1,123 @@
 from fastapi import APIRouter, WebSocket
-from typing import List
+from fastapi.responses import JSONResponse
 import asyncio
-from services.streaming_service import process_streaming_audio
+import json
+import time
+import uuid
+from services.streaming_service import StreamingSession, get_stt_backend, STREAM_SAMPLE_RATE
+from services.stream_sessions import CLOSE_TRY_AGAIN_LATER, SessionRejected, StreamConnection, get_stream_registry
+from services.shared_state import WORKER_ID, get_session_router
 from services.logger import logger
 
 router = APIRouter()
 
-class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+# Text frames that tell the server the client has finished sending audio.
+END_OF_STREAM_MESSAGES = {"end", "stop", "eos"}
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
 
-    def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+@router.get("/sessions/")
+async def stream_stats():
+    """Live stream count, backpressure counters and close reasons for this worker."""
+    return JSONResponse(get_stream_registry().stats())
 
-    async def send_transcription(self, message: str, websocket: WebSocket):
-        await websocket.send_text(message)
 
-manager = ConnectionManager()
+@router.get("/sessions/{session_id}")
+async def session_info(session_id: str):
+    """Stats of a live stream, or which worker process holds it (multi-worker deployments)."""
+    conn = get_stream_registry().get(session_id)
+    if conn is not None:
+        return JSONResponse({**conn.stats(), "worker": WORKER_ID})
+    owner = await get_session_router().lookup(session_id)
+    if owner is None:
+        return JSONResponse({"session_id": session_id, "error": "Session not found"}, status_code=404)
+    return JSONResponse({"session_id": session_id, "worker": owner})
+
+
+def _is_end_of_stream(text: str) -> bool:
+    text = text.strip()
+    if text.lower() in END_OF_STREAM_MESSAGES:
+        return True
+    try:
+        payload = json.loads(text)
+    except ValueError:
+        return False
+    return isinstance(payload, dict) and str(payload.get("event", "")).lower() in END_OF_STREAM_MESSAGES
+
 
 @router.websocket("/ws/stream-audio/")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    """Stream float32 PCM in, receive JSON partial/final transcripts out.
+
+    Reception only buffers audio; transcription runs concurrently in the
+    session, so a slow segment never stalls reading the next chunk. Send a
+    text frame "end" (or {"event": "end"}) to flush the last segment and get
+    its final result before the server closes the socket. Pass `session_id`
+    to name the stream; its owning worker is recorded for routing.
+
+    Results go through the connection's bounded outbox (see
+    `services.stream_sessions`): under backpressure partials are merged or
+    dropped, a client too slow for finals is closed with 1013, a quiet
+    connection gets heartbeat messages and an idle stream is closed.
+    """
+    await websocket.accept()
+    session_id = websocket.query_params.get("session_id") or uuid.uuid4().hex
+    registry = get_stream_registry()
+    conn = StreamConnection(session_id, websocket)
+    try:
+        registry.register(conn)
+    except SessionRejected as e:
+        logger.warning(f"[STREAM] Rejected stream: {e}")
+        try:
+            await websocket.send_text(json.dumps({"type": "error", "error": str(e)}))
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        except Exception:
+            pass
+        return
+    sessions = get_session_router()
+    await sessions.register(session_id)
+    registered_at = time.monotonic()
     try:
-        while True:
-            # Receive audio chunk
-            audio_data = await websocket.receive_bytes()
-            
-            # Process the audio chunk using Gemini STT
-            transcription = await process_streaming_audio(audio_data)
-            
-            # Send the transcription back to the client
-            if transcription:
-                await manager.send_transcription(transcription, websocket)
-            else:
-                await manager.send_transcription("[No transcription available]", websocket)
-                
+        sample_rate = int(websocket.query_params.get("sample_rate", STREAM_SAMPLE_RATE))
+    except ValueError:
+        sample_rate = STREAM_SAMPLE_RATE
+    session = StreamingSession(get_stt_backend(), sample_rate=sample_rate, messages=conn.outbox)
+    conn.start()
+    reason = "end"
+    try:
+        while not conn.writer_done:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), conn.idle_timeout_s or None)
+            except asyncio.TimeoutError:
+                reason = "idle"
+                break
+            if message["type"] == "websocket.disconnect":
+                reason = "client"
+                break
+            conn.touch(len(message.get("bytes") or b""))
+            if time.monotonic() - registered_at > sessions.ttl_s / 2:
+                await sessions.register(session_id)
+                registered_at = time.monotonic()
+            if message.get("bytes"):
+                session.feed(message["bytes"])
+            elif message.get("text") and _is_end_of_stream(message["text"]):
+                break
+
     except Exception as e:
+        reason = "error"
         logger.error(f"WebSocket error: {str(e)}")
     finally:
-        manager.disconnect(websocket)
+        # A client closed for being too slow gets no more results either.
+        client_gone = reason in ("client", "error") or conn.close_reason is not None
+        if client_gone:
+            await session.abort()
+        else:
+            await session.close()
+        await conn.finish(abort=client_gone)
+        if not client_gone and conn.close_reason is None:
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+        registry.unregister(conn, reason)
+        await sessions.unregister(session_id)
+        logger.info(f"Stream {session_id} finished ({conn.close_reason or reason}): {session.stats} {conn.stats()}")
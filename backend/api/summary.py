@@ -1,10 +1,19 @@
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from fastapi import HTTPException
-from .schemas import GenerateSummaryRequest, GenerateSOAPRequest
-from services.voice_to_text_service import generate_conversation_summary, generate_soap_note
-from dependencies import get_logger, get_genai_client, get_settings
+from .schemas import GenerateSummaryRequest, GenerateSOAPRequest, BatchGenerateRequest
+from services.voice_to_text_service import (
+    generate_conversation_summary,
+    generate_soap_note,
+    stream_conversation_summary,
+    stream_soap_note,
+)
+from services.batch import BATCH_MAX_ITEMS
+from dependencies import get_logger, get_genai_client, get_settings, get_batch_backend
+import json
+import time
+from .sse import sse_response
 
 router = APIRouter()
 
@@ -12,6 +21,27 @@ def _get_model_from_settings(settings: dict) -> str | None:
     # Return configured model name or None if not set. Do not provide a hardcoded default.
     return settings.get("GEMINI_LLM_MODEL")
 
+def _summary_data(request: GenerateSummaryRequest) -> dict:
+    combined_text = f"""
+        Doctor Conversation: {request.doctor_conversation}
+
+        Patient Conversation: {request.patient_conversation}
+
+        Full Transcript: {request.full_transcript}
+        """
+    return {"transcript": combined_text}
+
+def _soap_data(request: GenerateSOAPRequest) -> dict:
+    combined_text = (
+        f"Doctor: {request.doctor_conversation}\n"
+        f"Patient: {request.patient_conversation}\n"
+        f"Full Transcript: {request.full_transcript}"
+    )
+    return {
+        "transcript": combined_text,
+        "timeline": jsonable_encoder(request.timeline or [])
+    }
+
 @router.post("/generate_summary", response_model=None)
 async def generate_summary_endpoint(
     request: GenerateSummaryRequest,
@@ -21,14 +51,7 @@ async def generate_summary_endpoint(
 ):
     logger.info("Endpoint '/generate_summary' hit: Generating summary.")
     try:
-        combined_text = f"""
-        Doctor Conversation: {request.doctor_conversation}
-
-        Patient Conversation: {request.patient_conversation}
-
-        Full Transcript: {request.full_transcript}
-        """
-        summary_data = {"transcript": combined_text}
+        summary_data = _summary_data(request)
         result = await generate_conversation_summary(summary_data, genai_client=genai_client, model=_get_model_from_settings(settings))
         logger.info("Summary generated successfully.")
         return JSONResponse(result)
@@ -45,21 +68,77 @@ async def generate_soap_endpoint(
 ):
     logger.info("Endpoint '/generate_soap' hit: Generating SOAP note.")
     try:
-        combined_text = (
-            f"Doctor: {request.doctor_conversation}\n"
-            f"Patient: {request.patient_conversation}\n"
-            f"Full Transcript: {request.full_transcript}"
-        )
-        data = {
-            "transcript": combined_text,
-            "timeline": jsonable_encoder(request.timeline or [])
-        }
+        data = _soap_data(request)
         result = await generate_soap_note(data, genai_client=genai_client, model=_get_model_from_settings(settings))
         logger.info("SOAP note generated successfully.")
         return JSONResponse(content=jsonable_encoder(result))
     except Exception as e:
         logger.error(f"Error generating SOAP note: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to generate SOAP note")
+
+@router.post("/generate_batch", response_model=None)
+async def generate_batch_endpoint(
+    request: BatchGenerateRequest,
+    logger=Depends(get_logger),
+    genai_client=Depends(get_genai_client),
+    settings: dict = Depends(get_settings),
+    backend=Depends(get_batch_backend),
+):
+    """Generate SOAP notes or summaries for many visits in one call.
+
+    Streams NDJSON: one `{"index", "result"}` line per item as it finishes
+    (completion order), then a final `{"done": true, ...}` line.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="No items provided")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    logger.info(f"Endpoint '/generate_batch' hit: {len(request.items)} {request.task} item(s) via {backend.name} backend.")
+    build = _soap_data if request.task == "soap" else _summary_data
+    items = [build(item) for item in request.items]
+
+    async def lines():
+        started = time.monotonic()
+        failed = 0
+        async for index, result in backend.run(
+            request.task, items, genai_client=genai_client, model=_get_model_from_settings(settings)
+        ):
+            failed += 1 if result.get("error") else 0
+            yield json.dumps({"index": index, "result": jsonable_encoder(result)}) + "\n"
+        yield json.dumps({
+            "done": True,
+            "count": len(items),
+            "failed": failed,
+            "elapsed_s": round(time.monotonic() - started, 3),
+        }) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.post("/generate_summary/stream", response_model=None)
+async def stream_summary_endpoint(
+    request: GenerateSummaryRequest,
+    logger=Depends(get_logger),
+    genai_client=Depends(get_genai_client),
+    settings: dict = Depends(get_settings),
+):
+    """Server-sent events: "delta" text chunks, then "done" with the full summary."""
+    logger.info("Endpoint '/generate_summary/stream' hit: Streaming summary.")
+    return sse_response(stream_conversation_summary(
+        _summary_data(request), genai_client=genai_client, model=_get_model_from_settings(settings)
+    ))
+
+@router.post("/generate_soap/stream", response_model=None)
+async def stream_soap_endpoint(
+    request: GenerateSOAPRequest,
+    logger=Depends(get_logger),
+    genai_client=Depends(get_genai_client),
+    settings: dict = Depends(get_settings),
+):
+    """Server-sent events: one "section" per completed SOAP field, then "done" with JSON and HTML."""
+    logger.info("Endpoint '/generate_soap/stream' hit: Streaming SOAP note.")
+    return sse_response(stream_soap_note(
+        _soap_data(request), genai_client=genai_client, model=_get_model_from_settings(settings)
+    ))
     
 
 # from fastapi import APIRouter, HTTPException
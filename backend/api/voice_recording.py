@@ -1,21 +1,43 @@
 # voice_recording.py
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse
 import os
 import uuid
 from datetime import datetime
+from typing import Optional
 
-from services.voice_to_text_service import process_conversation_audio
 from services.logger import logger
-import os
+from services.uploads import save_upload, UploadTooLarge
+from services.recordings_catalog import RECORDINGS_DIR, SORT_COLUMNS, TRANSCRIPT_STATUSES, InvalidCursor
+from services.recording_formats import FORMATS, UnsupportedFormat, media_type_for
+from api.file_ranges import ranged_file_response
+from dependencies import get_recordings_index, get_recording_encoder
 router = APIRouter() 
 
 # Ensure recordings directory exists
-RECORDINGS_DIR = "recordings"
 os.makedirs(RECORDINGS_DIR, exist_ok=True)
 
+
+def _recording_view(recording: dict) -> dict:
+    filename = recording["filename"]
+    return {
+        "filename": filename,
+        "file_size": recording["size"],
+        "file_size_mb": round(recording["size"] / (1024 * 1024), 2),
+        "duration_seconds": recording["duration_s"],
+        "sha256": recording["sha256"],
+        "transcript_status": recording["transcript_status"],
+        "created_at": recording["created_at"],
+        "creation_date": datetime.fromtimestamp(recording["created_at"]).strftime("%Y-%m-%d %H:%M:%S"),
+        "download_url": f"/api/v1/voice-recording/download/{filename}"
+    }
+
 @router.post("/record/")
-async def record_voice(audio: UploadFile = File(...)):
+async def record_voice(
+    audio: UploadFile = File(...),
+    recordings=Depends(get_recordings_index),
+    encoder=Depends(get_recording_encoder),
+):
     logger.info("Endpoint '/record/' hit: Saving uploaded audio file.")
     try:
         # Generate unique filename
@@ -23,12 +45,12 @@ async def record_voice(audio: UploadFile = File(...)):
         unique_id = str(uuid.uuid4())[:8]
         filename = f"recording_{timestamp}_{unique_id}.wav"
         file_path = os.path.join(RECORDINGS_DIR, filename)
-        # Save the uploaded file
-        with open(file_path, "wb") as f:
-            content = await audio.read()
-            f.write(content)
+        # Stream the uploaded file to disk
+        saved = await save_upload(audio, file_path)
+        await recordings.add(filename, sha256=saved.sha256, duration_s=saved.duration_seconds)
+        encoder.schedule_ingest(filename)
         # Get file info
-        file_size = os.path.getsize(file_path)
+        file_size = saved.size
         file_size_mb = round(file_size / (1024 * 1024), 2)
         logger.info(f"Recording saved successfully: {filename}, Size: {file_size_mb} MB")
         return JSONResponse({
@@ -38,9 +60,18 @@ async def record_voice(audio: UploadFile = File(...)):
             "file_path": file_path,
             "file_size": file_size,
             "file_size_mb": file_size_mb,
+            "sha256": saved.sha256,
+            "duration_seconds": saved.duration_seconds,
             "timestamp": timestamp,
             "download_url": f"/api/v1/voice-recording/download/{filename}"
         })
+    except UploadTooLarge as e:
+        logger.warning(f"Rejected recording upload: {e}")
+        return JSONResponse({
+            "success": False,
+            "error": str(e),
+            "message": "Recording too large"
+        }, status_code=413)
     except Exception as e:
         logger.error(f"Failed to save recording: {str(e)}")
         return JSONResponse({
@@ -49,48 +80,111 @@ async def record_voice(audio: UploadFile = File(...)):
             "message": "Failed to save recording"
         }, status_code=500)
 
-@router.get("/download/{filename}")
-async def download_recording(filename: str):
+@router.api_route("/download/{filename}", methods=["GET", "HEAD"])
+async def download_recording(
+    filename: str,
+    request: Request,
+    format: Optional[str] = None,
+    recordings=Depends(get_recordings_index),
+    encoder=Depends(get_recording_encoder),
+):
+    """Download a recording, optionally re-encoded (`?format=opus` or `flac`).
+
+    Supports byte ranges, ETag and conditional GET so player seeks only fetch
+    the requested span.
+    """
     logger.info(f"Endpoint '/download/{filename}' hit: Attempting to download recording.")
     file_path = os.path.join(RECORDINGS_DIR, filename)
     
     if not os.path.exists(file_path):
         raise HTTPException(status_code=404, detail="Recording not found")
-    return FileResponse(
-        path=file_path,
+    if format and format != "wav":
+        if format not in FORMATS:
+            raise HTTPException(status_code=400, detail=f"format must be one of: wav, {', '.join(FORMATS)}")
+        try:
+            encoded_path = await encoder.resolve(filename, format)
+        except UnsupportedFormat as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Failed to encode {filename} as {format}: {e}")
+            raise HTTPException(status_code=500, detail=f"Could not encode recording as {format}")
+        return await ranged_file_response(
+            request,
+            encoded_path,
+            media_type=FORMATS[format][1],
+            filename=os.path.basename(encoded_path),
+        )
+    recording = await recordings.get(filename)
+    return await ranged_file_response(
+        request,
+        file_path,
+        media_type=media_type_for(filename),
         filename=filename,
-        media_type='audio/wav'
+        sha256=recording["sha256"] if recording else None,
     )
 
 @router.get("/list/")
-async def list_recordings():
-    logger.info("Endpoint '/list/' hit: Listing all recordings.")
+async def list_recordings(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    transcript_status: Optional[str] = None,
+    created_after: Optional[float] = None,
+    created_before: Optional[float] = None,
+    min_duration: Optional[float] = None,
+    max_duration: Optional[float] = None,
+    prefix: Optional[str] = None,
+    recordings=Depends(get_recordings_index),
+):
+    """One page of recordings from the catalog, newest first by default.
+
+    Pass `next_cursor` from the response as `cursor` to fetch the next page
+    with the same sort and filters. `created_after`/`created_before` are Unix
+    timestamps; durations are in seconds.
+    """
+    logger.info("Endpoint '/list/' hit: Listing recordings from catalog.")
+    if sort not in SORT_COLUMNS:
+        return JSONResponse({
+            "success": False,
+            "error": f"sort must be one of: {', '.join(SORT_COLUMNS)}",
+            "recordings": [],
+            "total_count": 0
+        }, status_code=400)
+    if transcript_status is not None and transcript_status not in TRANSCRIPT_STATUSES:
+        return JSONResponse({
+            "success": False,
+            "error": f"transcript_status must be one of: {', '.join(TRANSCRIPT_STATUSES)}",
+            "recordings": [],
+            "total_count": 0
+        }, status_code=400)
     try:
-        recordings = []
-        if os.path.exists(RECORDINGS_DIR):
-            for filename in os.listdir(RECORDINGS_DIR):
-                if filename.endswith(('.wav', '.mp3', '.m4a', '.webm')):
-                    file_path = os.path.join(RECORDINGS_DIR, filename)
-                    file_size = os.path.getsize(file_path)
-                    file_size_mb = round(file_size / (1024 * 1024), 2)
-                    # Get file creation time
-                    creation_time = os.path.getctime(file_path)
-                    creation_date = datetime.fromtimestamp(creation_time).strftime("%Y-%m-%d %H:%M:%S")
-                    recordings.append({
-                        "filename": filename,
-                        "file_size": file_size,
-                        "file_size_mb": file_size_mb,
-                        "creation_date": creation_date,
-                        "download_url": f"/api/v1/voice-recording/download/{filename}"
-                    })
-        # Sort by creation date (newest first)
-        recordings.sort(key=lambda x: x['creation_date'], reverse=True)
-        logger.info(f"Total recordings found: {len(recordings)}")
+        rows, total, next_cursor = await recordings.page(
+            limit=limit,
+            cursor=cursor,
+            sort=sort,
+            descending=order == "desc",
+            transcript_status=transcript_status,
+            created_after=created_after,
+            created_before=created_before,
+            min_duration_s=min_duration,
+            max_duration_s=max_duration,
+            prefix=prefix,
+        )
+        logger.info(f"Returning {len(rows)} of {total} recordings")
         return JSONResponse({
             "success": True,
-            "recordings": recordings,
-            "total_count": len(recordings)
+            "recordings": [_recording_view(row) for row in rows],
+            "total_count": total,
+            "next_cursor": next_cursor
         })
+    except InvalidCursor as e:
+        return JSONResponse({
+            "success": False,
+            "error": str(e),
+            "recordings": [],
+            "total_count": 0
+        }, status_code=400)
     except Exception as e:
         logger.error(f"Failed to list recordings: {str(e)}")
         return JSONResponse({
@@ -101,7 +195,11 @@ async def list_recordings():
         }, status_code=500)
 
 @router.delete("/delete/{filename}")
-async def delete_recording(filename: str):
+async def delete_recording(
+    filename: str,
+    recordings=Depends(get_recordings_index),
+    encoder=Depends(get_recording_encoder),
+):
     logger.info(f"Endpoint '/delete/{filename}' hit: Attempting to delete recording.")
     try:
         file_path = os.path.join(RECORDINGS_DIR, filename)
@@ -109,6 +207,8 @@ async def delete_recording(filename: str):
         if not os.path.exists(file_path):
             raise HTTPException(status_code=404, detail="Recording not found")
         os.remove(file_path)
+        await recordings.remove(filename)
+        await encoder.remove(filename)
         logger.info(f"Recording {filename} deleted successfully.")
         return JSONResponse({
             "success": True,
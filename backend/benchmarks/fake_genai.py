@@ -0,0 +1,285 @@
+"""Local stand-in for `google.genai.Client` used by the load benchmark.
+
+Implements the slice of the SDK the services call (`models.generate_content`,
+`models.generate_content_stream`, `files`, `caches`) on both the sync and the
+`aio` surface. Each call sleeps for a configurable latency, fails with a
+retryable 503 at a configurable rate, and returns a response shaped like the
+real one: a transcript for audio input, schema-valid JSON for SOAP and
+speaker analysis, plain text otherwise, with `usage_metadata` token counts.
+
+Install it for a process with `genai_client.get_registry().install(fake)`,
+and for request handlers with
+`app.dependency_overrides[dependencies.get_genai_client] = lambda: fake`.
+"""
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Optional
+
+WORDS = (
+    "patient reports mild headache since yesterday doctor asks about fever and nausea "
+    "blood pressure looks normal continue current medication and follow up next week"
+).split()
+
+
+class FakeAPIError(Exception):
+    """Shaped like `google.genai.errors.APIError` so the retry layer treats it the same."""
+
+    def __init__(self, code: int = 503, message: str = "fake upstream unavailable"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+        self.message = message
+
+
+@dataclass
+class FakeGenAIConfig:
+    latency_s: float = 0.2
+    jitter_s: float = 0.05
+    error_rate: float = 0.0
+    error_code: int = 503
+    transcript_chars: int = 1500
+    text_chars: int = 600
+    stream_chunks: int = 8
+    seed: Optional[int] = None
+
+
+@dataclass
+class FakeGenAIStats:
+    calls: int = 0
+    errors: int = 0
+    by_kind: dict = field(default_factory=dict)
+
+
+def _text(rng: random.Random, chars: int) -> str:
+    out, size = [], 0
+    while size < chars:
+        word = rng.choice(WORDS)
+        out.append(word)
+        size += len(word) + 1
+    return " ".join(out)
+
+
+def _schema_name(config) -> Optional[str]:
+    if config is None:
+        return None
+    schema = config.get("response_schema") if isinstance(config, dict) else getattr(config, "response_schema", None)
+    return getattr(schema, "__name__", None) if schema is not None else None
+
+
+def _prompt_text(contents) -> str:
+    items = contents if isinstance(contents, (list, tuple)) else [contents]
+    return " ".join(item for item in items if isinstance(item, str))
+
+
+def _has_audio(contents) -> bool:
+    items = contents if isinstance(contents, (list, tuple)) else [contents]
+    return any(not isinstance(item, str) for item in items)
+
+
+class _Response(SimpleNamespace):
+    pass
+
+
+class FakeGenAI:
+    """Shared state and response generation behind the sync and async surfaces."""
+
+    def __init__(self, config: Optional[FakeGenAIConfig] = None):
+        self.config = config or FakeGenAIConfig()
+        self.stats = FakeGenAIStats()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-self.config.jitter_s, self.config.jitter_s)
+        return max(0.0, self.config.latency_s + jitter)
+
+    def _maybe_fail(self) -> None:
+        with self._lock:
+            self.stats.calls += 1
+            failed = self._rng.random() < self.config.error_rate
+            if failed:
+                self.stats.errors += 1
+        if failed:
+            raise FakeAPIError(self.config.error_code)
+
+    def _kind(self, contents, config) -> str:
+        schema = _schema_name(config)
+        prompt = _prompt_text(contents)
+        if schema == "SpeakerAnalysis" or "doctor_parts" in prompt or "conversation separator" in prompt:
+            return "speakers"
+        if schema == "SOAPNote" or "SOAP" in prompt:
+            return "soap"
+        if _has_audio(contents):
+            return "transcript"
+        return "text"
+
+    def response_text(self, contents, config) -> tuple[str, str]:
+        kind = self._kind(contents, config)
+        with self._lock:
+            self.stats.by_kind[kind] = self.stats.by_kind.get(kind, 0) + 1
+            rng = random.Random(self._rng.random())
+        if kind == "transcript":
+            return kind, _text(rng, self.config.transcript_chars)
+        if kind == "speakers":
+            turns = [
+                {"speaker": "doctor" if i % 2 == 0 else "patient", "text": _text(rng, 80), "timestamp": f"00:{i * 5:02d}"}
+                for i in range(max(2, self.config.text_chars // 100))
+            ]
+            return kind, json.dumps({
+                "doctor_parts": " ".join(t["text"] for t in turns if t["speaker"] == "doctor"),
+                "patient_parts": " ".join(t["text"] for t in turns if t["speaker"] == "patient"),
+                "timeline": turns,
+                "confidence": 0.9,
+            })
+        if kind == "soap":
+            return kind, json.dumps({
+                "patient_name": "Test Patient",
+                "date": "2026-01-01",
+                "age_gender": "40 / F",
+                "reason_for_visit": _text(rng, 40),
+                "subjective": [_text(rng, 60) for _ in range(3)],
+                "objective": {
+                    "vitals": {"Temp": "98.6", "BP": "120/80", "HR": "72", "RR": "14", "SpO2": "98%"},
+                    "exam_findings": [_text(rng, 50)],
+                    "labs_imaging": [],
+                },
+                "assessment": [_text(rng, 60)],
+                "plan": [_text(rng, 60) for _ in range(2)],
+            })
+        return kind, _text(rng, self.config.text_chars)
+
+    def make_response(self, contents, text: str) -> _Response:
+        usage = SimpleNamespace(
+            prompt_token_count=max(1, len(_prompt_text(contents)) // 4),
+            candidates_token_count=max(1, len(text) // 4),
+        )
+        return _Response(text=text, usage_metadata=usage)
+
+    def chunks(self, contents, text: str) -> list[_Response]:
+        n = max(1, self.config.stream_chunks)
+        step = max(1, -(-len(text) // n))
+        parts = [text[i : i + step] for i in range(0, len(text), step)] or [""]
+        responses = [_Response(text=part, usage_metadata=None) for part in parts]
+        responses[-1] = self.make_response(contents, parts[-1])
+        # Final chunk carries usage for the whole stream.
+        responses[-1].usage_metadata.candidates_token_count = max(1, len(text) // 4)
+        return responses
+
+    def next_name(self, prefix: str) -> str:
+        return f"{prefix}/fake-{next(self._ids)}"
+
+
+class _SyncModels:
+    def __init__(self, fake: FakeGenAI):
+        self._fake = fake
+
+    def generate_content(self, model, contents, config=None):
+        time.sleep(self._fake._delay())
+        self._fake._maybe_fail()
+        _, text = self._fake.response_text(contents, config)
+        return self._fake.make_response(contents, text)
+
+    def generate_content_stream(self, model, contents, config=None):
+        self._fake._maybe_fail()
+        _, text = self._fake.response_text(contents, config)
+        chunks = self._fake.chunks(contents, text)
+        delay = self._fake._delay() / len(chunks)
+        for chunk in chunks:
+            time.sleep(delay)
+            yield chunk
+
+
+class _AsyncModels:
+    def __init__(self, fake: FakeGenAI):
+        self._fake = fake
+
+    async def generate_content(self, model, contents, config=None):
+        await asyncio.sleep(self._fake._delay())
+        self._fake._maybe_fail()
+        _, text = self._fake.response_text(contents, config)
+        return self._fake.make_response(contents, text)
+
+    async def generate_content_stream(self, model, contents, config=None):
+        self._fake._maybe_fail()
+        _, text = self._fake.response_text(contents, config)
+        chunks = self._fake.chunks(contents, text)
+        delay = self._fake._delay() / len(chunks)
+
+        async def iterate():
+            for chunk in chunks:
+                await asyncio.sleep(delay)
+                yield chunk
+        return iterate()
+
+
+class _SyncNamed:
+    """`files` / `caches`: create-like calls return an object with a name, deletes are no-ops."""
+
+    def __init__(self, fake: FakeGenAI, prefix: str):
+        self._fake = fake
+        self._prefix = prefix
+
+    def _created(self, **kwargs):
+        self._fake._maybe_fail()
+        name = self._fake.next_name(self._prefix)
+        config = kwargs.get("config")
+        mime_type = config.get("mime_type") if isinstance(config, dict) else getattr(config, "mime_type", None)
+        return SimpleNamespace(name=name, uri=f"https://fake.invalid/{name}", mime_type=mime_type)
+
+    def upload(self, file, config=None):
+        return self._created(config=config)
+
+    def create(self, model=None, config=None):
+        return self._created(config=config)
+
+    def update(self, name, config=None):
+        return SimpleNamespace(name=name)
+
+    def delete(self, name):
+        return None
+
+
+class _AsyncNamed:
+    def __init__(self, sync: _SyncNamed):
+        self._sync = sync
+
+    async def upload(self, file, config=None):
+        return self._sync.upload(file, config=config)
+
+    async def create(self, model=None, config=None):
+        return self._sync.create(model=model, config=config)
+
+    async def update(self, name, config=None):
+        return self._sync.update(name, config=config)
+
+    async def delete(self, name):
+        return self._sync.delete(name)
+
+
+class FakeGenAIClient:
+    """Drop-in for `genai.Client` with the native async surface under `.aio`."""
+
+    def __init__(self, config: Optional[FakeGenAIConfig] = None):
+        self.fake = FakeGenAI(config)
+        self.models = _SyncModels(self.fake)
+        self.files = _SyncNamed(self.fake, "files")
+        self.caches = _SyncNamed(self.fake, "cachedContents")
+        self.aio = SimpleNamespace(
+            models=_AsyncModels(self.fake),
+            files=_AsyncNamed(self.files),
+            caches=_AsyncNamed(self.caches),
+        )
+
+    @property
+    def stats(self) -> FakeGenAIStats:
+        return self.fake.stats
+
+    def close(self) -> None:
+        pass
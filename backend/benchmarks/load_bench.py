@@ -0,0 +1,351 @@
+"""Offline load test of every router against a fake Gemini backend.
+
+The app runs in-process (lifespan included) with `FakeGenAIClient` installed
+as the pooled GenAI client and as the `get_genai_client` dependency, so the
+full stack - uploads, audio preprocessing, rate limiter, caches, JSON
+parsing, SSE/WebSocket streaming - is exercised without network or quota.
+HTTP scenarios go through `httpx.ASGITransport`; the streaming scenario
+speaks the ASGI WebSocket protocol directly.
+
+Reported per scenario:
+
+    p50_ms / p95_ms / p99_ms   request latency percentiles
+    throughput_rps             completed requests per second
+    errors                     non-2xx responses or exceptions
+    loop_lag_max_ms            worst event-loop stall seen while it ran;
+                               anything near the fake latency means some
+                               handler blocked the loop
+    rss_mb                     process RSS after the scenario (peak in "process")
+
+Caches are disabled unless --cache is given, so each request reaches the
+fake backend. Scenarios: conversation, summary, soap, ai-edit,
+ai-edit-stream, voice-recording, streaming.
+
+Usage (from backend/):
+    python -m benchmarks.load_bench --requests 200 --concurrency 20 --latency-ms 300
+    python -m benchmarks.load_bench --scenarios summary,streaming --error-rate 0.05
+"""
+import argparse
+import array
+import asyncio
+import io
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+import wave
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+SCENARIOS = ("conversation", "summary", "soap", "ai-edit", "ai-edit-stream", "voice-recording", "streaming")
+STREAM_SAMPLE_RATE = 16000
+STREAM_CHUNK_S = 0.1
+LAG_PROBE_S = 0.01
+
+SAMPLE_TEXT = (
+    "Good morning, what brings you in today? I've had a cough for ten days and a low fever. "
+    "Any shortness of breath? A little on the stairs. Let's get a chest X-ray and start amoxicillin."
+)
+
+
+def _speech_like(seconds: float, sample_rate: int) -> list[float]:
+    """Tone bursts separated by silence, so the streaming VAD closes segments."""
+    samples = []
+    for i in range(int(seconds * sample_rate)):
+        t = i / sample_rate
+        voiced = (t % 2.2) < 1.5
+        samples.append(0.3 * math.sin(2 * math.pi * 220 * t) if voiced else 0.0)
+    return samples
+
+
+def make_wav(seconds: float, sample_rate: int = 48000, channels: int = 2) -> bytes:
+    pcm = array.array("h", (int(s * 32767) for s in _speech_like(seconds, sample_rate) for _ in range(channels)))
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buf.getvalue()
+
+
+def make_pcm_chunks(seconds: float) -> list[bytes]:
+    samples = array.array("f", _speech_like(seconds, STREAM_SAMPLE_RATE) + [0.0] * STREAM_SAMPLE_RATE)
+    step = int(STREAM_CHUNK_S * STREAM_SAMPLE_RATE)
+    return [samples[i : i + step].tobytes() for i in range(0, len(samples), step)]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic sleep wakes up: the longest event-loop stall."""
+
+    def __init__(self, interval_s: float = LAG_PROBE_S):
+        self.interval_s = interval_s
+        self.max_lag_s = 0.0
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval_s)
+            self.max_lag_s = max(self.max_lag_s, loop.time() - started - self.interval_s)
+
+    def __enter__(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+
+
+async def websocket_session(app, path: str, query: bytes, chunks: list[bytes]) -> int:
+    """Drive one ASGI WebSocket session; returns the number of messages received."""
+    inbound: asyncio.Queue = asyncio.Queue()
+    received = []
+    closed = asyncio.Event()
+
+    async def receive():
+        return await inbound.get()
+
+    async def send(message):
+        if message["type"] == "websocket.send":
+            received.append(message.get("text") or message.get("bytes"))
+        elif message["type"] == "websocket.close":
+            closed.set()
+
+    scope = {
+        "type": "websocket",
+        "asgi": {"version": "3.0"},
+        "scheme": "ws",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+        "subprotocols": [],
+    }
+    inbound.put_nowait({"type": "websocket.connect"})
+    handler = asyncio.create_task(app(scope, receive, send))
+    for chunk in chunks:
+        inbound.put_nowait({"type": "websocket.receive", "bytes": chunk})
+        # Pace at real time x10 so segmentation and transcription overlap.
+        await asyncio.sleep(STREAM_CHUNK_S / 10)
+    inbound.put_nowait({"type": "websocket.receive", "text": "end"})
+    await asyncio.wait_for(closed.wait(), timeout=120)
+    inbound.put_nowait({"type": "websocket.disconnect", "code": 1000})
+    await handler
+    return len(received)
+
+
+def _timeline():
+    return [{"speaker": "doctor" if i % 2 == 0 else "patient", "text": SAMPLE_TEXT, "timestamp": f"00:{i:02d}"} for i in range(6)]
+
+
+def build_scenarios(app, http, args) -> dict:
+    conversation_wav = make_wav(args.audio_seconds)
+    recording_wav = make_wav(min(args.audio_seconds, 10))
+    stream_chunks = make_pcm_chunks(args.audio_seconds)
+    visit = {
+        "doctor_conversation": SAMPLE_TEXT,
+        "patient_conversation": SAMPLE_TEXT,
+        "full_transcript": SAMPLE_TEXT * 3,
+    }
+    counter = {"n": 0}
+
+    def unique(text: str) -> str:
+        # Distinct payloads so in-flight coalescing does not hide the load.
+        counter["n"] += 1
+        return f"{text} [{counter['n']}]"
+
+    async def conversation():
+        r = await http.post(
+            "/api/v1/conversation/analyze-conversation/",
+            files={"audio": (f"visit{counter['n']}.wav", conversation_wav + unique("").encode(), "audio/wav")},
+        )
+        return r.status_code < 300 and "error" not in r.json()
+
+    async def summary():
+        r = await http.post("/api/v1/summary/generate_summary", json={**visit, "full_transcript": unique(SAMPLE_TEXT)})
+        return r.status_code < 300 and not r.json().get("error")
+
+    async def soap():
+        body = {**visit, "full_transcript": unique(SAMPLE_TEXT), "timeline": _timeline()}
+        r = await http.post("/api/v1/summary/generate_soap", json=body)
+        return r.status_code < 300 and not r.json().get("error")
+
+    async def ai_edit():
+        r = await http.post("/api/v1/ai-edit/edit-transcript/", json={"transcript": unique(SAMPLE_TEXT)})
+        return r.status_code < 300
+
+    async def ai_edit_stream():
+        r = await http.post("/api/v1/ai-edit/edit-transcript/stream", json={"transcript": unique(SAMPLE_TEXT)})
+        return r.status_code < 300 and "event: done" in r.text
+
+    async def voice_recording():
+        r = await http.post("/api/v1/voice-recording/record/", files={"audio": ("rec.wav", recording_wav, "audio/wav")})
+        if r.status_code >= 300:
+            return False
+        filename = r.json()["filename"]
+        listing = await http.get("/api/v1/voice-recording/list/", params={"limit": 50})
+        ranged = await http.get(f"/api/v1/voice-recording/download/{filename}", headers={"Range": "bytes=0-65535"})
+        return listing.status_code < 300 and ranged.status_code == 206
+
+    async def streaming():
+        messages = await websocket_session(
+            app,
+            "/api/v1/streaming/ws/stream-audio/",
+            f"sample_rate={STREAM_SAMPLE_RATE}".encode(),
+            stream_chunks,
+        )
+        return messages > 0
+
+    return {
+        "conversation": conversation,
+        "summary": summary,
+        "soap": soap,
+        "ai-edit": ai_edit,
+        "ai-edit-stream": ai_edit_stream,
+        "voice-recording": voice_recording,
+        "streaming": streaming,
+    }
+
+
+async def run_scenario(call, requests: int, concurrency: int) -> dict:
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                ok = await call()
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += 0 if ok else 1
+
+    with LoopLagMonitor() as lag:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 1),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 1),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 1),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "loop_lag_max_ms": round(lag.max_lag_s * 1000, 1),
+        "rss_mb": round(_rss_mb(), 1),
+    }
+
+
+def _configure_env(args) -> None:
+    os.environ.setdefault("GEMINI_API_KEY", "fake-key")
+    os.environ.setdefault("GEMINI_STT_MODEL", "fake-stt")
+    os.environ.setdefault("GEMINI_LLM_MODEL", "fake-llm")
+    os.environ.setdefault("STREAMING_STT_BACKEND", "gemini")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if not args.cache:
+        os.environ["TRANSCRIPT_CACHE_ENABLED"] = "0"
+        os.environ["LLM_CACHE_ENABLED"] = "0"
+    # Let the fake backend, not the production quota settings, set the pace.
+    os.environ.setdefault("GENAI_RATE_PER_S", "100000")
+    os.environ.setdefault("GENAI_BURST", "100000")
+    os.environ.setdefault("GENAI_MODEL_CONCURRENCY", str(max(64, args.concurrency * 4)))
+    os.environ.setdefault("GENAI_BACKOFF_BASE_S", "0.05")
+
+
+async def run(args) -> dict:
+    import httpx
+
+    from benchmarks.fake_genai import FakeGenAIClient, FakeGenAIConfig
+
+    fake = FakeGenAIClient(FakeGenAIConfig(
+        latency_s=args.latency_ms / 1000,
+        jitter_s=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        transcript_chars=args.transcript_chars,
+        text_chars=args.text_chars,
+        seed=args.seed,
+    ))
+
+    import dependencies
+    import main
+    from services.genai_client import get_registry
+
+    get_registry().install(fake)
+    main.app.dependency_overrides[dependencies.get_genai_client] = lambda: fake
+
+    results = {}
+    rss_start = _rss_mb()
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+            scenarios = build_scenarios(main.app, http, args)
+            for name in args.scenarios:
+                results[name] = await run_scenario(scenarios[name], args.requests, args.concurrency)
+    results["process"] = {
+        "rss_mb_start": round(rss_start, 1),
+        "rss_mb_peak": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "fake_calls": fake.stats.calls,
+        "fake_errors": fake.stats.errors,
+        "fake_calls_by_kind": fake.stats.by_kind,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated scenario names")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="concurrent clients per scenario")
+    parser.add_argument("--latency-ms", type=float, default=200, help="fake Gemini latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake calls failing with 503")
+    parser.add_argument("--transcript-chars", type=int, default=1500, help="size of fake transcripts")
+    parser.add_argument("--text-chars", type=int, default=600, help="size of fake summaries/edits")
+    parser.add_argument("--audio-seconds", type=float, default=20, help="length of generated test audio")
+    parser.add_argument("--cache", action="store_true", help="keep transcript and LLM response caches on")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}; choose from {', '.join(SCENARIOS)}")
+
+    _configure_env(args)
+    # main.py mounts ./static and writes ./logs relative to
+    # the working directory, so run in a scratch directory.
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.makedirs("static", exist_ok=True)
+        print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Startup-time and RSS benchmark for the backend import graph.
+
+Each measurement runs in a fresh interpreter that imports `main` (which pulls
+in every router and service) and reports wall-clock import time and peak RSS.
+The `legacy` scenario imports torch/torchaudio first, which is what every
+worker paid when `services/streaming_service.py` imported them at module
+level; it is skipped when those packages are not installed.
+
+Usage (from backend/):
+    python -m benchmarks.startup_bench --runs 5
+"""
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PROBE = r"""
+import json, resource, sys, time
+sys.path.insert(0, {backend!r})
+t0 = time.perf_counter()
+for name in {preload!r}:
+    __import__(name)
+import main
+elapsed = time.perf_counter() - t0
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"import_s": elapsed, "rss_mb": rss_kb / 1024, "torch_loaded": "torch" in sys.modules}}))
+"""
+
+SCENARIOS = {
+    "current": [],
+    "legacy": ["torch", "torchaudio"],
+}
+
+
+def _run_once(preload: list[str], workdir: str) -> dict:
+    code = _PROBE.format(backend=BACKEND_DIR, preload=preload)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=workdir,
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int) -> dict:
+    results = {}
+    # main.py mounts ./static and writes ./logs relative to
+    # the working directory, so run the probes in a scratch directory.
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "static"), exist_ok=True)
+        for name, preload in SCENARIOS.items():
+            if any(importlib.util.find_spec(mod) is None for mod in preload):
+                results[name] = {"skipped": f"{', '.join(preload)} not installed"}
+                continue
+            samples = [_run_once(preload, workdir) for _ in range(runs)]
+            results[name] = {
+                "import_s_median": round(statistics.median(s["import_s"] for s in samples), 3),
+                "import_s_min": round(min(s["import_s"] for s in samples), 3),
+                "rss_mb_median": round(statistics.median(s["rss_mb"] for s in samples), 1),
+                "torch_loaded": samples[-1]["torch_loaded"],
+            }
+    current, legacy = results.get("current", {}), results.get("legacy", {})
+    if "import_s_median" in current and "import_s_median" in legacy:
+        results["improvement"] = {
+            "import_s_saved": round(legacy["import_s_median"] - current["import_s_median"], 3),
+            "rss_mb_saved": round(legacy["rss_mb_median"] - current["rss_mb_median"], 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per scenario")
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs), indent=2))
+
+
+if __name__ == "__main__":
+    main()
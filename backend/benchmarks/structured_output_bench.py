@@ -0,0 +1,124 @@
+"""Prose-schema prompts vs native structured output for SOAP and diarization.
+
+For each task the `prose` path spells the JSON schema out in the prompt (the
+pre-structured-output layout) and the `structured` path sends the pydantic
+model as `response_schema` with the trimmed prompt. Reported per path:
+
+    prompt_chars       size of the prompt text sent
+    prompt_tokens      mean `usage_metadata.prompt_token_count` (live only)
+    latency_s          mean / p95 wall-clock per call (live only)
+    parse_failures     responses `parse_llm_json` could not use, even after repair
+    repaired           responses that needed `repair_json`
+
+Without GEMINI_API_KEY (or with --offline) only prompt sizes are reported,
+with tokens estimated at ~4 characters per token. The estimate ignores the
+tokens the server spends on `response_schema`; live token counts include them.
+
+Usage (from backend/):
+    python -m benchmarks.structured_output_bench --runs 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from services import voice_to_text_service as vts  # noqa: E402
+from services.genai_async import generate_content  # noqa: E402
+from services.llm_schemas import LLMOutputError, parse_llm_json, parse_stats  # noqa: E402
+
+SAMPLE_TRANSCRIPT = """\
+Good morning, what brings you in today?
+I've had a cough for about ten days and a low fever the last three nights.
+Any shortness of breath or chest pain?
+A little short of breath climbing stairs, no chest pain.
+Your temperature is 100.4, blood pressure 128 over 82, pulse 96, oxygen 95 percent.
+I can hear some crackles at the right base. Let's get a chest X-ray and a CBC.
+Should I keep taking the cough syrup?
+Yes, and I'm starting you on amoxicillin 500 milligrams three times a day for seven days.
+Come back in a week, or sooner if the breathing gets worse.
+"""
+
+
+def _requests(structured: bool) -> dict:
+    soap_text = f"Full Transcript: {SAMPLE_TRANSCRIPT}"
+    contents, config = vts._speaker_request(SAMPLE_TRANSCRIPT, structured=structured)
+    return {
+        "soap": (vts._soap_contents(soap_text, structured=structured), vts._soap_config(structured)),
+        "speakers": (contents, config),
+    }
+
+
+def _prompt_chars(contents) -> int:
+    return sum(len(c) for c in contents)
+
+
+async def _run_live(client, model: str, kind: str, contents, config, runs: int) -> dict:
+    latencies, tokens = [], []
+    failures = repaired = 0
+    for _ in range(runs):
+        before = parse_stats.snapshot().get(kind, {}).get("repaired", 0)
+        started = time.perf_counter()
+        response = await generate_content(client, model=model, contents=contents, config=config)
+        latencies.append(time.perf_counter() - started)
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and usage.prompt_token_count:
+            tokens.append(usage.prompt_token_count)
+        try:
+            parse_llm_json(kind, getattr(response, "text", "") or "")
+        except LLMOutputError:
+            failures += 1
+        repaired += parse_stats.snapshot().get(kind, {}).get("repaired", 0) - before
+    latencies.sort()
+    return {
+        "prompt_tokens": round(statistics.mean(tokens), 1) if tokens else None,
+        "latency_s": round(statistics.mean(latencies), 3),
+        "latency_p95_s": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3),
+        "parse_failures": failures,
+        "repaired": repaired,
+        "runs": runs,
+    }
+
+
+async def main_async(runs: int, offline: bool) -> dict:
+    live = not offline and bool(os.getenv("GEMINI_API_KEY")) and bool(os.getenv("GEMINI_LLM_MODEL"))
+    client = None
+    if live:
+        from services.genai_client import get_default_client
+        client = get_default_client()
+        live = client is not None
+    model = os.getenv("GEMINI_LLM_MODEL")
+
+    report = {}
+    for path, structured in (("prose", False), ("structured", True)):
+        for kind, (contents, config) in _requests(structured).items():
+            entry = {"prompt_chars": _prompt_chars(contents)}
+            if live:
+                entry.update(await _run_live(client, model, kind, contents, config, runs))
+            else:
+                entry["prompt_tokens_est"] = entry["prompt_chars"] // 4
+            report.setdefault(kind, {})[path] = entry
+    for kind, paths in report.items():
+        prose, structured = paths["prose"], paths["structured"]
+        paths["prompt_chars_saved"] = prose["prompt_chars"] - structured["prompt_chars"]
+        if live and prose.get("prompt_tokens") and structured.get("prompt_tokens"):
+            paths["prompt_tokens_saved"] = round(prose["prompt_tokens"] - structured["prompt_tokens"], 1)
+    return {"live": live, "model": model if live else None, "results": report}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="calls per task and path (live mode)")
+    parser.add_argument("--offline", action="store_true", help="only compare prompt sizes; make no API calls")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(main_async(args.runs, args.offline)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
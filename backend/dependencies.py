@@ -1,8 +1,14 @@
 import os
 import logging
 from typing import Optional
-from fastapi import Depends
 from services import logger as logger_module
+from services import genai_client
+from services import job_queue
+from services import batch
+from services import recordings_catalog
+from services import recording_formats
+from services import shared_state
+from services import stream_sessions
 
 def get_logger() -> logging.Logger:
     """Return the configured application logger.
@@ -22,19 +28,39 @@ def get_settings() -> dict:
         "GEMINI_LLM_MODEL": os.getenv("GEMINI_LLM_MODEL"),
     }
 
-def get_genai_client(settings: dict = Depends(get_settings)) -> Optional[object]:
-    """Create and return a Google GenAI client if available.
+def get_genai_client() -> Optional[object]:
+    """Return the process-wide pooled Google GenAI client.
 
-    Returns None when the client cannot be created (e.g., SDK not installed or
-    API key missing). Callers should handle None and fall back to previous
-    behaviour if desired.
+    The client is owned by `services.genai_client` and shared by every router,
+    so connections and TLS sessions are reused across requests. Returns None
+    when the client cannot be created (e.g., SDK not installed); callers
+    should handle None and fall back to previous behaviour if desired.
     """
-    api_key = settings.get("GEMINI_API_KEY")
-    try:
-        # Import inside function so missing dev deps won't break imports
-        import google.genai as genai  # type: ignore
-
-        return genai.Client(api_key=api_key)
-    except Exception:
-        # Return None if client can't be created; callers should handle it.
-        return None
+    return genai_client.get_registry().get()
+
+def get_job_queue() -> "job_queue.JobQueue":
+    """Return the process-wide background job queue (started by the app lifespan)."""
+    return job_queue.get_job_queue()
+
+def get_batch_backend() -> "batch.BatchBackend":
+    """Return the backend used for batch SOAP/summary generation.
+
+    Tests can replace it via `app.dependency_overrides` with a local stub.
+    """
+    return batch.get_batch_backend()
+
+def get_recordings_index() -> "recordings_catalog.RecordingsIndex":
+    """Return the process-wide recordings catalog (reconciled by the app lifespan)."""
+    return recordings_catalog.get_recordings_index()
+
+def get_recording_encoder() -> "recording_formats.RecordingEncoder":
+    """Return the process-wide encoder for compact recording formats."""
+    return recording_formats.get_recording_encoder()
+
+def get_shared_state() -> Optional["shared_state.SharedState"]:
+    """Return the state shared across worker processes, or None in single-process mode."""
+    return shared_state.get_shared_state()
+
+def get_stream_registry() -> "stream_sessions.StreamRegistry":
+    """Return this worker's registry of live streaming connections."""
+    return stream_sessions.get_stream_registry()
@@ -1,10 +1,15 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
+# Load environment variables from backend/.env before any project import:
+# services read their configuration into module-level constants on import.
+load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+
 from api.conversation import router as conversation_router
 from api.voice_recording import router as voice_recording_router
 from api.summary import router as summary_router
@@ -12,15 +17,41 @@ from api.ai_edit import router as ai_edit_router
 from api.streaming import router as streaming_router
 # from api.voice_detection import router as voice_detection_router
 from api.legacy import router as legacy_router
-
-# Load environment variables from backend/.env
-load_dotenv(os.path.join(os.path.dirname(__file__), '.env'))
+from api.stats import router as stats_router
+from api.metrics import router as metrics_router
+from services import genai_async
+from services.genai_client import get_registry, close_registry
+from services.job_queue import get_job_queue
+from services.prompts.registry import close_context_caches
+from services.recordings_catalog import get_recordings_index
+from services.recording_formats import get_recording_encoder
+from services.shared_state import get_shared_state, close_shared_state
+from services.metrics import MetricsMiddleware
+from services.logger import RequestIdMiddleware
 
 print(f"🔑 GEMINI_API_KEY loaded: {'Yes' if os.getenv('GEMINI_API_KEY') else 'No'}")
 if os.getenv('GEMINI_API_KEY'):
     print(f"🔑 API Key starts with: {os.getenv('GEMINI_API_KEY')[:10]}...")
 
-app = FastAPI(title="Medical Voice Assistant API", version="2.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the pooled GenAI client once per process and release it on shutdown
+    get_registry().get()
+    get_shared_state()
+    await get_job_queue().start()
+    await get_recordings_index().start()
+    yield
+    await get_recording_encoder().stop()
+    await get_recordings_index().stop()
+    await get_job_queue().stop()
+    await close_context_caches(get_registry().current())
+    await close_registry()
+    await close_shared_state()
+    genai_async.shutdown()
+
+
+app = FastAPI(title="Medical Voice Assistant API", version="2.0.0", lifespan=lifespan)
 
 # Allow CORS for local Streamlit frontend
 
@@ -31,9 +62,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/recordings", StaticFiles(directory="recordings"), name="recordings")
 app.include_router(summary_router, prefix="/api/v1/summary", tags=["Summary"])
 
 # Legacy root endpoints for backwards compatibility (e.g., /generate_soap)
@@ -45,6 +77,13 @@ app.include_router(ai_edit_router, prefix="/api/v1/ai-edit", tags=["AIEdit"])
 app.include_router(conversation_router, prefix="/api/v1/conversation", tags=["Conversation"])
 app.include_router(voice_recording_router, prefix="/api/v1/voice-recording", tags=["VoiceRecording"])
 app.include_router(streaming_router, prefix="/api/v1/streaming", tags=["Streaming"])
+app.include_router(stats_router, prefix="/api/v1/stats", tags=["Stats"])
+app.include_router(metrics_router, tags=["Metrics"])
+
+@app.get("/health/genai", tags=["Health"])
+async def genai_health():
+    return JSONResponse(get_registry().health())
+
 # app.include_router(voice_detection_router, prefix="/api/v1/voice-detection", tags=["VoiceDetection"])
 # bhai sahab 
 # aaaa
@@ -0,0 +1,80 @@
+"""Production launcher: runs the API in several uvicorn worker processes.
+
+`python main.py` starts one process, which keeps every request, analysis job
+and streaming session on a single core. This launcher starts N workers behind
+one listening socket and wires up what they need to cooperate:
+
+- a shared-state backend (`services.shared_state`) so caches, job claims and
+  streaming-session routing are visible to every worker; with more than one
+  worker and no SHARED_STATE_URL, a SQLite file under state/ is used;
+- the Gemini rate budget (GENAI_RATE_PER_S, GENAI_BURST) split evenly across
+  workers, so N workers together stay within the configured totals;
+- one log file per worker process (LOG_PER_PROCESS), because a rotating
+  file handler is not safe to share between processes;
+- graceful shutdown: on SIGTERM/SIGINT workers stop accepting connections,
+  give in-flight requests GRACEFUL_SHUTDOWN_S to finish, then run the app
+  lifespan shutdown, which drains running analysis jobs (JOBS_DRAIN_TIMEOUT_S).
+
+Usage (from backend/):
+    python serve.py --workers 4 --port 8000
+
+Configuration (flags override):
+    WEB_WORKERS           worker processes (default: CPU count)
+    HOST                  bind address (default 0.0.0.0)
+    PORT                  bind port (default 8000)
+    GRACEFUL_SHUTDOWN_S   seconds in-flight requests get on shutdown (default 30)
+    SHARED_STATE_URL      see services/shared_state.py
+"""
+import argparse
+import os
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SHARED_STATE_URL = "sqlite:///" + os.path.join("state", "shared.sqlite3")
+
+
+def _split_budget(workers: int) -> None:
+    """Give each worker its share of the process-local Gemini rate limits."""
+    rate = float(os.getenv("GENAI_RATE_PER_S", "10"))
+    burst = int(os.getenv("GENAI_BURST", "20"))
+    os.environ["GENAI_RATE_PER_S"] = str(rate / workers)
+    os.environ["GENAI_BURST"] = str(max(1, burst // workers))
+
+
+def main() -> None:
+    load_dotenv(os.path.join(BACKEND_DIR, ".env"))
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--graceful-shutdown", type=float, default=float(os.getenv("GRACEFUL_SHUTDOWN_S", "30")))
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info").lower())
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    if workers > 1:
+        os.environ.setdefault("SHARED_STATE_URL", DEFAULT_SHARED_STATE_URL)
+        os.environ.setdefault("LOG_PER_PROCESS", "1")
+        _split_budget(workers)
+
+    import uvicorn
+
+    print(
+        f"[STARTUP] Starting {workers} worker(s) on {args.host}:{args.port} "
+        f"(shared state: {os.getenv('SHARED_STATE_URL') or 'off'})"
+    )
+    uvicorn.run(
+        "main:app",
+        app_dir=BACKEND_DIR,
+        host=args.host,
+        port=args.port,
+        workers=workers,
+        timeout_graceful_shutdown=args.graceful_shutdown,
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""Audio normalization before speech-to-text.
+
+Browser uploads are usually 48 kHz stereo (often webm), which is several
+times more data than speech recognition needs. `normalize_for_stt` decodes
+the recording, downmixes to mono, resamples to 16 kHz and trims leading and
+trailing silence, writing a compact 16-bit WAV next to the original. Work is
+done block by block, so memory stays flat for long recordings.
+
+Decoding uses `AudioSource` (soundfile, or stdlib `wave` for PCM WAV) and
+falls back to streaming the file through an `ffmpeg` subprocess for
+compressed containers such as webm/m4a; ffmpeg downmixes and resamples while
+decoding and its output is read in blocks. `AudioSource` blocks go through
+`StreamResampler`, a polyphase windowed-sinc filter whose state carries over
+from block to block, so there are no seams at block boundaries.
+
+Configuration:
+    STT_NORMALIZE               "0" sends uploads untouched (default "1")
+    STT_SAMPLE_RATE             target sample rate (default 16000)
+    STT_TRIM_SILENCE            "0" keeps leading/trailing silence (default "1")
+    STT_SILENCE_THRESHOLD_DB    frames this far below the loudest frame count
+                                as silence (default 40)
+    STT_TRIM_PADDING_S          audio kept either side of the speech (default 0.25)
+"""
+import math
+import os
+import shutil
+import subprocess
+import time
+import wave
+from dataclasses import asdict, dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+
+from services.audio_utils import AudioSource, frame_rms
+from services.logger import logger
+
+STT_NORMALIZE = os.getenv("STT_NORMALIZE", "1") == "1"
+STT_SAMPLE_RATE = int(os.getenv("STT_SAMPLE_RATE", "16000"))
+STT_TRIM_SILENCE = os.getenv("STT_TRIM_SILENCE", "1") == "1"
+STT_SILENCE_THRESHOLD_DB = float(os.getenv("STT_SILENCE_THRESHOLD_DB", "40"))
+STT_TRIM_PADDING_S = float(os.getenv("STT_TRIM_PADDING_S", "0.25"))
+
+DECODE_BLOCK_S = 30
+ENERGY_FRAME_MS = 20
+# Absolute floor so near-digital-silence recordings are not "trimmed" to noise.
+MIN_SILENCE_RMS = 1e-4
+COPY_BLOCK_FRAMES = 256 * 1024
+# Resampler outputs computed per vectorized step (bounds the gather matrix).
+RESAMPLE_CHUNK = 4096
+
+MIME_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mp3",
+    ".m4a": "audio/mp4",
+    ".webm": "audio/webm",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac",
+}
+
+
+def guess_mime_type(path: str) -> str:
+    return MIME_TYPES.get(os.path.splitext(path)[1].lower(), "audio/wav")
+
+
+@dataclass
+class NormalizedAudio:
+    path: str
+    original_bytes: int
+    normalized_bytes: int
+    original_sample_rate: int
+    sample_rate: int
+    duration_s: float
+    trimmed_leading_s: float
+    trimmed_trailing_s: float
+    elapsed_ms: float
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.normalized_bytes
+
+    def stats(self) -> dict:
+        stats = asdict(self)
+        stats.pop("path")
+        stats["saved_bytes"] = self.saved_bytes
+        return stats
+
+
+class StreamResampler:
+    """Rational-ratio polyphase resampler that keeps its state between blocks.
+
+    Equivalent to upsampling by `up`, low-pass filtering with a Kaiser-windowed
+    sinc (anti-aliasing/anti-imaging) and keeping every `down`-th sample, with
+    the filter delay compensated. Feeding a signal in blocks gives the same
+    output as feeding it whole.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int, half_width: int = 10, beta: float = 5.0):
+        g = math.gcd(source_rate, target_rate)
+        self.up, self.down = target_rate // g, source_rate // g
+        max_rate = max(self.up, self.down)
+        half_len = half_width * max_rate
+        n = np.arange(-half_len, half_len + 1)
+        cutoff = 1.0 / max_rate
+        taps = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta) * self.up
+        self.width = -(-len(taps) // self.up)
+        padded = np.zeros(self.width * self.up)
+        padded[: len(taps)] = taps
+        # phases[p, m] = taps[p + m * up]
+        self._phases = padded.reshape(self.width, self.up).T.astype(np.float32)
+        self._delay = half_len
+        # Input history; starts with zeros standing in for samples before the stream.
+        self._buf = np.zeros(self.width, dtype=np.float32)
+        self._buf_start = -self.width
+        self._n_in = 0
+        self._n_out = 0
+
+    def _input_index(self, n: np.ndarray) -> np.ndarray:
+        return (n * self.down + self._delay) // self.up
+
+    def process(self, block: np.ndarray, final: bool = False) -> np.ndarray:
+        if self.up == self.down:
+            return block
+        self._buf = np.concatenate([self._buf, block.astype(np.float32, copy=False)])
+        self._n_in += len(block)
+        if final:
+            n_end = -(-self._n_in * self.up // self.down)
+            # Samples after the end of the stream are zeros.
+            self._buf = np.concatenate([self._buf, np.zeros(self._delay // self.up + 2, dtype=np.float32)])
+        else:
+            n_end = max(0, (self._n_in * self.up - 1 - self._delay) // self.down + 1)
+        outputs = []
+        taps = np.arange(self.width)
+        for lo in range(self._n_out, n_end, RESAMPLE_CHUNK):
+            n = np.arange(lo, min(lo + RESAMPLE_CHUNK, n_end))
+            t = n * self.down + self._delay
+            x_idx = (t // self.up)[:, None] - taps[None, :] - self._buf_start
+            outputs.append(np.einsum("ij,ij->i", self._phases[t % self.up], self._buf[x_idx]))
+        self._n_out = max(self._n_out, n_end)
+        # Keep only the history the next output still needs.
+        keep_from = int(self._input_index(np.int64(self._n_out))) - self.width + 1
+        drop = max(0, keep_from - self._buf_start)
+        self._buf = self._buf[drop:]
+        self._buf_start += drop
+        return np.concatenate(outputs).astype(np.float32, copy=False) if outputs else np.zeros(0, dtype=np.float32)
+
+
+def _resampled(blocks: Iterator[np.ndarray], source_rate: int, target_rate: int) -> Iterator[np.ndarray]:
+    resampler = StreamResampler(source_rate, target_rate)
+    for block in blocks:
+        out = resampler.process(block)
+        if len(out):
+            yield out
+    tail = resampler.process(np.zeros(0, dtype=np.float32), final=True)
+    if len(tail):
+        yield tail
+
+
+def _ffmpeg_sample_rate(path: str) -> int:
+    """Sample rate of the first audio stream via ffprobe, 0 when unknown."""
+    ffprobe = shutil.which("ffprobe")
+    if ffprobe is None:
+        return 0
+    try:
+        out = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "a:0", "-show_entries", "stream=sample_rate",
+             "-of", "default=noprint_wrappers=1:nokey=1", path],
+            capture_output=True, text=True, timeout=30,
+        ).stdout.strip()
+        return int(out.splitlines()[0]) if out else 0
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return 0
+
+
+def _ffmpeg_blocks(path: str, target_rate: int) -> Iterator[np.ndarray]:
+    """Decode through ffmpeg to mono 16-bit PCM at `target_rate`, one block at a time."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is not installed; cannot decode compressed audio")
+    proc = subprocess.Popen(
+        [ffmpeg, "-v", "error", "-nostdin", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(target_rate), "-"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    block_bytes = DECODE_BLOCK_S * target_rate * 2
+    carry = b""
+    try:
+        while True:
+            raw = proc.stdout.read(block_bytes)
+            if not raw:
+                break
+            raw = carry + raw
+            usable = len(raw) - len(raw) % 2
+            carry = raw[usable:]
+            yield np.frombuffer(raw[:usable], dtype="<i2").astype(np.float32) / 32768.0
+        stderr = proc.stderr.read()
+        if proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()[:500]}")
+    finally:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+
+
+def _decode_mono(path: str, target_rate: int) -> tuple[int, Iterator[np.ndarray]]:
+    """(source sample rate, iterator of mono float32 blocks at `target_rate`)."""
+    try:
+        source = AudioSource(path)
+    except Exception:
+        source = None
+    if source is not None and source.sample_rate:
+        blocks = source.blocks(DECODE_BLOCK_S * source.sample_rate)
+        return source.sample_rate, _resampled(blocks, source.sample_rate, target_rate)
+
+    # Compressed containers (webm/opus, m4a, mp3) are streamed through ffmpeg,
+    # which downmixes and resamples (with filtering) while decoding.
+    return _ffmpeg_sample_rate(path), _ffmpeg_blocks(path, target_rate)
+
+
+def _voiced_bounds(energies: np.ndarray, frame_len: int, total: int, sample_rate: int) -> tuple[int, int]:
+    """Sample range [start, end) around the frames louder than the silence threshold."""
+    if len(energies) == 0:
+        return 0, total
+    threshold = max(float(energies.max()) * 10 ** (-STT_SILENCE_THRESHOLD_DB / 20), MIN_SILENCE_RMS)
+    voiced = np.flatnonzero(energies > threshold)
+    if len(voiced) == 0:
+        return 0, total
+    pad = int(STT_TRIM_PADDING_S * sample_rate)
+    start = max(int(voiced[0]) * frame_len - pad, 0)
+    end = min((int(voiced[-1]) + 1) * frame_len + pad, total)
+    return start, end
+
+
+def _write_pcm16(wav: wave.Wave_write, block: np.ndarray) -> None:
+    wav.writeframes((np.clip(block, -1.0, 1.0) * 32767.0).astype("<i2").tobytes())
+
+
+def _copy_frames(src: str, dst: str, start: int, end: int) -> None:
+    with wave.open(src, "rb") as inp, wave.open(dst, "wb") as out:
+        out.setparams(inp.getparams())
+        frame_bytes = inp.getsampwidth() * inp.getnchannels()
+        inp.setpos(start)
+        remaining = end - start
+        while remaining > 0:
+            raw = inp.readframes(min(COPY_BLOCK_FRAMES, remaining))
+            if not raw:
+                break
+            out.writeframes(raw)
+            remaining -= len(raw) // frame_bytes
+
+
+def normalize_for_stt(
+    path: str,
+    sample_rate: int = STT_SAMPLE_RATE,
+    trim_silence: bool = STT_TRIM_SILENCE,
+) -> NormalizedAudio:
+    """Write a mono, `sample_rate` Hz, silence-trimmed WAV beside `path`.
+
+    The caller owns the returned file and should delete it when done.
+    Blocking; run it in a worker thread.
+    """
+    started = time.perf_counter()
+    out_path = f"{path}.stt.wav"
+    full_path = f"{path}.stt-full.wav"
+    source_rate, blocks = _decode_mono(path, sample_rate)
+
+    frame_len = int(sample_rate * ENERGY_FRAME_MS / 1000)
+    energies = []
+    carry = np.zeros(0, dtype=np.float32)
+    total = 0
+    try:
+        with wave.open(full_path, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(sample_rate)
+            for block in blocks:
+                _write_pcm16(wav, block)
+                total += len(block)
+                if trim_silence:
+                    # Frames can straddle blocks; keep the remainder for the next one.
+                    buffered = np.concatenate([carry, block])
+                    usable = len(buffered) - len(buffered) % frame_len
+                    energies.append(frame_rms(buffered[:usable], frame_len))
+                    carry = buffered[usable:]
+
+        start, end = 0, total
+        if trim_silence and energies:
+            start, end = _voiced_bounds(np.concatenate(energies), frame_len, total, sample_rate)
+        if (start, end) == (0, total):
+            os.replace(full_path, out_path)
+        else:
+            _copy_frames(full_path, out_path, start, end)
+    finally:
+        if os.path.exists(full_path):
+            os.remove(full_path)
+
+    return NormalizedAudio(
+        path=out_path,
+        original_bytes=os.path.getsize(path),
+        normalized_bytes=os.path.getsize(out_path),
+        original_sample_rate=source_rate,
+        sample_rate=sample_rate,
+        duration_s=round((end - start) / sample_rate, 2),
+        trimmed_leading_s=round(start / sample_rate, 2),
+        trimmed_trailing_s=round((total - end) / sample_rate, 2),
+        elapsed_ms=round((time.perf_counter() - started) * 1000, 1),
+    )
+
+
+def try_normalize_for_stt(path: str) -> Optional[NormalizedAudio]:
+    """`normalize_for_stt` that returns None (send the original) when disabled or undecodable."""
+    if not STT_NORMALIZE:
+        return None
+    try:
+        normalized = normalize_for_stt(path)
+    except Exception as e:
+        logger.warning(f"[PREPROCESS] Could not normalize {path}, sending it unchanged: {e}")
+        return None
+    logger.info(
+        f"[PREPROCESS] {os.path.basename(path)}: {normalized.original_bytes} -> {normalized.normalized_bytes} bytes "
+        f"({normalized.original_sample_rate} Hz -> {normalized.sample_rate} Hz mono, "
+        f"trimmed {normalized.trimmed_leading_s}s + {normalized.trimmed_trailing_s}s) in {normalized.elapsed_ms} ms"
+    )
+    return normalized
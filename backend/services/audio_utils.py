@@ -0,0 +1,98 @@
+"""Small PCM helpers shared by the audio services."""
+import io
+import wave
+
+import numpy as np
+
+
+def pcm_to_wav_bytes(samples: np.ndarray, sample_rate: int) -> bytes:
+    """Encode mono float32 PCM in [-1, 1] as a 16-bit WAV file in memory."""
+    pcm16 = (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2")
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm16.tobytes())
+    return buf.getvalue()
+
+
+def frame_rms(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS energy of consecutive, non-overlapping frames (a trailing partial frame is ignored)."""
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = samples[: n_frames * frame_len].reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+
+
+def _downmix(block: np.ndarray) -> np.ndarray:
+    return block.mean(axis=1, dtype=np.float32) if block.ndim == 2 else block.astype(np.float32, copy=False)
+
+
+def _wav_to_float(raw: bytes, sampwidth: int, channels: int) -> np.ndarray:
+    if sampwidth == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sampwidth == 2:
+        data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif sampwidth == 4:
+        data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sampwidth}")
+    return _downmix(data.reshape(-1, channels)) if channels > 1 else data
+
+
+class AudioSource:
+    """Seekable, mono float32 view of an audio file.
+
+    Uses `soundfile` (WAV/FLAC/OGG and anything libsndfile reads) when it is
+    installed and falls back to the stdlib `wave` module for PCM WAV. Nothing
+    is decoded up front; callers read ranges or iterate in blocks.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            import soundfile as sf  # type: ignore
+            info = sf.info(path)
+            self.sample_rate, self.frames, self._backend = info.samplerate, info.frames, "soundfile"
+        except ImportError:
+            with wave.open(path, "rb") as wav:
+                self.sample_rate, self.frames, self._backend = wav.getframerate(), wav.getnframes(), "wave"
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        """Mono samples for frames [start, stop)."""
+        if self._backend == "soundfile":
+            import soundfile as sf  # type: ignore
+            data, _ = sf.read(self.path, start=start, stop=stop, dtype="float32", always_2d=True)
+            return _downmix(data)
+        with wave.open(self.path, "rb") as wav:
+            wav.setpos(start)
+            raw = wav.readframes(stop - start)
+            return _wav_to_float(raw, wav.getsampwidth(), wav.getnchannels())
+
+    def blocks(self, block_frames: int):
+        """Yield consecutive mono blocks covering the whole file."""
+        if self._backend == "soundfile":
+            import soundfile as sf  # type: ignore
+            for block in sf.blocks(self.path, blocksize=block_frames, dtype="float32", always_2d=True):
+                yield _downmix(block)
+            return
+        with wave.open(self.path, "rb") as wav:
+            while True:
+                raw = wav.readframes(block_frames)
+                if not raw:
+                    return
+                yield _wav_to_float(raw, wav.getsampwidth(), wav.getnchannels())
+
+
+def probe_duration(path: str):
+    """Duration in seconds, or None when the file cannot be decoded here (e.g. webm)."""
+    try:
+        return AudioSource(path).duration
+    except Exception:
+        return None
@@ -0,0 +1,170 @@
+"""Batch generation of SOAP notes and summaries.
+
+A batch backend takes a list of request payloads (the dicts the single-item
+endpoints build) and yields `(index, result)` pairs as items finish, in
+completion order. Two backends ship:
+
+- `ConcurrentBatchBackend` runs `generate_soap_note` /
+  `generate_conversation_summary` per item with bounded concurrency and a
+  token-bucket rate limit, so results stream back within seconds.
+- `GeminiBatchBackend` submits one provider batch job (inline requests) and
+  polls it; cheaper for large end-of-day backlogs but results only arrive
+  when the whole job is done.
+
+`get_batch_backend` picks one from BATCH_BACKEND. Endpoints receive it through
+`dependencies.get_batch_backend`, so tests can override it with a local stub.
+
+Configuration:
+    BATCH_BACKEND          "concurrent" (default) or "gemini"
+    BATCH_MAX_ITEMS        largest accepted batch (default 200)
+    BATCH_CONCURRENCY      items generated at the same time (default 4)
+    BATCH_RATE_PER_S       items started per second (default 2)
+    BATCH_POLL_INTERVAL_S  provider batch status poll interval (default 10)
+    BATCH_TIMEOUT_S        give up on a provider batch after this long (default 86400)
+"""
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Optional, Protocol
+
+from services.logger import logger
+from services.rate_limit import TokenBucket
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_RATE_PER_S = float(os.getenv("BATCH_RATE_PER_S", "2"))
+BATCH_POLL_INTERVAL_S = float(os.getenv("BATCH_POLL_INTERVAL_S", "10"))
+BATCH_TIMEOUT_S = float(os.getenv("BATCH_TIMEOUT_S", "86400"))
+
+TASKS = ("soap", "summary")
+
+_BATCH_DONE_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_PARTIALLY_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+class BatchBackend(Protocol):
+    name: str
+
+    def run(self, task: str, items: list[dict], genai_client=None, model: Optional[str] = None) -> AsyncIterator[tuple[int, dict]]:
+        ...
+
+
+def _error_result(task: str, message: str) -> dict:
+    if task == "summary":
+        return {"summary": "", "error": message}
+    return {"soap_html": "", "soap_json": {}, "error": message}
+
+
+class ConcurrentBatchBackend:
+    name = "concurrent"
+
+    def __init__(self, concurrency: int = BATCH_CONCURRENCY, rate_per_s: float = BATCH_RATE_PER_S):
+        self.concurrency = concurrency
+        self.rate_per_s = rate_per_s
+
+    async def run(self, task: str, items: list[dict], genai_client=None, model: Optional[str] = None):
+        from services.voice_to_text_service import generate_conversation_summary, generate_soap_note
+
+        generate = generate_soap_note if task == "soap" else generate_conversation_summary
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # One bucket per batch: a single large batch cannot start items faster than the configured rate.
+        bucket = TokenBucket(self.rate_per_s, burst=self.concurrency)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def run_item(index: int, data: dict) -> None:
+            async with semaphore:
+                await bucket.acquire()
+                try:
+                    result = await generate(data, genai_client=genai_client, model=model)
+                except Exception as e:
+                    logger.error(f"[BATCH] Item {index} failed: {e}")
+                    result = _error_result(task, str(e))
+            await results.put((index, result))
+
+        tasks = [asyncio.create_task(run_item(i, data)) for i, data in enumerate(items)]
+        try:
+            for _ in range(len(tasks)):
+                yield await results.get()
+        finally:
+            # Client went away mid-stream: stop generating the rest.
+            for t in tasks:
+                t.cancel()
+
+
+class GeminiBatchBackend:
+    name = "gemini"
+
+    def __init__(self, poll_interval_s: float = BATCH_POLL_INTERVAL_S, timeout_s: float = BATCH_TIMEOUT_S):
+        self.poll_interval_s = poll_interval_s
+        self.timeout_s = timeout_s
+
+    async def run(self, task: str, items: list[dict], genai_client=None, model: Optional[str] = None):
+        from services.genai_async import create_batch, get_batch
+        from services.genai_client import get_default_client
+        from services.voice_to_text_service import build_batch_request, parse_batch_response
+
+        model = model or os.getenv("GEMINI_LLM_MODEL")
+        client = genai_client or get_default_client()
+        if not model or client is None:
+            for index in range(len(items)):
+                yield index, _error_result(task, "GenAI client or GEMINI_LLM_MODEL not configured")
+            return
+
+        requests = [
+            {**build_batch_request(task, data), "metadata": {"index": str(i)}}
+            for i, data in enumerate(items)
+        ]
+        try:
+            job = await create_batch(client, model, requests, config={"display_name": f"{task}-batch-{len(items)}"})
+        except Exception as e:
+            logger.error(f"[BATCH] Could not submit provider batch of {len(items)} {task} item(s): {e}")
+            for index in range(len(items)):
+                yield index, _error_result(task, str(e))
+            return
+        logger.info(f"[BATCH] Submitted provider batch {job.name} with {len(items)} {task} item(s)")
+        deadline = time.monotonic() + self.timeout_s
+        while _state(job) not in _BATCH_DONE_STATES:
+            if time.monotonic() > deadline:
+                for index in range(len(items)):
+                    yield index, _error_result(task, f"Provider batch {job.name} timed out")
+                return
+            await asyncio.sleep(self.poll_interval_s)
+            try:
+                job = await get_batch(client, job.name)
+            except Exception as e:
+                logger.error(f"[BATCH] Polling provider batch {job.name} failed: {e}")
+                for index in range(len(items)):
+                    yield index, _error_result(task, str(e))
+                return
+
+        responses = getattr(getattr(job, "dest", None), "inlined_responses", None) or []
+        logger.info(f"[BATCH] Provider batch {job.name} finished: {_state(job)}")
+        seen = set()
+        for position, item in enumerate(responses):
+            metadata = getattr(item, "metadata", None) or {}
+            index = int(metadata.get("index", position))
+            seen.add(index)
+            if getattr(item, "error", None) is not None or item.response is None:
+                yield index, _error_result(task, str(getattr(item, "error", None) or "No response"))
+            else:
+                yield index, parse_batch_response(task, getattr(item.response, "text", "") or "")
+        for index in range(len(items)):
+            if index not in seen:
+                yield index, _error_result(task, f"Provider batch ended in {_state(job)}")
+
+
+def _state(job) -> str:
+    state = getattr(job, "state", None)
+    return getattr(state, "value", None) or str(state)
+
+
+def get_batch_backend() -> BatchBackend:
+    """Backend selected by BATCH_BACKEND."""
+    if os.getenv("BATCH_BACKEND", "concurrent").lower() == "gemini":
+        return GeminiBatchBackend()
+    return ConcurrentBatchBackend()
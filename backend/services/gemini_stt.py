@@ -1,16 +1,87 @@
 import os
 import logging
-from google.genai import Client, types
+from google.genai import types
 from google.genai.errors import APIError
+from services.genai_async import generate_content, upload_file, delete_file, run_blocking
+from services.genai_client import get_default_client
+from services.audio_preprocess import guess_mime_type, try_normalize_for_stt
 
 logger = logging.getLogger(__name__)
 
-def transcribe_audio(audio_path: str) -> str | None:
+# Recordings up to this size are sent inline with the request; larger ones are
+# uploaded once through the Files API (streamed from disk by the SDK) and
+# referenced by URI. Inline requests are capped at 20 MB after base64 encoding.
+INLINE_MAX_BYTES = int(os.getenv("GEMINI_INLINE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+AUDIO_MIME_TYPE = 'audio/wav'
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+async def _build_audio_part(client, audio_path: str, mime_type: str = AUDIO_MIME_TYPE):
+    """Return `(part, uploaded_name)` for the audio using the cheapest transfer.
+
+    `uploaded_name` is set only when the Files API was used, so the caller can
+    delete the remote copy once the transcription is done.
+    """
+    size = os.path.getsize(audio_path)
+    if size <= INLINE_MAX_BYTES:
+        logger.info(f"[GEMINI] Sending audio inline ({size} bytes): {audio_path}")
+        audio_bytes = await run_blocking(_read_file, audio_path)
+        return types.Part.from_bytes(data=audio_bytes, mime_type=mime_type), None
+
+    logger.info(f"[GEMINI] Uploading audio file ({size} bytes): {audio_path}")
+    uploaded_file = await upload_file(
+        client, audio_path, config=types.UploadFileConfig(mime_type=mime_type)
+    )
+    logger.debug(f"Uploaded file details: {uploaded_file}")
+    part = types.Part.from_uri(
+        file_uri=uploaded_file.uri,
+        mime_type=uploaded_file.mime_type or mime_type,
+    )
+    return part, uploaded_file.name
+
+async def _discard_upload(client, name: str | None) -> None:
+    if not name:
+        return
+    try:
+        await delete_file(client, name)
+    except Exception as e:
+        # Uploaded files expire on their own; a failed delete is not fatal.
+        logger.warning(f"[GEMINI] Could not delete uploaded file {name}: {e}")
+
+def _transcription_config():
+    # Use GenerateContentConfig (this SDK version expects this config type)
+    return types.GenerateContentConfig(
+        max_output_tokens=2048,
+        temperature=0.0,
+    )
+
+async def transcribe_wav_bytes(client, model: str, wav_bytes: bytes) -> str:
+    """Transcribe an in-memory WAV clip (one segment of a longer recording).
+
+    Unlike `transcribe_audio` this raises on API errors so the caller can
+    account for each failed segment.
+    """
+    response = await generate_content(
+        client,
+        model=model,
+        contents=[types.Part.from_bytes(data=wav_bytes, mime_type=AUDIO_MIME_TYPE)],
+        config=_transcription_config(),
+    )
+    return (getattr(response, 'text', None) or "").strip()
+
+async def transcribe_audio(audio_path: str, genai_client=None, normalize: bool = True) -> str | None:
     """
     Transcribes audio using the Gemini API.
 
     Args:
         audio_path (str): Path to the audio file to transcribe.
+        genai_client: Optional injected client; defaults to the shared pooled client.
+        normalize (bool): Convert to 16 kHz mono with silence trimmed before
+            sending (see `services.audio_preprocess`). Pass False when the
+            caller already normalized the file.
 
     Returns:
         str | None: Transcription of the audio, or None if transcription failed.
@@ -25,34 +96,32 @@ def transcribe_audio(audio_path: str) -> str | None:
         logger.error("GEMINI_STT_MODEL not set in environment; please set it in backend/.env")
         return None
 
+    normalized = None
     try:
-        # Initialize the Gemini client
-        client = Client(api_key=api_key)
-
-        logger.info(f"[GEMINI] Uploading audio file: {audio_path}")
-        # Upload the audio file
-        uploaded_file = client.files.upload(file=audio_path)
-
-        # Inspect the uploaded file object
-        logger.debug(f"Uploaded file details: {uploaded_file}")
+        # Use the injected client if provided, otherwise the shared pooled one
+        client = genai_client or get_default_client()
+        if client is None:
+            logger.error("[GEMINI] GenAI client unavailable")
+            return None
 
+        if normalize:
+            normalized = await run_blocking(try_normalize_for_stt, audio_path)
+        if normalized is not None:
+            file_part, uploaded_name = await _build_audio_part(client, normalized.path)
+        else:
+            file_part, uploaded_name = await _build_audio_part(client, audio_path, guess_mime_type(audio_path))
         logger.info(f"[GEMINI] Requesting transcription using model: {model}")
-        # Create a Part object for the uploaded file
-        with open(audio_path, 'rb') as audio_file:
-            file_part = types.Part.from_bytes(data=audio_file.read(), mime_type='audio/wav')
-
-        # Use GenerateContentConfig (this SDK version expects this config type)
-        config = types.GenerateContentConfig(
-            max_output_tokens=2048,
-            temperature=0.0,
-        )
 
         # Request transcription
-        response = client.models.generate_content(
-            model=model,
-            contents=[file_part],
-            config=config,
-        )
+        try:
+            response = await generate_content(
+                client,
+                model=model,
+                contents=[file_part],
+                config=_transcription_config(),
+            )
+        finally:
+            await _discard_upload(client, uploaded_name)
 
         # Extract the transcription text (SDK returns text attribute for text responses)
         transcript = getattr(response, 'text', None)
@@ -67,6 +136,16 @@ def transcribe_audio(audio_path: str) -> str | None:
         logger.error(f"[GEMINI] API error: {api_err}")
         return None
 
-    except Exception as e:
+    except Exception:
         logger.exception("[GEMINI] Transcription failed")
         return None
+
+    finally:
+        if normalized is not None:
+            await run_blocking(_remove_quietly, normalized.path)
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,245 @@
+"""Async execution layer for Google GenAI calls.
+
+Every service that talks to Gemini goes through these helpers so the SDK never
+blocks the event loop. When the client exposes the SDK's native async surface
+(`client.aio`) it is awaited directly; otherwise the synchronous call is
+offloaded to a bounded thread pool shared by the whole process. Every call
+also goes through the shared rate limiter / retry / circuit-breaker policy in
+`services.genai_limits`.
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from services.genai_client import get_registry
+from services.genai_limits import get_limiter
+from services.metrics import GENAI_ERRORS, GENAI_LATENCY, record_usage
+
+# Upper bound on blocking SDK calls running at the same time.
+GENAI_MAX_WORKERS = int(os.getenv("GENAI_MAX_WORKERS", "16"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=GENAI_MAX_WORKERS, thread_name_prefix="genai")
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking callable on the GenAI thread pool and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), partial(func, *args, **kwargs))
+
+
+def _is_transport_error(exc: BaseException) -> bool:
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, (ConnectionError, asyncio.TimeoutError))
+
+
+async def _attempt(client, async_method, sync_method, **kwargs):
+    """One SDK call: the native async method if present, else the sync one offloaded.
+
+    Transport failures are reported to the client registry so a broken pooled
+    client gets recycled. Latency, errors and token usage go to the metrics.
+    """
+    model = kwargs.get("model") or ""
+    started = time.perf_counter()
+    try:
+        if async_method is not None:
+            result = await async_method(**kwargs)
+        else:
+            result = await run_blocking(sync_method, **kwargs)
+    except Exception as e:
+        GENAI_ERRORS.inc(model=model, error=type(e).__name__)
+        if _is_transport_error(e):
+            get_registry().record_failure(client, e)
+        raise
+    finally:
+        GENAI_LATENCY.observe(time.perf_counter() - started, model=model, method=sync_method.__name__)
+    get_registry().record_success(client)
+    record_usage(model, result)
+    return result
+
+
+async def _call(client, async_method, sync_method, **kwargs):
+    """`_attempt` under the rate limit, per-model concurrency cap, retries and circuit breaker."""
+    return await get_limiter().run(
+        kwargs.get("model"),
+        partial(_attempt, client, async_method, sync_method, **kwargs),
+    )
+
+
+async def generate_content(client, model: str, contents, config=None):
+    """Non-blocking equivalent of `client.models.generate_content(...)`."""
+    kwargs = {"model": model, "contents": contents}
+    if config is not None:
+        kwargs["config"] = config
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.models.generate_content if aio is not None else None,
+        client.models.generate_content,
+        **kwargs,
+    )
+
+
+_STREAM_END = object()
+
+
+def _next_chunk(iterator):
+    return next(iterator, _STREAM_END)
+
+
+async def stream_content(client, model: str, contents, config=None):
+    """Non-blocking equivalent of `client.models.generate_content_stream(...)`.
+
+    An async generator of response chunks. With the native async surface the
+    SDK stream is consumed directly; otherwise each chunk of the synchronous
+    stream is pulled on the GenAI thread pool. Opening the stream, up to the
+    first chunk, goes through the limiter and is retried like any other call;
+    a stream that fails after output has started is not retried.
+    """
+    kwargs = {"model": model, "contents": contents}
+    if config is not None:
+        kwargs["config"] = config
+    aio = getattr(client, "aio", None)
+
+    async def open_stream():
+        if aio is not None:
+            iterator = (await aio.models.generate_content_stream(**kwargs)).__aiter__()
+            try:
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = _STREAM_END
+        else:
+            iterator = await run_blocking(client.models.generate_content_stream, **kwargs)
+            first = await run_blocking(_next_chunk, iterator)
+        return iterator, first
+
+    started = time.perf_counter()
+    last = None
+    try:
+        iterator, chunk = await get_limiter().run(model, open_stream)
+        while chunk is not _STREAM_END:
+            last = chunk
+            yield chunk
+            if aio is not None:
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    chunk = _STREAM_END
+            else:
+                chunk = await run_blocking(_next_chunk, iterator)
+    except Exception as e:
+        GENAI_ERRORS.inc(model=model, error=type(e).__name__)
+        if _is_transport_error(e):
+            get_registry().record_failure(client, e)
+        raise
+    finally:
+        GENAI_LATENCY.observe(time.perf_counter() - started, model=model, method="generate_content_stream")
+    get_registry().record_success(client)
+    # Usage on the final chunk covers the whole stream.
+    record_usage(model, last)
+
+
+async def upload_file(client, file, config=None):
+    """Non-blocking equivalent of `client.files.upload(...)`."""
+    kwargs = {"file": file}
+    if config is not None:
+        kwargs["config"] = config
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.files.upload if aio is not None else None,
+        client.files.upload,
+        **kwargs,
+    )
+
+
+async def delete_file(client, name: str):
+    """Non-blocking equivalent of `client.files.delete(name=...)`."""
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.files.delete if aio is not None else None,
+        client.files.delete,
+        name=name,
+    )
+
+
+async def create_cache(client, model: str, config):
+    """Non-blocking equivalent of `client.caches.create(...)`."""
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.caches.create if aio is not None else None,
+        client.caches.create,
+        model=model,
+        config=config,
+    )
+
+
+async def update_cache(client, name: str, config):
+    """Non-blocking equivalent of `client.caches.update(...)`."""
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.caches.update if aio is not None else None,
+        client.caches.update,
+        name=name,
+        config=config,
+    )
+
+
+async def delete_cache(client, name: str):
+    """Non-blocking equivalent of `client.caches.delete(name=...)`."""
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.caches.delete if aio is not None else None,
+        client.caches.delete,
+        name=name,
+    )
+
+
+async def create_batch(client, model: str, src, config=None):
+    """Non-blocking equivalent of `client.batches.create(...)`."""
+    kwargs = {"model": model, "src": src}
+    if config is not None:
+        kwargs["config"] = config
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.batches.create if aio is not None else None,
+        client.batches.create,
+        **kwargs,
+    )
+
+
+async def get_batch(client, name: str):
+    """Non-blocking equivalent of `client.batches.get(name=...)`."""
+    aio = getattr(client, "aio", None)
+    return await _call(
+        client,
+        aio.batches.get if aio is not None else None,
+        client.batches.get,
+        name=name,
+    )
+
+
+def shutdown() -> None:
+    """Release the worker threads (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
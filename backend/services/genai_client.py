@@ -0,0 +1,229 @@
+"""Process-wide pooled Google GenAI client.
+
+Creating a `genai.Client` per request repeats the SDK import, HTTP connection
+setup and TLS handshake on the hot path. The registry below keeps a single
+client per process with keep-alive connection pooling, recycles it when it
+gets too old or keeps failing at the transport level, and is opened/closed by
+the FastAPI lifespan in `main.py`.
+
+Pool and recycle limits come from the environment:
+    GENAI_MAX_CONNECTIONS       total pooled connections (default 20)
+    GENAI_MAX_KEEPALIVE         idle keep-alive connections kept (default 10)
+    GENAI_KEEPALIVE_EXPIRY_S    idle connection lifetime in seconds (default 30)
+    GENAI_HTTP_TIMEOUT_MS       per-request timeout, unset for SDK default
+    GENAI_CLIENT_MAX_AGE_S      recycle the client after this age (default 3600)
+    GENAI_CLIENT_MAX_FAILURES   recycle after N consecutive transport failures (default 5)
+"""
+import asyncio
+import os
+import threading
+import time
+from typing import Optional
+
+from services.logger import logger
+
+# Retired clients stay open this long so in-flight calls can finish.
+RETIRE_GRACE_S = 60.0
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+class GenAIClientRegistry:
+    """Owns the shared GenAI client and its connection pool."""
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout_ms: Optional[int] = None,
+        max_age_s: Optional[float] = None,
+        max_failures: Optional[int] = None,
+    ):
+        self.api_key = api_key
+        self.max_connections = max_connections or _env_int("GENAI_MAX_CONNECTIONS", 20)
+        self.max_keepalive_connections = max_keepalive_connections or _env_int("GENAI_MAX_KEEPALIVE", 10)
+        self.keepalive_expiry = keepalive_expiry or _env_float("GENAI_KEEPALIVE_EXPIRY_S", 30.0)
+        self.timeout_ms = timeout_ms or (_env_int("GENAI_HTTP_TIMEOUT_MS", 0) or None)
+        self.max_age_s = max_age_s or _env_float("GENAI_CLIENT_MAX_AGE_S", 3600.0)
+        self.max_failures = max_failures or _env_int("GENAI_CLIENT_MAX_FAILURES", 5)
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._created_at = 0.0
+        self._consecutive_failures = 0
+        self._recycle_count = 0
+        self._last_error: Optional[str] = None
+        self._retired: list[tuple[float, object]] = []
+
+    def _http_options(self):
+        from google.genai import types  # type: ignore
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        return types.HttpOptions(
+            timeout=self.timeout_ms,
+            client_args={"limits": limits},
+            async_client_args={"limits": limits},
+        )
+
+    def _create(self):
+        import google.genai as genai  # type: ignore
+
+        api_key = self.api_key or os.getenv("GEMINI_API_KEY")
+        try:
+            client = genai.Client(api_key=api_key, http_options=self._http_options())
+        except TypeError:
+            # Older SDKs without client_args: fall back to the default pool.
+            client = genai.Client(api_key=api_key)
+        logger.info(
+            f"[GENAI] Created pooled client (max_connections={self.max_connections}, "
+            f"keepalive={self.max_keepalive_connections})"
+        )
+        return client
+
+    def _needs_recycle(self) -> bool:
+        if time.monotonic() - self._created_at > self.max_age_s:
+            return True
+        return self._consecutive_failures >= self.max_failures
+
+    def _retire_current(self) -> None:
+        if self._client is not None:
+            self._retired.append((time.monotonic(), self._client))
+            self._recycle_count += 1
+        self._client = None
+        self._consecutive_failures = 0
+
+    def _close_expired_retirees(self, force: bool = False) -> list:
+        now = time.monotonic()
+        expired = [c for t, c in self._retired if force or now - t > RETIRE_GRACE_S]
+        self._retired = [(t, c) for t, c in self._retired if not (force or now - t > RETIRE_GRACE_S)]
+        return expired
+
+    def get(self):
+        """Return the shared client, creating or recycling it as needed.
+
+        Returns None when the SDK is unavailable or the client cannot be built;
+        callers already handle that case.
+        """
+        with self._lock:
+            if self._client is not None and self._needs_recycle():
+                logger.info("[GENAI] Recycling pooled client")
+                self._retire_current()
+            if self._client is None:
+                try:
+                    self._client = self._create()
+                    self._created_at = time.monotonic()
+                except Exception as e:
+                    self._last_error = str(e)
+                    logger.error(f"[GENAI] Could not create client: {e}")
+                    return None
+            client = self._client
+            expired = self._close_expired_retirees()
+        for old in expired:
+            _schedule_close(old)
+        return client
+
+    def current(self):
+        """The shared client if one has been built; never creates one."""
+        return self._client
+
+    def install(self, client) -> None:
+        """Use `client` as the shared client (e.g. a local fake in benchmarks)."""
+        with self._lock:
+            self._retire_current()
+            self._client = client
+            self._created_at = time.monotonic()
+
+    def record_success(self, client=None) -> None:
+        if client is None or client is self._client:
+            self._consecutive_failures = 0
+
+    def record_failure(self, client=None, error: Optional[BaseException] = None) -> None:
+        """Count a transport-level failure against the current client."""
+        if client is None or client is self._client:
+            self._consecutive_failures += 1
+            if error is not None:
+                self._last_error = str(error)
+
+    def recycle(self) -> None:
+        with self._lock:
+            self._retire_current()
+
+    def health(self) -> dict:
+        age = time.monotonic() - self._created_at if self._client is not None else None
+        return {
+            "client_ready": self._client is not None,
+            "healthy": self._client is not None and self._consecutive_failures < self.max_failures,
+            "age_s": round(age, 1) if age is not None else None,
+            "consecutive_failures": self._consecutive_failures,
+            "recycle_count": self._recycle_count,
+            "retired_pending_close": len(self._retired),
+            "last_error": self._last_error,
+            "pool": {
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive_connections,
+                "keepalive_expiry_s": self.keepalive_expiry,
+            },
+        }
+
+    async def aclose(self) -> None:
+        with self._lock:
+            self._retire_current()
+            clients = self._close_expired_retirees(force=True)
+        for client in clients:
+            await _close_client(client)
+
+
+async def _close_client(client) -> None:
+    try:
+        aio = getattr(client, "aio", None)
+        if aio is not None and hasattr(aio, "aclose"):
+            await aio.aclose()
+        if hasattr(client, "close"):
+            client.close()
+    except Exception as e:
+        logger.warning(f"[GENAI] Error while closing client: {e}")
+
+
+def _schedule_close(client) -> None:
+    try:
+        asyncio.get_running_loop().create_task(_close_client(client))
+    except RuntimeError:
+        if hasattr(client, "close"):
+            client.close()
+
+
+_registry: Optional[GenAIClientRegistry] = None
+
+
+def get_registry() -> GenAIClientRegistry:
+    global _registry
+    if _registry is None:
+        _registry = GenAIClientRegistry()
+    return _registry
+
+
+def get_default_client():
+    """Shared client for services called without an injected one."""
+    return get_registry().get()
+
+
+async def close_registry() -> None:
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
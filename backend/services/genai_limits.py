@@ -0,0 +1,206 @@
+"""Rate limiting, retries and circuit breaking for every Gemini call.
+
+`services.genai_async` routes each SDK call through `GenAILimiter.run`:
+
+1. a per-model circuit breaker rejects calls immediately while the model
+   keeps failing, instead of piling more load onto it;
+2. a process-wide token bucket smooths bursts to GENAI_RATE_PER_S;
+3. a per-model semaphore caps calls in flight;
+4. retryable failures (429, 5xx, transport errors) are retried with jittered
+   exponential backoff, waiting at least as long as the server's retry-after
+   hint when one is given.
+
+A call counts once against the breaker, when it has failed after all its
+retries; a half-open trial call is not retried. Non-retryable errors (e.g.
+400 invalid argument) are raised at once and do not count against the
+breaker.
+
+Configuration:
+    GENAI_RATE_PER_S            sustained calls per second, all models (default 10)
+    GENAI_BURST                 calls allowed in a burst (default 20)
+    GENAI_MODEL_CONCURRENCY     calls in flight per model (default 8)
+    GENAI_MODEL_LIMITS          JSON overrides, e.g. {"gemini-2.5-pro": 2}
+    GENAI_MAX_RETRIES           retries after the first attempt (default 4)
+    GENAI_BACKOFF_BASE_S        first backoff ceiling (default 0.5)
+    GENAI_BACKOFF_MAX_S         largest backoff (default 30)
+    GENAI_BREAKER_THRESHOLD     consecutive failed calls that open the circuit (default 5)
+    GENAI_BREAKER_RESET_S       how long the circuit stays open (default 30)
+"""
+import asyncio
+import json
+import os
+import re
+from typing import Any, Awaitable, Callable, Optional
+
+from services.logger import logger
+from services.rate_limit import CircuitBreaker, CircuitOpenError, TokenBucket, backoff_delay
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Key used for calls that are not tied to a model (file uploads, batch polling).
+NO_MODEL = "_files"
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(exc, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return False
+    code = _status_code(exc)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    from services.genai_async import _is_transport_error
+    return _is_transport_error(exc)
+
+
+def _parse_seconds(value) -> Optional[float]:
+    match = re.fullmatch(r"\s*([0-9]*\.?[0-9]+)\s*s?\s*", str(value))
+    return float(match.group(1)) if match else None
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Server-suggested wait: Retry-After header or a RetryInfo `retryDelay` detail."""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if headers is not None:
+        try:
+            value = headers.get("retry-after")
+        except Exception:
+            value = None
+        if value is not None and _parse_seconds(value) is not None:
+            return _parse_seconds(value)
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict):
+        for item in (details.get("error") or {}).get("details") or []:
+            if isinstance(item, dict) and "retryDelay" in item:
+                return _parse_seconds(item["retryDelay"])
+    return None
+
+
+class _ModelState:
+    def __init__(self, model: str, concurrency: int, threshold: int, reset_s: float):
+        self.limit = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.breaker = CircuitBreaker(model, threshold=threshold, reset_s=reset_s)
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+
+
+class GenAILimiter:
+    def __init__(
+        self,
+        rate_per_s: float = 10.0,
+        burst: float = 20.0,
+        model_concurrency: int = 8,
+        model_limits: Optional[dict] = None,
+        max_retries: int = 4,
+        backoff_base_s: float = 0.5,
+        backoff_max_s: float = 30.0,
+        breaker_threshold: int = 5,
+        breaker_reset_s: float = 30.0,
+    ):
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.model_concurrency = model_concurrency
+        self.model_limits = model_limits or {}
+        self.max_retries = max_retries
+        self.backoff_base_s = backoff_base_s
+        self.backoff_max_s = backoff_max_s
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset_s = breaker_reset_s
+        self._models: dict[str, _ModelState] = {}
+        self.throttled_s = 0.0
+
+    def _state(self, model: Optional[str]) -> _ModelState:
+        key = model or NO_MODEL
+        state = self._models.get(key)
+        if state is None:
+            concurrency = int(self.model_limits.get(key, self.model_concurrency))
+            state = _ModelState(key, concurrency, self.breaker_threshold, self.breaker_reset_s)
+            self._models[key] = state
+        return state
+
+    async def run(self, model: Optional[str], call: Callable[[], Awaitable[Any]]) -> Any:
+        """Await `call()` under the rate limit, concurrency cap, breaker and retry policy."""
+        state = self._state(model)
+        trial = state.breaker.state == "half_open"
+        state.breaker.before_call()
+        attempt = 0
+        while True:
+            self.throttled_s += await self.bucket.acquire()
+            async with state.semaphore:
+                state.in_flight += 1
+                state.calls += 1
+                try:
+                    result = await call()
+                except asyncio.CancelledError:
+                    state.breaker.release()
+                    raise
+                except Exception as e:
+                    error = e
+                else:
+                    state.breaker.record_success()
+                    return result
+                finally:
+                    state.in_flight -= 1
+
+            if not is_retryable(error):
+                state.breaker.release()
+                raise error
+            state.failures += 1
+            if trial or attempt >= self.max_retries or state.breaker.state != "closed":
+                # Out of retries, or the circuit opened meanwhile: surface the real error.
+                state.breaker.record_failure()
+                raise error
+            delay = max(backoff_delay(attempt, self.backoff_base_s, self.backoff_max_s), retry_after(error) or 0.0)
+            attempt += 1
+            state.retries += 1
+            logger.warning(
+                f"[GENAI] {model or NO_MODEL} call failed ({error}); retry {attempt}/{self.max_retries} in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    def stats(self) -> dict:
+        return {
+            "rate_per_s": self.bucket.rate,
+            "tokens_available": round(self.bucket.available, 2),
+            "throttled_s": round(self.throttled_s, 3),
+            "models": {
+                name: {
+                    "limit": state.limit,
+                    "in_flight": state.in_flight,
+                    "calls": state.calls,
+                    "retries": state.retries,
+                    "failures": state.failures,
+                    "breaker": state.breaker.state,
+                    "rejected": state.breaker.rejected,
+                }
+                for name, state in self._models.items()
+            },
+        }
+
+
+_limiter: Optional[GenAILimiter] = None
+
+
+def get_limiter() -> GenAILimiter:
+    global _limiter
+    if _limiter is None:
+        _limiter = GenAILimiter(
+            rate_per_s=float(os.getenv("GENAI_RATE_PER_S", "10")),
+            burst=float(os.getenv("GENAI_BURST", "20")),
+            model_concurrency=int(os.getenv("GENAI_MODEL_CONCURRENCY", "8")),
+            model_limits=json.loads(os.getenv("GENAI_MODEL_LIMITS", "{}") or "{}"),
+            max_retries=int(os.getenv("GENAI_MAX_RETRIES", "4")),
+            backoff_base_s=float(os.getenv("GENAI_BACKOFF_BASE_S", "0.5")),
+            backoff_max_s=float(os.getenv("GENAI_BACKOFF_MAX_S", "30")),
+            breaker_threshold=int(os.getenv("GENAI_BREAKER_THRESHOLD", "5")),
+            breaker_reset_s=float(os.getenv("GENAI_BREAKER_RESET_S", "30")),
+        )
+    return _limiter
@@ -0,0 +1,436 @@
+"""Background job queue for long-running conversation analysis.
+
+Submitting a recording returns a job id immediately; a bounded pool of worker
+tasks runs `process_conversation_audio` and records progress
+(queued -> transcribing -> diarizing -> done/failed). Jobs live in a local
+SQLite database, so queued and interrupted work is picked up again after a
+restart. Clients poll the job or subscribe to progress events.
+
+The database is the queue: idle workers claim the oldest queued row in one
+write transaction, so several worker processes sharing the file split the
+work between them whatever process accepted the upload, and queue depth is
+counted across all of them. A submit wakes this process's workers at once;
+the others notice within JOBS_POLL_S. Running jobs are heart-beaten, and on
+startup only jobs whose heartbeat went stale (their process died) are
+requeued. In single-process mode (no SHARED_STATE_URL) every running job is
+requeued, as before. On shutdown, running jobs get a drain period to finish.
+
+Configuration:
+    JOBS_DB_PATH           SQLite file (default jobs/jobs.sqlite3)
+    JOBS_AUDIO_DIR         where submitted audio is kept until processed (default jobs/audio)
+    JOBS_WORKERS           concurrent analyses (default 2)
+    JOBS_MAX_QUEUE_DEPTH   queued jobs accepted before submit is refused (default 100)
+    JOBS_POLL_S            how often idle workers look for queued jobs (default 1)
+    JOBS_HEARTBEAT_S       how often running jobs are marked alive (default 15)
+    JOBS_STALE_S           running jobs silent this long are requeued on startup (default 120)
+    JOBS_DRAIN_TIMEOUT_S   how long shutdown waits for running jobs (default 30)
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+from services.logger import logger
+from services.recordings_catalog import get_recordings_index
+from services.shared_state import get_shared_state
+
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join("jobs", "jobs.sqlite3"))
+JOBS_AUDIO_DIR = os.getenv("JOBS_AUDIO_DIR", os.path.join("jobs", "audio"))
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_QUEUE_DEPTH = int(os.getenv("JOBS_MAX_QUEUE_DEPTH", "100"))
+JOBS_POLL_S = float(os.getenv("JOBS_POLL_S", "1"))
+JOBS_HEARTBEAT_S = float(os.getenv("JOBS_HEARTBEAT_S", "15"))
+JOBS_STALE_S = float(os.getenv("JOBS_STALE_S", "120"))
+JOBS_DRAIN_TIMEOUT_S = float(os.getenv("JOBS_DRAIN_TIMEOUT_S", "30"))
+
+TERMINAL_STATUSES = ("done", "failed")
+
+# Watchers poll the database this often when the job may run in another worker.
+WATCH_POLL_S = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    audio_path TEXT NOT NULL,
+    audio_sha256 TEXT,
+    filename TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """Thread-safe SQLite persistence for jobs (call through asyncio.to_thread)."""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Other worker processes may hold the write lock briefly; wait for it.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def insert(self, job: dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, stage, audio_path, audio_sha256, filename, created_at, updated_at)"
+                " VALUES (:id, :status, :stage, :audio_path, :audio_sha256, :filename, :created_at, :updated_at)",
+                job,
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = :id", {**fields, "id": job_id})
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def claim_next(self, stage: str) -> Optional[dict]:
+        """Move the oldest queued job to running and return it, or None when none is queued.
+
+        BEGIN IMMEDIATE takes the database write lock before reading, so two
+        processes can never claim the same row.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', stage = ?, updated_at = ? WHERE id = ?",
+                        (stage, time.time(), row["id"]),
+                    )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+            if row is None:
+                return None
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return _row_to_job(job)
+
+    def counts(self) -> dict:
+        """Queued and running jobs across every process sharing the database."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) AS n FROM jobs WHERE status IN ('queued', 'running') GROUP BY status"
+            ).fetchall()
+        counts = {"queued": 0, "running": 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+    def touch(self, job_ids: list[str]) -> None:
+        """Heartbeat: bump updated_at of running jobs so other workers see them alive."""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET updated_at = ? WHERE id = ? AND status = 'running'", [(now, job_id) for job_id in job_ids]
+            )
+            self._conn.commit()
+
+    def requeue_interrupted(self, stale_before: Optional[float] = None) -> int:
+        """Reset interrupted running jobs to queued; returns how many were reset.
+
+        With `stale_before`, only running jobs last updated before that time
+        count as interrupted; newer ones belong to a live worker.
+        """
+        with self._lock:
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', updated_at = ?"
+                " WHERE status = 'running' AND updated_at < ?",
+                (time.time(), stale_before if stale_before is not None else float("inf")),
+            ).rowcount
+            self._conn.commit()
+        return requeued
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _row_to_job(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job.get("result") else None
+    return job
+
+
+def public_view(job: dict) -> dict:
+    """Job fields safe to return to clients."""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "filename": job.get("filename"),
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
+
+class JobQueue:
+    def __init__(
+        self,
+        db_path: str = JOBS_DB_PATH,
+        audio_dir: str = JOBS_AUDIO_DIR,
+        workers: int = JOBS_WORKERS,
+        max_depth: int = JOBS_MAX_QUEUE_DEPTH,
+        drain_timeout_s: float = JOBS_DRAIN_TIMEOUT_S,
+    ):
+        self.db_path = db_path
+        self.audio_dir = audio_dir
+        self.workers = workers
+        self.max_depth = max_depth
+        self.drain_timeout_s = drain_timeout_s
+        self.store: Optional[JobStore] = None
+        self._wakeup = asyncio.Event()
+        self._counts = {"queued": 0, "running": 0}
+        self._worker_tasks: list[asyncio.Task] = []
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._subscribers: dict[str, set[asyncio.Queue]] = {}
+        self._running = 0
+        self._running_ids: set[str] = set()
+        self._busy: set[asyncio.Task] = set()
+        self._draining = False
+
+    async def start(self) -> None:
+        os.makedirs(self.audio_dir, exist_ok=True)
+        self.store = await asyncio.to_thread(JobStore, self.db_path)
+        # Other live workers may share this database; leave their jobs alone.
+        stale_before = time.time() - JOBS_STALE_S if get_shared_state() is not None else None
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted, stale_before)
+        self._counts = await asyncio.to_thread(self.store.counts)
+        if requeued or self._counts["queued"]:
+            logger.info(
+                f"[JOBS] {self._counts['queued']} queued job(s) in {self.db_path} ({requeued} interrupted job(s) requeued)"
+            )
+        self._draining = False
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        self._heartbeat_task = asyncio.create_task(self._heartbeat())
+
+    async def stop(self) -> None:
+        # Idle workers stop now; busy ones get `drain_timeout_s` to finish their
+        # job. Jobs still running after that stay 'running' in the DB and are
+        # requeued once their heartbeat goes stale.
+        self._draining = True
+        for task in self._worker_tasks:
+            if task not in self._busy:
+                task.cancel()
+        if self._busy:
+            logger.info(f"[JOBS] Draining {len(self._busy)} running job(s) (up to {self.drain_timeout_s:.0f}s)")
+            await asyncio.wait(set(self._busy), timeout=self.drain_timeout_s)
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            await asyncio.gather(self._heartbeat_task, return_exceptions=True)
+            self._heartbeat_task = None
+        if self.store is not None:
+            await asyncio.to_thread(self.store.close)
+            self.store = None
+
+    def new_audio_path(self, filename: Optional[str]) -> str:
+        ext = os.path.splitext(filename or "")[1] or ".wav"
+        return os.path.join(self.audio_dir, f"{uuid.uuid4().hex}{ext}")
+
+    async def submit(self, audio_path: str, audio_sha256: Optional[str] = None, filename: Optional[str] = None) -> dict:
+        self._counts = await asyncio.to_thread(self.store.counts)
+        if self._counts["queued"] >= self.max_depth:
+            raise QueueFull(f"Job queue is full ({self.max_depth} queued)")
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "stage": "queued",
+            "audio_path": audio_path,
+            "audio_sha256": audio_sha256,
+            "filename": filename,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await asyncio.to_thread(self.store.insert, job)
+        self._counts["queued"] += 1
+        self._wakeup.set()
+        logger.info(f"[JOBS] Queued job {job['id']} (depth={self._counts['queued']})")
+        return {**job, "result": None, "error": None}
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        events: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(events)
+        return events
+
+    def unsubscribe(self, job_id: str, events: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is not None:
+            subscribers.discard(events)
+            if not subscribers:
+                del self._subscribers[job_id]
+
+    async def next_state(self, job_id: str, events: asyncio.Queue, current: dict) -> dict:
+        """Wait for the job's next state after `current`.
+
+        Progress of a job run by another worker process never reaches this
+        process's subscribers, so with shared state the store is polled too.
+        """
+        if get_shared_state() is None:
+            return await events.get()
+        while True:
+            try:
+                return await asyncio.wait_for(events.get(), timeout=WATCH_POLL_S)
+            except asyncio.TimeoutError:
+                job = await self.get(job_id)
+                if job is not None and (job["status"], job["stage"]) != (current["status"], current["stage"]):
+                    return public_view(job)
+
+    def stats(self) -> dict:
+        """`queued` and `running_all` count every process (as of the last poll); `running` is this one."""
+        return {
+            "queued": self._counts["queued"],
+            "running": self._running,
+            "running_all": self._counts["running"],
+            "workers": self.workers,
+            "max_depth": self.max_depth,
+        }
+
+    async def _set_state(self, job_id: str, **fields) -> None:
+        await asyncio.to_thread(self.store.update, job_id, **fields)
+        await self._publish(job_id)
+
+    async def _publish(self, job_id: str) -> None:
+        if not self._subscribers.get(job_id):
+            return
+        job = await self.get(job_id)
+        for events in list(self._subscribers.get(job_id, ())):
+            events.put_nowait(public_view(job))
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(JOBS_HEARTBEAT_S)
+            if self._running_ids:
+                try:
+                    await asyncio.to_thread(self.store.touch, list(self._running_ids))
+                except Exception as e:
+                    logger.warning(f"[JOBS] Heartbeat failed: {e}")
+
+    async def _claim(self) -> Optional[dict]:
+        """Claim the next queued job, waiting up to JOBS_POLL_S (or a local submit) when none is queued."""
+        self._wakeup.clear()
+        try:
+            job = await asyncio.to_thread(self.store.claim_next, "transcribing")
+        except sqlite3.OperationalError as e:
+            # e.g. "database is locked" under heavy contention; try again on the next poll.
+            logger.warning(f"[JOBS] Could not claim a job: {e}")
+            job = None
+        if job is not None:
+            return job
+        self._counts = await asyncio.to_thread(self.store.counts)
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), JOBS_POLL_S)
+        except asyncio.TimeoutError:
+            pass
+        return None
+
+    async def _worker(self, index: int) -> None:
+        while not self._draining:
+            job = await self._claim()
+            if job is None:
+                continue
+            job_id = job["id"]
+            task = asyncio.current_task()
+            self._running += 1
+            self._running_ids.add(job_id)
+            self._busy.add(task)
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[JOBS] Job {job_id} crashed: {e}", exc_info=True)
+                # The job is terminal and never retried, so its upload is no longer needed.
+                await asyncio.to_thread(_remove_quietly, job["audio_path"])
+                await self._set_state(job_id, status="failed", stage="failed", error=str(e))
+            finally:
+                self._running -= 1
+                self._busy.discard(task)
+                self._running_ids.discard(job_id)
+
+    async def _run(self, job: dict) -> None:
+        """Process a job this worker has claimed (status already 'running')."""
+        from services.voice_to_text_service import process_conversation_audio
+
+        job_id = job["id"]
+        await self._publish(job_id)
+        if not os.path.exists(job["audio_path"]):
+            await self._set_state(job_id, status="failed", stage="failed", error="Audio file missing")
+            return
+
+        current = {"stage": job["stage"]}
+
+        async def on_progress(stage: str) -> None:
+            if stage != current["stage"]:
+                current["stage"] = stage
+                await self._set_state(job_id, stage=stage)
+
+        result = await process_conversation_audio(
+            job["audio_path"], audio_sha256=job["audio_sha256"], on_progress=on_progress
+        )
+        await get_recordings_index().set_transcript_status(
+            job["audio_sha256"], "failed" if "error" in result else "done"
+        )
+        if "error" in result:
+            await self._set_state(
+                job_id, status="failed", stage="failed", error=result["error"], result=json.dumps(result)
+            )
+        else:
+            result["success"] = True
+            await self._set_state(job_id, status="done", stage="done", result=json.dumps(result))
+        await asyncio.to_thread(_remove_quietly, job["audio_path"])
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_job_queue() -> JobQueue:
+    global _queue
+    if _queue is None:
+        _queue = JobQueue()
+    return _queue
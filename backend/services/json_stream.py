@@ -0,0 +1,218 @@
+"""Incremental parsing of a JSON object as it streams in.
+
+LLM responses arrive in arbitrary text chunks. `JsonFieldStream` scans the
+text once, character by character, and reports each top-level field of the
+object as soon as its value is complete, so callers can forward e.g. the
+"subjective" section of a SOAP note before the "plan" has been generated.
+Markdown code fences and prose before the opening brace are skipped.
+
+`repair_json` fixes the defects models commonly produce in a finished
+response: surrounding fences or prose, trailing commas, and output cut off
+mid-object (unterminated strings, unclosed arrays/objects).
+"""
+import json
+from typing import Any
+
+
+class JsonFieldStream:
+    def __init__(self):
+        self.text = ""
+        self._pos = 0            # absolute offset of the next character to scan
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self._key: str | None = None
+        self._token_start: int | None = None
+        self._expect = "key"     # "key" | "colon" | "value" at depth 1
+        self.done = False
+
+    def feed(self, chunk: str) -> list[tuple[str, Any]]:
+        """Consume `chunk` and return the `(key, value)` pairs it completed."""
+        if not chunk or self.done:
+            return []
+        self.text += chunk
+        text = self.text
+        fields = []
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+            field = self._step(ch, text)
+            if field is not None:
+                fields.append(field)
+            self._pos += 1
+        return fields
+
+    def _step(self, ch: str, text: str):
+        if not self._started:
+            if ch == "{":
+                self._started = True
+                self._depth = 1
+            return None
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._depth == 1 and self._expect == "key":
+                    self._key = json.loads(text[self._token_start:self._pos + 1])
+                    self._token_start = None
+                    self._expect = "colon"
+            return None
+
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._token_start is None:
+                self._token_start = self._pos
+            return None
+        if ch in "{[":
+            if self._depth == 1 and self._token_start is None:
+                self._token_start = self._pos
+            self._depth += 1
+            return None
+        if ch in "}]":
+            self._depth -= 1
+            if self._depth == 0:
+                self.done = True
+                return self._finish_value(text)
+            return None
+        if self._depth != 1:
+            return None
+        if ch == ":" and self._expect == "colon":
+            self._expect = "value"
+            return None
+        if ch == ",":
+            return self._finish_value(text)
+        if not ch.isspace() and self._token_start is None and self._expect == "value":
+            self._token_start = self._pos
+        return None
+
+    def _finish_value(self, text: str):
+        field = None
+        if self._key is not None and self._token_start is not None:
+            raw = text[self._token_start:self._pos].strip()
+            try:
+                field = (self._key, json.loads(raw))
+            except ValueError:
+                try:
+                    field = (self._key, json.loads(_drop_trailing_commas(raw)))
+                except ValueError:
+                    field = None
+        self._key = None
+        self._token_start = None
+        self._expect = "key"
+        return field
+
+
+def _drop_trailing_commas(text: str) -> str:
+    """Remove commas directly before a closing bracket, outside strings."""
+    out: list[str] = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+        out.append(ch)
+    return "".join(out)
+
+
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def _close(parts: list[str], stack: list[str], in_string: bool, escape: bool) -> str:
+    text = "".join(parts)
+    if in_string:
+        if escape:
+            text = text[:-1]
+        text += '"'
+    text = text.rstrip().rstrip(",").rstrip()
+    if text.endswith(":"):
+        text += " null"
+    return text + "".join(reversed(stack))
+
+
+def _strip_trailing_comma(parts: list[str]) -> None:
+    i = len(parts) - 1
+    while i >= 0 and parts[i].isspace():
+        i -= 1
+    if i >= 0 and parts[i] == ",":
+        del parts[i]
+
+
+def repair_json(text: str) -> str:
+    """Best-effort repair of a model's JSON object; returns text for `json.loads`.
+
+    Text outside the outermost object is dropped and trailing commas removed.
+    A truncated object is closed, backing off to the last complete element
+    when closing at the cut point does not yield valid JSON.
+    """
+    start = text.find("{")
+    if start == -1:
+        return text.strip()
+    parts: list[str] = []
+    stack: list[str] = []
+    cuts: list[tuple[int, tuple]] = []  # output length and open brackets at each comma
+    in_string = escape = False
+    for ch in text[start:]:
+        if in_string:
+            parts.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]":
+            _strip_trailing_comma(parts)
+            if stack:
+                ch = stack.pop()
+            if not stack:
+                parts.append(ch)
+                return "".join(parts)
+        elif ch == ",":
+            cuts.append((len(parts), tuple(stack)))
+        parts.append(ch)
+
+    # Truncated: close everything still open.
+    candidate = _close(parts, stack, in_string, escape)
+    try:
+        json.loads(candidate)
+        return candidate
+    except ValueError:
+        pass
+    for length, open_stack in reversed(cuts):
+        fallback = _close(parts[:length], list(open_stack), False, False)
+        try:
+            json.loads(fallback)
+            return fallback
+        except ValueError:
+            continue
+    return candidate
+
+
+def loads_lenient(text: str) -> tuple[Any, bool]:
+    """Parse model output, repairing it if needed.
+
+    Returns `(value, repaired)`; raises `ValueError` when even the repaired
+    text is not valid JSON.
+    """
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    return json.loads(repair_json(text)), True
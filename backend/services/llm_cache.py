@@ -0,0 +1,207 @@
+"""Prompt-level response cache with in-flight request coalescing.
+
+Summary, SOAP and AI-edit calls are keyed on model, prompt template version and
+whitespace-normalized input. A repeated request within the TTL is served from
+memory, and identical requests arriving while one is still running wait for
+that single upstream call instead of issuing their own. With several workers
+(`SHARED_STATE_URL` set) a local miss also checks the shared state before
+calling upstream, and fresh responses are written there for the other workers.
+
+Configuration:
+    LLM_CACHE_ENABLED      "0" disables caching and coalescing (default "1")
+    LLM_CACHE_MAX_ENTRIES  LRU capacity (default 512)
+    LLM_CACHE_TTL_S        entry lifetime in seconds (default 900)
+"""
+import asyncio
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Optional
+
+from services.logger import logger
+from services.shared_state import SharedState, get_shared_state
+
+_MISSING = object()
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace so cosmetic differences hit the same entry."""
+    return " ".join((text or "").split())
+
+
+def make_key(kind: str, model: str, template_version: str, text: str) -> str:
+    raw = json.dumps([kind, model, template_version, normalize_text(text)], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = 512, ttl_s: float = 900.0, shared: Optional[SharedState] = None):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def _store(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def _shared_put(self, key: str, value: Any) -> None:
+        try:
+            await self.shared.set_json(f"llm:{key}", value, self.ttl_s)
+        except Exception as e:
+            logger.warning(f"[CACHE] Could not write shared LLM cache entry: {e}")
+
+    async def _compute_shared(
+        self, key: str, compute: Callable[[], Awaitable[Any]], cacheable: Optional[Callable[[Any], bool]]
+    ) -> Any:
+        """`compute`, preceded by a shared-state lookup and followed by a write-through."""
+        try:
+            value = await self.shared.get_json(f"llm:{key}")
+        except Exception as e:
+            logger.warning(f"[CACHE] Shared LLM cache lookup failed: {e}")
+            value = None
+        if value is not None:
+            self.shared_hits += 1
+            return value
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            await self._shared_put(key, value)
+        return value
+
+    def _on_done(self, key: str, cacheable: Optional[Callable[[Any], bool]], task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        value = task.result()
+        if cacheable is None or cacheable(value):
+            self._store(key, value)
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Return the cached value, join an identical in-flight call, or run `compute`.
+
+        The upstream call runs as its own task, so a waiter disconnecting does
+        not cancel it for everyone else. Each caller gets its own copy of the
+        result. Values rejected by `cacheable` (e.g. error payloads) are shared
+        with concurrent waiters but not stored.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return copy.deepcopy(value)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            if self.shared is not None:
+                task = asyncio.ensure_future(self._compute_shared(key, compute, cacheable))
+            else:
+                task = asyncio.ensure_future(compute())
+            self._inflight[key] = task
+            task.add_done_callback(partial(self._on_done, key, cacheable))
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def peek(self, key: str) -> Any:
+        """Cached value (a copy) or None; counts as a hit when found."""
+        value = self._lookup(key)
+        if value is _MISSING:
+            return None
+        self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, key: str, value: Any) -> None:
+        self._store(key, copy.deepcopy(value))
+        if self.shared is not None:
+            try:
+                asyncio.get_running_loop().create_task(self._shared_put(key, copy.deepcopy(value)))
+            except RuntimeError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "shared_hits": self.shared_hits,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+        }
+
+
+_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide cache, or None when LLM_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("LLM_CACHE_ENABLED", "1") == "0":
+        return None
+    if _cache is None:
+        _cache = ResponseCache(
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+            ttl_s=float(os.getenv("LLM_CACHE_TTL_S", "900")),
+            shared=get_shared_state(),
+        )
+    return _cache
+
+
+def lookup_llm_response(kind: str, model: Optional[str], template_version: str, text: str) -> Any:
+    """Cached response for these inputs, or None (used by streaming callers)."""
+    cache = get_response_cache()
+    if cache is None or not model:
+        return None
+    return cache.peek(make_key(kind, model, template_version, text))
+
+
+def store_llm_response(kind: str, model: Optional[str], template_version: str, text: str, value: Any) -> None:
+    cache = get_response_cache()
+    if cache is not None and model:
+        cache.put(make_key(kind, model, template_version, text), value)
+
+
+async def cached_llm_call(
+    kind: str,
+    model: Optional[str],
+    template_version: str,
+    text: str,
+    compute: Callable[[], Awaitable[Any]],
+    cacheable: Optional[Callable[[Any], bool]] = None,
+) -> Any:
+    """Run `compute` through the shared cache (no-op when disabled or unconfigured)."""
+    cache = get_response_cache()
+    if cache is None or not model:
+        return await compute()
+    key = make_key(kind, model, template_version, text)
+    return await cache.get_or_compute(key, compute, cacheable)
@@ -0,0 +1,183 @@
+"""Schemas and tolerant parsing for structured LLM output.
+
+`parse_llm_json` turns a model response into a validated dict: plain
+`json.loads` first, then `repair_json` for fenced, trailing-comma or truncated
+output, then schema validation that fills defaults and coerces loose types
+(e.g. a numeric timestamp). Only when that fails does the caller spend a
+second `generate_content` round trip. Outcomes are counted per kind so the
+repair and retry rates show up under `/api/v1/stats/llm-json`.
+
+The same models are sent to Gemini as native `response_schema` structured
+output (see `structured_config`), so prompts no longer describe the JSON shape
+in prose. Set LLM_STRUCTURED_OUTPUT=0 to fall back to the prose schemas.
+"""
+import os
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+from services.json_stream import loads_lenient
+from services.logger import logger
+from services.metrics import timed
+
+STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1") == "1"
+
+
+class _Lenient(BaseModel):
+    model_config = ConfigDict(extra="ignore", coerce_numbers_to_str=True)
+
+
+def _list_or_empty(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+class SOAPVitals(_Lenient):
+    Temp: Optional[str] = None
+    BP: Optional[str] = None
+    HR: Optional[str] = None
+    RR: Optional[str] = None
+    SpO2: Optional[str] = None
+
+
+class SOAPObjective(_Lenient):
+    vitals: SOAPVitals = SOAPVitals()
+    exam_findings: list[str] = []
+    labs_imaging: list[str] = []
+
+    @field_validator("vitals", mode="before")
+    @classmethod
+    def _vitals_default(cls, value):
+        return value or {}
+
+    @field_validator("exam_findings", "labs_imaging", mode="before")
+    @classmethod
+    def _as_list(cls, value):
+        return _list_or_empty(value)
+
+
+class SOAPNote(_Lenient):
+    patient_name: Optional[str] = None
+    date: Optional[str] = None
+    age_gender: Optional[str] = None
+    reason_for_visit: Optional[str] = None
+    subjective: list[str] = []
+    objective: SOAPObjective = SOAPObjective()
+    assessment: list[str] = []
+    plan: list[str] = []
+
+    @field_validator("objective", mode="before")
+    @classmethod
+    def _objective_default(cls, value):
+        return value or {}
+
+    @field_validator("subjective", "assessment", "plan", mode="before")
+    @classmethod
+    def _as_list(cls, value):
+        return _list_or_empty(value)
+
+
+class TimelineEntry(_Lenient):
+    speaker: str = Field("", description="doctor or patient")
+    text: str = ""
+    timestamp: str = Field("", description="MM:SS from the start of the transcript, if known")
+
+    @field_validator("speaker", "text", "timestamp", mode="before")
+    @classmethod
+    def _none_to_empty(cls, value):
+        return "" if value is None else value
+
+
+class SpeakerAnalysis(_Lenient):
+    doctor_parts: str = ""
+    patient_parts: str = ""
+    timeline: list[TimelineEntry] = []
+    confidence: float = 0.0
+
+    @field_validator("doctor_parts", "patient_parts", mode="before")
+    @classmethod
+    def _none_to_empty(cls, value):
+        return "" if value is None else value
+
+    @field_validator("timeline", mode="before")
+    @classmethod
+    def _drop_non_objects(cls, value):
+        return [item for item in _list_or_empty(value) if isinstance(item, dict)]
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _confidence_default(cls, value):
+        return value or 0.0
+
+
+SCHEMAS: dict[str, type[BaseModel]] = {
+    "soap": SOAPNote,
+    "speakers": SpeakerAnalysis,
+}
+
+
+def structured_config(kind: str) -> dict:
+    """Generation config requesting JSON that conforms to the `kind` schema."""
+    return {"response_mime_type": "application/json", "response_schema": SCHEMAS[kind]}
+
+
+class LLMOutputError(ValueError):
+    """The response could not be parsed or validated even after repair."""
+
+
+class ParseStats:
+    """Per-kind counts of how structured responses were recovered.
+
+    clean: parsed as-is; repaired: parsed after `repair_json`; invalid: the
+    first response was unusable; retried: a second LLM call was made;
+    failed: the retried response was unusable too.
+    """
+
+    OUTCOMES = ("clean", "repaired", "invalid", "retried", "failed")
+
+    def __init__(self):
+        self._counts: dict[str, dict[str, int]] = {}
+
+    def record(self, kind: str, outcome: str) -> None:
+        counts = self._counts.setdefault(kind, dict.fromkeys(self.OUTCOMES, 0))
+        counts[outcome] += 1
+
+    def snapshot(self) -> dict:
+        result = {}
+        for kind, counts in self._counts.items():
+            responses = counts["clean"] + counts["repaired"] + counts["invalid"]
+            result[kind] = {
+                **counts,
+                "repair_rate": round(counts["repaired"] / responses, 4) if responses else 0.0,
+                "retry_rate": round(counts["retried"] / responses, 4) if responses else 0.0,
+            }
+        return result
+
+
+parse_stats = ParseStats()
+
+
+@timed("json_parse")
+def parse_llm_json(kind: str, text: str, retry: bool = False) -> dict:
+    """Parse, repair and validate a `kind` response ("soap" or "speakers").
+
+    Pass `retry=True` for the response to a second, stricter request so it is
+    counted as a retry. Raises `LLMOutputError` when the text is unusable.
+    """
+    if retry:
+        parse_stats.record(kind, "retried")
+    try:
+        value, repaired = loads_lenient(text or "")
+        if not isinstance(value, dict):
+            raise ValueError(f"Expected a JSON object, got {type(value).__name__}")
+        validated = SCHEMAS[kind].model_validate(value).model_dump()
+    except (ValueError, ValidationError) as e:
+        parse_stats.record(kind, "failed" if retry else "invalid")
+        logger.warning(f"[LLM] Unusable {kind} JSON ({'retry' if retry else 'first attempt'}): {e}")
+        raise LLMOutputError(str(e)) from e
+    if not retry:
+        parse_stats.record(kind, "repaired" if repaired else "clean")
+    if repaired:
+        logger.info(f"[LLM] Repaired malformed {kind} JSON without a retry")
+    return validated
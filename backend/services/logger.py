@@ -1,21 +1,237 @@
+"""Application logging with a non-blocking, queue-based backend.
+
+Call sites only enqueue records: the root logger's single handler puts them
+on a bounded in-memory queue and a background thread formats and writes
+them to the console and a rotating log file. When the queue is full, records
+below WARNING are dropped at once; warnings and errors wait at most
+LOG_FULL_WAIT_S for room and are dropped after that, so an error storm cannot
+stall the event loop. Drops are counted per level and, with the queue depth,
+exported on /metrics.
+
+File output is one JSON object per line carrying the request id of the HTTP
+request that produced it (see `RequestIdMiddleware`). Chatty modules can be
+sampled: with LOG_SAMPLE_RATES="voice_to_text_service=0.1" only one in ten
+of that module's INFO/DEBUG records is kept; warnings and errors always are.
+
+Configuration:
+    LOG_LEVEL           root level (default INFO)
+    LOG_FILE            log file path (default logs/backend.log)
+    LOG_PER_PROCESS     "1" adds the process id to the file name (backend.<pid>.log);
+                        set by serve.py for multi-worker runs, since rotating one
+                        file from several processes clobbers and interleaves it
+    LOG_FORMAT          file format, "json" or "text" (default json)
+    LOG_MAX_BYTES       rotate the file past this size (default 50 MiB)
+    LOG_ROTATE_WHEN     rotate on a schedule instead, e.g. "midnight" or "H"
+    LOG_BACKUP_COUNT    rotated files kept (default 5)
+    LOG_QUEUE_SIZE      records buffered for the writer thread (default 10000)
+    LOG_FULL_WAIT_S     longest a warning/error waits for a full queue (default 0.005)
+    LOG_SAMPLE_RATES    comma-separated module=rate pairs for INFO/DEBUG sampling
+"""
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import uuid
+from datetime import datetime, timezone
 
 # Create a logs directory if it doesn't exist
 LOG_DIR = "logs"
 os.makedirs(LOG_DIR, exist_ok=True)
 
-# Configure the logger
-LOG_FILE = os.path.join(LOG_DIR, "backend.log")
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", os.path.join(LOG_DIR, "backend.log"))
+if os.getenv("LOG_PER_PROCESS", "0") == "1":
+    _root_name, _ext = os.path.splitext(LOG_FILE)
+    LOG_FILE = f"{_root_name}.{os.getpid()}{_ext}"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_FULL_WAIT_S = float(os.getenv("LOG_FULL_WAIT_S", "0.005"))
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+# Id of the HTTP request being handled, "-" outside a request.
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("request_id", default="-")
+
+
+def _parse_sample_rates(spec: str) -> dict[str, float]:
+    rates = {}
+    for item in spec.split(","):
+        module, sep, rate = item.partition("=")
+        if sep and module.strip():
+            try:
+                rates[module.strip()] = min(max(float(rate), 0.0), 1.0)
+            except ValueError:
+                pass
+    return rates
+
+
+LOG_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "request_id": getattr(record, "request_id", "-"),
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps the request id and applies per-module sampling on the caller's thread."""
+
+    def __init__(self, sample_rates: dict[str, float]):
+        super().__init__()
+        self.sample_rates = sample_rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.sample_rates and record.levelno < logging.WARNING:
+            rate = self.sample_rates.get(record.module)
+            if rate is not None and random.random() >= rate:
+                return False
+        record.request_id = request_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never stalls its caller on a full queue.
+
+    Records below WARNING are dropped at once; warnings and errors get up to
+    `full_wait_s` for the writer to make room before they are dropped too.
+    """
+
+    def __init__(self, log_queue: queue.Queue, full_wait_s: float = LOG_FULL_WAIT_S):
+        super().__init__(log_queue)
+        self.full_wait_s = full_wait_s
+        self.dropped: dict[str, int] = {}
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args and the traceback now, so the writer thread gets plain
+        # data; formatting itself happens on the writer thread.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            pass
+        if record.levelno >= logging.WARNING and self.full_wait_s > 0:
+            try:
+                self.queue.put(record, timeout=self.full_wait_s)
+                return
+            except queue.Full:
+                pass
+        self.dropped[record.levelname] = self.dropped.get(record.levelname, 0) + 1
+
+    def stats(self) -> dict:
+        return {
+            "queued": self.queue.qsize(),
+            "capacity": self.queue.maxsize,
+            "dropped": dict(self.dropped),
+        }
+
+
+def _file_handler() -> logging.Handler:
+    directory = os.path.dirname(LOG_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if LOG_ROTATE_WHEN:
+        handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    else:
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+        )
+    handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+def _console_handler() -> logging.Handler:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return handler
+
+
+_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = NonBlockingQueueHandler(_queue)
+queue_handler.addFilter(ContextFilter(LOG_SAMPLE_RATES))
+_listener = logging.handlers.QueueListener(
+    _queue, _console_handler(), _file_handler(), respect_handler_level=True
 )
 
+_root = logging.getLogger()
+_root.setLevel(LOG_LEVEL)
+for _handler in list(_root.handlers):
+    _root.removeHandler(_handler)
+_root.addHandler(queue_handler)
+_listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread (safe to call twice)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
+
+
+class RequestIdMiddleware:
+    """ASGI middleware binding a request id to every log record of the request.
+
+    Reuses the client's X-Request-ID when present and echoes the id back.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
+
+
 # Create a logger instance
 logger = logging.getLogger("backend_logger")
 
@@ -0,0 +1,181 @@
+"""Chunked, parallel transcription of long recordings.
+
+A single `generate_content` call over a whole consultation is slow and gets
+truncated at `max_output_tokens`. In long-audio mode the recording is cut at
+the quietest point near every `LONG_AUDIO_SEGMENT_S` seconds, each segment is
+extended backwards by a short overlap, and segments are transcribed
+concurrently. The texts are then stitched in order, dropping words repeated
+across the overlap. Wall-clock time tracks segment length, not total length.
+
+Configuration:
+    LONG_AUDIO_THRESHOLD_S     recordings longer than this use long-audio mode (default 300, 0 disables)
+    LONG_AUDIO_SEGMENT_S       target segment length (default 60)
+    LONG_AUDIO_OVERLAP_S       audio repeated at the start of each segment (default 1.5)
+    LONG_AUDIO_SEARCH_S        how far around the target to look for silence (default 10)
+    LONG_AUDIO_MAX_PARALLEL    segments transcribed at the same time (default 4)
+"""
+import asyncio
+import os
+import re
+from typing import Awaitable, Callable, Optional
+
+import numpy as np
+
+from services.audio_utils import AudioSource, frame_rms, pcm_to_wav_bytes
+from services.gemini_stt import transcribe_wav_bytes
+from services.genai_client import get_default_client
+from services.logger import logger
+
+LONG_AUDIO_THRESHOLD_S = float(os.getenv("LONG_AUDIO_THRESHOLD_S", "300"))
+LONG_AUDIO_SEGMENT_S = float(os.getenv("LONG_AUDIO_SEGMENT_S", "60"))
+LONG_AUDIO_OVERLAP_S = float(os.getenv("LONG_AUDIO_OVERLAP_S", "1.5"))
+LONG_AUDIO_SEARCH_S = float(os.getenv("LONG_AUDIO_SEARCH_S", "10"))
+LONG_AUDIO_MAX_PARALLEL = int(os.getenv("LONG_AUDIO_MAX_PARALLEL", "4"))
+
+ENERGY_FRAME_MS = 50
+# Longest run of words considered when removing overlap duplicates.
+MAX_OVERLAP_WORDS = 40
+
+
+def is_long_audio(duration: Optional[float]) -> bool:
+    return duration is not None and LONG_AUDIO_THRESHOLD_S > 0 and duration > LONG_AUDIO_THRESHOLD_S
+
+
+def plan_segments(
+    energies: np.ndarray,
+    frame_len: int,
+    total_frames: int,
+    sample_rate: int,
+    segment_s: float = LONG_AUDIO_SEGMENT_S,
+    overlap_s: float = LONG_AUDIO_OVERLAP_S,
+    search_s: float = LONG_AUDIO_SEARCH_S,
+) -> list[dict]:
+    """Choose cut points at the quietest frame near each segment boundary.
+
+    Returns segments with nominal `[start, end)` sample ranges that tile the
+    recording and a `read_start` that includes the overlap with the previous
+    segment.
+    """
+    target = int(segment_s * sample_rate)
+    search = int(search_s * sample_rate)
+    overlap = int(overlap_s * sample_rate)
+    cuts = [0]
+    while total_frames - cuts[-1] > target + search:
+        ideal = cuts[-1] + target
+        lo = max(cuts[-1] + target // 2, ideal - search) // frame_len
+        hi = min(total_frames - 1, ideal + search) // frame_len
+        window = energies[lo:hi + 1]
+        best = lo + int(np.argmin(window)) if len(window) else ideal // frame_len
+        cuts.append(best * frame_len + frame_len // 2)
+    cuts.append(total_frames)
+    return [
+        {"index": i, "start": start, "end": end, "read_start": max(0, start - overlap)}
+        for i, (start, end) in enumerate(zip(cuts, cuts[1:]))
+    ]
+
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def strip_overlap(previous_text: str, text: str, max_words: int = MAX_OVERLAP_WORDS) -> str:
+    """Drop the leading words of `text` that repeat the tail of `previous_text`."""
+    prev = [_normalize_word(w) for w in previous_text.split()[-max_words:]]
+    words = text.split()
+    head = [_normalize_word(w) for w in words[:max_words]]
+    for k in range(min(len(prev), len(head)), 0, -1):
+        if prev[-k:] == head[:k] and any(prev[-k:]):
+            return " ".join(words[k:])
+    return text
+
+
+def stitch_segments(segments: list[dict]) -> tuple[str, list[dict]]:
+    """Join segment texts in order, de-duplicating overlaps.
+
+    Returns the full text and the segments with their `text` de-duplicated.
+    """
+    stitched = []
+    previous = ""
+    for seg in sorted(segments, key=lambda s: s["index"]):
+        text = strip_overlap(previous, seg["text"]) if previous else seg["text"]
+        stitched.append({**seg, "text": text})
+        if text:
+            previous = text
+    return "\n".join(s["text"] for s in stitched if s["text"]), stitched
+
+
+def _plan_for_source(source: AudioSource, segment_s: float) -> list[dict]:
+    frame_len = max(1, source.sample_rate * ENERGY_FRAME_MS // 1000)
+    # Stream the file once to get per-frame energy; blocks are frame-aligned.
+    block = frame_len * 2000
+    energies = np.concatenate([frame_rms(b, frame_len) for b in source.blocks(block)] or [np.zeros(0)])
+    return plan_segments(energies, frame_len, source.frames, source.sample_rate, segment_s=segment_s)
+
+
+async def transcribe_long_audio(
+    audio_path: str,
+    genai_client=None,
+    on_segment: Optional[Callable[[dict], Awaitable[None]]] = None,
+    max_parallel: int = LONG_AUDIO_MAX_PARALLEL,
+    segment_s: float = LONG_AUDIO_SEGMENT_S,
+) -> Optional[dict]:
+    """Transcribe a long recording segment by segment.
+
+    `on_segment` (optional, async) receives each segment as soon as it is
+    transcribed, in completion order, with its raw (overlapping) text.
+
+    Returns `{"text": str, "segments": [{"index", "start", "end", "text"}]}`
+    with timestamps in seconds, or None if nothing could be transcribed. A
+    segment's `start` is the point its audio was read from, so it includes the
+    overlap with the previous segment.
+    """
+    model = os.getenv("GEMINI_STT_MODEL")
+    if not model:
+        logger.error("GEMINI_STT_MODEL not set in environment; please set it in backend/.env")
+        return None
+    client = genai_client or get_default_client()
+    if client is None:
+        logger.error("[GEMINI] GenAI client unavailable")
+        return None
+
+    source = await asyncio.to_thread(AudioSource, audio_path)
+    plan = await asyncio.to_thread(_plan_for_source, source, segment_s)
+    sample_rate = source.sample_rate
+    logger.info(
+        f"[GEMINI] Long-audio mode: {source.duration:.1f}s split into {len(plan)} segments "
+        f"(parallel={max_parallel})"
+    )
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run(seg: dict) -> dict:
+        async with semaphore:
+            samples = await asyncio.to_thread(source.read, seg["read_start"], seg["end"])
+            wav_bytes = await asyncio.to_thread(pcm_to_wav_bytes, samples, sample_rate)
+            del samples
+            result = {
+                "index": seg["index"],
+                # Where the transcribed audio begins, overlap included: the
+                # model's timestamps for this segment are relative to it.
+                "start": round(seg["read_start"] / sample_rate, 2),
+                "end": round(seg["end"] / sample_rate, 2),
+            }
+            try:
+                result["text"] = await transcribe_wav_bytes(client, model, wav_bytes)
+            except Exception as e:
+                logger.error(f"[GEMINI] Segment {seg['index']} transcription failed: {e}")
+                result["text"] = ""
+                result["error"] = str(e)
+        if on_segment is not None:
+            await on_segment(result)
+        return result
+
+    results = await asyncio.gather(*(run(seg) for seg in plan))
+    if not any(r["text"] for r in results):
+        logger.warning("[GEMINI] Long-audio transcription returned no text")
+        return None
+    text, segments = stitch_segments(results)
+    failed = sum(1 for r in results if "error" in r)
+    logger.info(
+        f"[GEMINI] Long-audio transcription done. Length: {len(text)} characters, failed segments: {failed}"
+    )
+    return {"text": text, "segments": segments}
@@ -0,0 +1,309 @@
+"""Latency histograms, counters and gauges exposed in Prometheus text format.
+
+`stage("stt")` times one step of a request into `ezigame_stage_seconds` and,
+when OpenTelemetry tracing is on, wraps it in a span of the same name. The
+HTTP middleware records `ezigame_http_request_seconds` per route and keeps an
+in-flight gauge. Components that already keep counters (caches, job queue,
+rate limiter, JSON parse stats) are read through collectors at scrape time
+instead of being updated on the hot path.
+
+With METRICS_ENABLED=0 every recording call returns after one flag check and
+`stage` hands back a shared no-op context manager.
+
+Configuration:
+    METRICS_ENABLED    "0" disables recording and /metrics (default "1")
+    OTEL_TRACING       "1" emits OpenTelemetry spans for each stage; needs
+                       opentelemetry-api and a configured SDK (default "0")
+"""
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterable, Optional
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+OTEL_TRACING = os.getenv("OTEL_TRACING", "0") == "1"
+
+NAMESPACE = "ezigame"
+# Seconds; spans sub-millisecond parsing up to multi-minute transcriptions.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_NOOP = nullcontext()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labels: Iterable[str] = ()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED or not amount:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    render = Counter.render
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        lines = self.header()
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[tuple]]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collect: Callable[[], Iterable[tuple]]) -> None:
+        """`collect()` yields (name, kind, help, {labels}, value) samples at scrape time."""
+        self._collectors.append(collect)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.render()
+        seen = set()
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception:
+                # A broken collector must not take the whole scrape down.
+                continue
+            for name, kind, help_text, labels, value in samples:
+                full_name = f"{NAMESPACE}_{name}"
+                if full_name not in seen:
+                    seen.add(full_name)
+                    lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} {kind}"]
+                names = tuple(labels)
+                lines.append(
+                    f"{full_name}{_format_labels(names, tuple(labels[n] for n in names))} {_format_value(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_LATENCY = registry.register(Histogram(
+    "http_request_seconds", "HTTP request latency by route", ("method", "route", "status")
+))
+HTTP_IN_FLIGHT = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served"))
+STAGE_LATENCY = registry.register(Histogram("stage_seconds", "Latency of one processing stage", ("stage",)))
+GENAI_LATENCY = registry.register(Histogram("genai_call_seconds", "Gemini SDK call latency", ("model", "method")))
+GENAI_ERRORS = registry.register(Counter("genai_errors_total", "Failed Gemini calls", ("model", "error")))
+GENAI_TOKENS = registry.register(Counter("genai_tokens_total", "Gemini tokens", ("model", "direction")))
+AUDIO_SECONDS = registry.register(Counter("audio_seconds_total", "Seconds of audio processed", ("path",)))
+
+
+def _tracer():
+    try:
+        from opentelemetry import trace  # type: ignore
+    except ImportError:
+        return None
+    return trace.get_tracer("ezigame")
+
+
+_TRACER = _tracer() if OTEL_TRACING else None
+
+
+@contextmanager
+def _timed_stage(name: str):
+    started = time.perf_counter()
+    try:
+        if _TRACER is not None:
+            with _TRACER.start_as_current_span(name):
+                yield
+        else:
+            yield
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - started, stage=name)
+
+
+def stage(name: str):
+    """Context manager timing one stage (usable around sync or awaited code)."""
+    if not METRICS_ENABLED and _TRACER is None:
+        return _NOOP
+    return _timed_stage(name)
+
+
+def timed(name: str):
+    """Decorator timing every call of a synchronous function as stage `name`.
+
+    When metrics and tracing are both off the function is returned unwrapped.
+    """
+    def decorate(func):
+        if not METRICS_ENABLED and _TRACER is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _timed_stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record_usage(model: Optional[str], response) -> None:
+    """Count prompt/output tokens from a GenerateContentResponse's usage metadata."""
+    if not METRICS_ENABLED:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    model = model or "unknown"
+    GENAI_TOKENS.inc(getattr(usage, "prompt_token_count", None) or 0, model=model, direction="in")
+    GENAI_TOKENS.inc(getattr(usage, "candidates_token_count", None) or 0, model=model, direction="out")
+
+
+def render() -> str:
+    return registry.render()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and in-flight requests.
+
+    Routes are labelled by their template (e.g. `/download/{filename}`) so
+    the series count stays bounded. Streaming responses are timed until the
+    last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not METRICS_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_LATENCY.observe(
+                time.perf_counter() - started,
+                method=scope.get("method", ""),
+                route=getattr(route, "path", "unmatched"),
+                status=status["code"],
+            )
@@ -0,0 +1,254 @@
+"""Versioned prompt templates with server-side caching of their constant prefix.
+
+A `PromptTemplate` splits a prompt into a system instruction and a constant
+prefix, both assembled once at import time, plus a small per-request suffix.
+The context-cache manager uploads system + prefix to Gemini as cached content
+once per (template version, model) and reuses it, so each request sends and
+pays full price only for the suffix. Caches are extended before their TTL runs
+out. If the model or API refuses caching (e.g. the prefix is below the
+minimum cacheable size) the template is sent in full and caching is retried
+after PROMPT_CACHE_RETRY_S. Transient failures (429, 5xx, open circuit) are
+already retried by the GenAI limiter; after them the request goes uncached
+and the next one tries again. The prefix always comes first, so uncached
+requests can still hit the model's implicit prefix cache.
+
+Configuration:
+    PROMPT_CONTEXT_CACHE          "0" disables explicit context caches (default "1")
+    PROMPT_CACHE_TTL_S            lifetime requested for each cache (default 3600)
+    PROMPT_CACHE_REFRESH_S        extend a cache this long before it expires (default 300)
+    PROMPT_CACHE_RETRY_S          wait before retrying after caching was refused (default 3600)
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from services.genai_async import create_cache, delete_cache, generate_content, update_cache
+from services.genai_limits import is_retryable
+from services.logger import logger
+from services.rate_limit import CircuitOpenError
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    name: str
+    version: str
+    system: str
+    prefix: str
+    # str.format template for the per-request part, e.g. "...:\n{conversation}"
+    suffix: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.version}"
+
+    def render_suffix(self, **values) -> str:
+        return self.suffix.format(**values)
+
+    def render(self, **values) -> list[str]:
+        """Full contents (system, prefix + suffix) for an uncached request."""
+        return [self.system, self.prefix + self.render_suffix(**values)]
+
+    def messages(self, **values) -> list[dict]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.prefix + self.render_suffix(**values)},
+        ]
+
+
+_templates: dict[str, PromptTemplate] = {}
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    _templates[template.name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    return _templates[name]
+
+
+def list_templates() -> dict[str, str]:
+    return {name: template.version for name, template in _templates.items()}
+
+
+@dataclass
+class _CachedPrefix:
+    name: str
+    expires_at: float
+
+
+class ContextCacheManager:
+    def __init__(self, ttl_s: float = 3600.0, refresh_s: float = 300.0, retry_s: float = 3600.0):
+        self.ttl_s = ttl_s
+        self.refresh_s = refresh_s
+        self.retry_s = retry_s
+        self._entries: dict[tuple[str, str], _CachedPrefix] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self._refused_until: dict[tuple[str, str], float] = {}
+        self._refreshing: set[tuple[str, str]] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.hits = 0
+        self.created = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.invalidated = 0
+
+    def _config(self, template: PromptTemplate) -> dict:
+        return {
+            "system_instruction": template.system,
+            "contents": [template.prefix],
+            "ttl": f"{int(self.ttl_s)}s",
+            "display_name": template.key,
+        }
+
+    async def get(self, client, model: str, template: PromptTemplate) -> Optional[str]:
+        """Name of a live cache holding `template`'s prefix for `model`, or None."""
+        key = (template.key, model)
+        if self._refused_until.get(key, 0.0) > time.monotonic():
+            return None
+        entry = self._live_entry(client, key)
+        if entry is not None:
+            return entry.name
+        # One creation per key; concurrent requests wait for it.
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            entry = self._live_entry(client, key)
+            if entry is not None:
+                return entry.name
+            return await self._create(client, model, template, key)
+
+    def _live_entry(self, client, key) -> Optional[_CachedPrefix]:
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry.expires_at <= now:
+            return None
+        if entry.expires_at - now < self.refresh_s and key not in self._refreshing:
+            self._refreshing.add(key)
+            task = asyncio.create_task(self._refresh(client, key, entry))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self.hits += 1
+        return entry
+
+    async def _create(self, client, model: str, template: PromptTemplate, key) -> Optional[str]:
+        try:
+            cached = await create_cache(client, model, self._config(template))
+        except Exception as e:
+            self.failures += 1
+            if isinstance(e, CircuitOpenError) or is_retryable(e):
+                logger.warning(f"[PROMPTS] Could not create context cache for {template.key} on {model}: {e}")
+                return None
+            self._refused_until[key] = time.monotonic() + self.retry_s
+            logger.warning(
+                f"[PROMPTS] Context cache for {template.key} on {model} refused, "
+                f"retrying in {self.retry_s:.0f}s: {e}"
+            )
+            return None
+        self._entries[key] = _CachedPrefix(cached.name, time.monotonic() + self.ttl_s)
+        self.created += 1
+        logger.info(f"[PROMPTS] Created context cache {cached.name} for {template.key} on {model}")
+        return cached.name
+
+    async def _refresh(self, client, key, entry: _CachedPrefix) -> None:
+        try:
+            await update_cache(client, entry.name, {"ttl": f"{int(self.ttl_s)}s"})
+            entry.expires_at = time.monotonic() + self.ttl_s
+            self.refreshed += 1
+        except Exception as e:
+            # Let the next request create a fresh cache instead.
+            self.failures += 1
+            self._entries.pop(key, None)
+            logger.warning(f"[PROMPTS] Could not extend context cache {entry.name}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    def invalidate(self, model: str, template: PromptTemplate) -> None:
+        if self._entries.pop((template.key, model), None) is not None:
+            self.invalidated += 1
+
+    async def cancel_refreshes(self) -> None:
+        tasks, self._tasks = list(self._tasks), set()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def aclose(self, client) -> None:
+        """Stop pending refreshes and delete the caches this process created (best effort)."""
+        await self.cancel_refreshes()
+        entries, self._entries = list(self._entries.values()), {}
+        for entry in entries:
+            try:
+                await delete_cache(client, entry.name)
+            except Exception as e:
+                logger.warning(f"[PROMPTS] Could not delete context cache {entry.name}: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "failures": self.failures,
+            "invalidated": self.invalidated,
+            "templates": list_templates(),
+        }
+
+
+_caches: Optional[ContextCacheManager] = None
+
+
+def get_context_caches() -> Optional[ContextCacheManager]:
+    """Process-wide context-cache manager, or None when PROMPT_CONTEXT_CACHE=0."""
+    global _caches
+    if os.getenv("PROMPT_CONTEXT_CACHE", "1") == "0":
+        return None
+    if _caches is None:
+        _caches = ContextCacheManager(
+            ttl_s=float(os.getenv("PROMPT_CACHE_TTL_S", "3600")),
+            refresh_s=float(os.getenv("PROMPT_CACHE_REFRESH_S", "300")),
+            retry_s=float(os.getenv("PROMPT_CACHE_RETRY_S", "3600")),
+        )
+    return _caches
+
+
+async def close_context_caches(client) -> None:
+    """Cancel pending refreshes; with a client, also delete this process's caches."""
+    if _caches is None:
+        return
+    if client is None:
+        await _caches.cancel_refreshes()
+    else:
+        await _caches.aclose(client)
+
+
+async def prepare_request(client, model: str, template: PromptTemplate, config=None, extra: str = "", **values):
+    """Contents and config for `template`, using a context cache for the prefix when possible.
+
+    Returns `(contents, config, cache_name)`; `cache_name` is None when the
+    full prompt is sent.
+    """
+    suffix = template.render_suffix(**values) + extra
+    caches = get_context_caches()
+    cache_name = await caches.get(client, model, template) if caches is not None and client is not None else None
+    if cache_name is None:
+        return [template.system, template.prefix + suffix], config, None
+    return [suffix], {**(config or {}), "cached_content": cache_name}, cache_name
+
+
+async def generate_from_template(client, model: str, template: PromptTemplate, config=None, extra: str = "", **values):
+    """`generate_content` for a template, falling back to the full prompt if the cache is gone."""
+    contents, request_config, cache_name = await prepare_request(client, model, template, config, extra, **values)
+    try:
+        return await generate_content(client, model=model, contents=contents, config=request_config)
+    except Exception as e:
+        if cache_name is None or is_retryable(e) or isinstance(e, CircuitOpenError):
+            raise
+        logger.warning(f"[PROMPTS] Request with context cache {cache_name} failed ({e}); sending full prompt")
+        get_context_caches().invalidate(model, template)
+        return await generate_content(
+            client,
+            model=model,
+            contents=[template.system, template.prefix + template.render_suffix(**values) + extra],
+            config=config,
+        )
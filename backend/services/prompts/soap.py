@@ -1,6 +1,14 @@
 from typing import List
 
-SOAP_JSON_SCHEMA = r"""
+from services.prompts.registry import PromptTemplate, register
+
+# Bump whenever the schema, guide, example or message layout below changes.
+# PROMPT_VERSION is the structured-output layout (schema sent as
+# response_schema); PROSE_PROMPT_VERSION the layout with the schema in the prompt.
+PROMPT_VERSION = "soap-v2"
+PROSE_PROMPT_VERSION = "soap-v1"
+
+SOAP_JSON_KEYS = r"""
 Return a STRICT JSON object with the following keys (no extra keys):
 {
   "patient_name": string | null,
@@ -15,7 +23,9 @@ Return a STRICT JSON object with the following keys (no extra keys):
   },
   "assessment": [string],
   "plan": [string]
-}
+}"""
+
+SOAP_CONTENT_RULES = r"""
 Rules:
 - Use only information present in the conversation. If something is not mentioned, set it to null or use an empty list.
 - Keep items concise and clinical; use complete, readable phrases.
@@ -24,6 +34,8 @@ Rules:
 - Return ONLY JSON. No markdown, no prose, no explanation.
 """
 
+SOAP_JSON_SCHEMA = SOAP_JSON_KEYS + SOAP_CONTENT_RULES
+
 SOAP_TEMPLATE_GUIDE = r"""
 SOAP Note Template Guidance
 
@@ -65,19 +77,42 @@ P - Plan:
 - Educate family on signs of complications.
 """
 
-def build_messages(conversation_text: str) -> List[dict]:
-    system = (
+# Templates are assembled once at import; only the conversation varies per request.
+PROSE_TEMPLATE = register(PromptTemplate(
+    name="soap-prose",
+    version=PROSE_PROMPT_VERSION,
+    system=(
         "You are a clinical scribe. Return STRICT JSON only that conforms to the given schema. "
         "No markdown, no prose, no extra commentary."
-    )
-    user = (
+    ),
+    prefix=(
         f"{SOAP_JSON_SCHEMA}\n\n{SOAP_TEMPLATE_GUIDE}\n\n"
         f"EXAMPLE STYLE (do NOT copy the exact patient details; style guidance only):\n{SOAP_STYLE_EXAMPLE}\n\n"
-        f"CONVERSATION TO SUMMARIZE (use only facts present):\n{conversation_text}\n\n"
-        "Return ONLY JSON."
-    )
-    return [
-        {"role": "system", "content": system},
-        {"role": "user", "content": user},
-    ]
+    ),
+    suffix="CONVERSATION TO SUMMARIZE (use only facts present):\n{conversation}\n\nReturn ONLY JSON.",
+))
+
+# Structured output: the shape comes from response_schema, so only the
+# content rules stay in the prompt.
+STRUCTURED_TEMPLATE = register(PromptTemplate(
+    name="soap",
+    version=PROMPT_VERSION,
+    system="You are a clinical scribe. Fill in the SOAP note fields from the conversation.",
+    prefix=(
+        f"{SOAP_CONTENT_RULES.strip()}\n\n{SOAP_TEMPLATE_GUIDE}\n\n"
+        f"EXAMPLE STYLE (do NOT copy the exact patient details; style guidance only):\n{SOAP_STYLE_EXAMPLE}\n\n"
+    ),
+    suffix="CONVERSATION TO SUMMARIZE (use only facts present):\n{conversation}",
+))
+
+STRICT_JSON_SUFFIX = "\n\nIMPORTANT: Return STRICT JSON only."
+
+
+def build_messages(conversation_text: str) -> List[dict]:
+    """Messages with the JSON schema spelled out in the prompt (no response_schema)."""
+    return PROSE_TEMPLATE.messages(conversation=conversation_text)
+
 
+def build_structured_messages(conversation_text: str) -> List[dict]:
+    """Messages for structured output (schema sent as response_schema)."""
+    return STRUCTURED_TEMPLATE.messages(conversation=conversation_text)
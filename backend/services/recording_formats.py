@@ -0,0 +1,177 @@
+"""Compact encodings of saved recordings.
+
+Recordings arrive as WAV, which is several times larger than speech needs.
+When `RECORDING_TRANSCODE_FORMATS` is set, every new recording is encoded in
+the background into those formats; the download route can then serve
+`?format=opus` or `?format=flac` instead of the WAV. A format that was not
+produced at ingest is encoded on first request (concurrent requests for the
+same file share one encode). The original WAV is kept for transcription.
+
+Encoding uses `soundfile` (libsndfile) block by block and falls back to
+`pydub`/ffmpeg for inputs or formats libsndfile cannot handle.
+
+Configuration:
+    RECORDING_TRANSCODE_FORMATS      comma-separated formats encoded on ingest,
+                                     e.g. "opus,flac" (default: none)
+    RECORDING_ENCODED_DIR            where encodings are stored
+                                     (default <recordings>/encoded)
+    RECORDING_TRANSCODE_CONCURRENCY  simultaneous encodes (default 2)
+"""
+import asyncio
+import os
+from typing import Optional
+
+from services.logger import logger
+from services.recordings_catalog import RECORDINGS_DIR
+
+# format -> (file extension, media type, soundfile format, soundfile subtype, pydub format, ffmpeg codec)
+FORMATS = {
+    "opus": (".opus", "audio/ogg; codecs=opus", "OGG", "OPUS", "ogg", "libopus"),
+    "flac": (".flac", "audio/flac", "FLAC", "PCM_16", "flac", "flac"),
+}
+ORIGINAL_MEDIA_TYPES = {
+    ".wav": "audio/wav",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".webm": "audio/webm",
+}
+# Sample rates libopus accepts; anything else goes through ffmpeg, which resamples.
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+TRANSCODE_BLOCK_FRAMES = 64 * 1024
+
+RECORDING_TRANSCODE_FORMATS = [
+    name.strip().lower() for name in os.getenv("RECORDING_TRANSCODE_FORMATS", "").split(",") if name.strip()
+]
+RECORDING_ENCODED_DIR = os.getenv("RECORDING_ENCODED_DIR", os.path.join(RECORDINGS_DIR, "encoded"))
+RECORDING_TRANSCODE_CONCURRENCY = int(os.getenv("RECORDING_TRANSCODE_CONCURRENCY", "2"))
+
+
+class UnsupportedFormat(ValueError):
+    pass
+
+
+def media_type_for(filename: str) -> str:
+    return ORIGINAL_MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream")
+
+
+def _encode_with_soundfile(src: str, dst: str, fmt: str) -> None:
+    import soundfile as sf  # type: ignore
+    _, _, sf_format, subtype, _, _ = FORMATS[fmt]
+    with sf.SoundFile(src) as inp:
+        if fmt == "opus" and inp.samplerate not in OPUS_SAMPLE_RATES:
+            raise ValueError(f"libopus cannot encode {inp.samplerate} Hz")
+        with sf.SoundFile(
+            dst, "w", samplerate=inp.samplerate, channels=inp.channels, format=sf_format, subtype=subtype
+        ) as out:
+            for block in inp.blocks(blocksize=TRANSCODE_BLOCK_FRAMES, dtype="float32"):
+                out.write(block)
+
+
+def _encode_with_pydub(src: str, dst: str, fmt: str) -> None:
+    from pydub import AudioSegment  # type: ignore
+    _, _, _, _, pydub_format, codec = FORMATS[fmt]
+    AudioSegment.from_file(src).export(dst, format=pydub_format, codec=codec)
+
+
+def encode_file(src: str, dst: str, fmt: str) -> int:
+    """Encode `src` into `dst` atomically; returns the encoded size in bytes."""
+    if fmt not in FORMATS:
+        raise UnsupportedFormat(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    tmp = dst + ".part"
+    try:
+        try:
+            _encode_with_soundfile(src, tmp, fmt)
+        except Exception as e:
+            logger.info(f"[TRANSCODE] soundfile could not encode {os.path.basename(src)} as {fmt} ({e}); using ffmpeg")
+            _encode_with_pydub(src, tmp, fmt)
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return os.path.getsize(dst)
+
+
+class RecordingEncoder:
+    """Schedules background encodes and resolves the file to serve for a format."""
+
+    def __init__(
+        self,
+        recordings_dir: str = RECORDINGS_DIR,
+        encoded_dir: str = RECORDING_ENCODED_DIR,
+        ingest_formats: Optional[list] = None,
+        concurrency: int = RECORDING_TRANSCODE_CONCURRENCY,
+    ):
+        self.recordings_dir = recordings_dir
+        self.encoded_dir = encoded_dir
+        self.ingest_formats = [
+            fmt for fmt in (RECORDING_TRANSCODE_FORMATS if ingest_formats is None else ingest_formats) if fmt in FORMATS
+        ]
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._inflight: dict[tuple[str, str], asyncio.Task] = {}
+
+    def encoded_path(self, filename: str, fmt: str) -> str:
+        stem = os.path.splitext(filename)[0]
+        return os.path.join(self.encoded_dir, stem + FORMATS[fmt][0])
+
+    async def _encode(self, filename: str, fmt: str) -> str:
+        src = os.path.join(self.recordings_dir, filename)
+        dst = self.encoded_path(filename, fmt)
+        async with self._semaphore:
+            original = await asyncio.to_thread(os.path.getsize, src)
+            encoded = await asyncio.to_thread(encode_file, src, dst, fmt)
+        ratio = original / encoded if encoded else 0.0
+        logger.info(f"[TRANSCODE] {filename} -> {fmt}: {original} -> {encoded} bytes ({ratio:.1f}x smaller)")
+        return dst
+
+    def _start(self, filename: str, fmt: str) -> asyncio.Task:
+        key = (filename, fmt)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._encode(filename, fmt))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    def schedule_ingest(self, filename: str) -> None:
+        """Encode a new recording into the ingest formats without waiting."""
+        for fmt in self.ingest_formats:
+            self._start(filename, fmt).add_done_callback(_log_failure)
+
+    async def resolve(self, filename: str, fmt: str) -> str:
+        """Path of the recording in `fmt`, encoding it now if it does not exist yet."""
+        if fmt not in FORMATS:
+            raise UnsupportedFormat(f"Unknown format {fmt!r}; expected one of {', '.join(FORMATS)}")
+        path = self.encoded_path(filename, fmt)
+        if await asyncio.to_thread(os.path.exists, path):
+            return path
+        return await asyncio.shield(self._start(filename, fmt))
+
+    async def remove(self, filename: str) -> None:
+        for fmt in FORMATS:
+            path = self.encoded_path(filename, fmt)
+            try:
+                await asyncio.to_thread(os.remove, path)
+            except FileNotFoundError:
+                pass
+
+    async def stop(self) -> None:
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"[TRANSCODE] Background encode failed: {task.exception()}")
+
+
+_encoder: Optional[RecordingEncoder] = None
+
+
+def get_recording_encoder() -> RecordingEncoder:
+    global _encoder
+    if _encoder is None:
+        _encoder = RecordingEncoder()
+    return _encoder
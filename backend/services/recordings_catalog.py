@@ -0,0 +1,352 @@
+"""Indexed catalog of saved recordings.
+
+`/voice-recording/list/` used to stat every file in the recordings directory
+on each call. The catalog keeps one SQLite row per recording (size, duration,
+SHA-256, creation time, transcript status) and is updated by the record and
+delete endpoints, so listing, filtering and sorting are served from indexes
+with keyset (cursor) pagination.
+
+On startup the catalog is reconciled with the directory in one scan: files
+added or replaced behind the API's back are inserted, rows whose file is gone
+are dropped. Hashing and duration probing for those files run afterwards in
+the background, so a large first reconcile does not hold up startup.
+
+Configuration:
+    RECORDINGS_DIR       recordings directory (default recordings)
+    RECORDINGS_DB_PATH   SQLite file (default catalog/recordings.sqlite3)
+"""
+import asyncio
+import base64
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from services.audio_utils import probe_duration
+from services.logger import logger
+from services.transcript_cache import hash_file
+
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", "recordings")
+RECORDINGS_DB_PATH = os.getenv("RECORDINGS_DB_PATH", os.path.join("catalog", "recordings.sqlite3"))
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".webm")
+TRANSCRIPT_STATUSES = ("none", "done", "failed")
+
+# Sort key -> SQL expression; each has a matching (expression, filename) index.
+SORT_COLUMNS = {
+    "created_at": "created_at",
+    "size": "size",
+    "duration": "IFNULL(duration_s, -1)",
+    "filename": "filename",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    filename TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    duration_s REAL,
+    sha256 TEXT,
+    created_at REAL NOT NULL,
+    mtime REAL NOT NULL,
+    transcript_status TEXT NOT NULL DEFAULT 'none'
+);
+CREATE INDEX IF NOT EXISTS idx_recordings_created ON recordings (created_at, filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_size ON recordings (size, filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_duration ON recordings (IFNULL(duration_s, -1), filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_status_created ON recordings (transcript_status, created_at, filename);
+CREATE INDEX IF NOT EXISTS idx_recordings_sha256 ON recordings (sha256);
+"""
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort: str, value, filename: str) -> str:
+    raw = json.dumps([sort, value, filename], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, filename = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception as e:
+        raise InvalidCursor("Malformed cursor") from e
+    if cursor_sort != sort:
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    return value, filename
+
+
+def _row_to_recording(row: sqlite3.Row) -> dict:
+    return dict(row)
+
+
+class RecordingCatalog:
+    """Thread-safe SQLite store of recording metadata (call through asyncio.to_thread)."""
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Other worker processes may hold the write lock briefly; wait for it.
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def upsert(self, recording: dict) -> None:
+        """Insert or replace a recording; a replaced file starts with no transcript."""
+        row = {"duration_s": None, "sha256": None, "transcript_status": "none", **recording}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recordings"
+                " (filename, size, duration_s, sha256, created_at, mtime, transcript_status)"
+                " VALUES (:filename, :size, :duration_s, :sha256, :created_at, :mtime, :transcript_status)",
+                row,
+            )
+            self._conn.commit()
+
+    def update(self, filename: str, **fields) -> None:
+        assignments = ", ".join(f"{name} = :{name}" for name in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE recordings SET {assignments} WHERE filename = :filename", {**fields, "filename": filename}
+            )
+            self._conn.commit()
+
+    def remove(self, filename: str) -> bool:
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM recordings WHERE filename = ?", (filename,)).rowcount
+            self._conn.commit()
+        return deleted > 0
+
+    def get(self, filename: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM recordings WHERE filename = ?", (filename,)).fetchone()
+        return _row_to_recording(row) if row else None
+
+    def set_transcript_status(self, sha256: str, status: str) -> int:
+        """Mark every recording with this content hash; returns the rows updated."""
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE recordings SET transcript_status = ? WHERE sha256 = ?", (status, sha256)
+            ).rowcount
+            self._conn.commit()
+        return updated
+
+    def page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        transcript_status: Optional[str] = None,
+        created_after: Optional[float] = None,
+        created_before: Optional[float] = None,
+        min_duration_s: Optional[float] = None,
+        max_duration_s: Optional[float] = None,
+        prefix: Optional[str] = None,
+    ) -> tuple[list[dict], int, Optional[str]]:
+        """One page of recordings plus the total matching the filters and the next cursor."""
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort {sort!r}; expected one of {', '.join(SORT_COLUMNS)}")
+        expression = SORT_COLUMNS[sort]
+        where, params = [], []
+        if transcript_status is not None:
+            where.append("transcript_status = ?")
+            params.append(transcript_status)
+        if created_after is not None:
+            where.append("created_at >= ?")
+            params.append(created_after)
+        if created_before is not None:
+            where.append("created_at < ?")
+            params.append(created_before)
+        if min_duration_s is not None:
+            where.append("duration_s >= ?")
+            params.append(min_duration_s)
+        if max_duration_s is not None:
+            where.append("duration_s <= ?")
+            params.append(max_duration_s)
+        if prefix:
+            # Range scan on the primary key instead of LIKE.
+            where.append("filename >= ? AND filename < ?")
+            params += [prefix, prefix + "\U0010ffff"]
+        count_sql = "SELECT COUNT(*) FROM recordings" + (" WHERE " + " AND ".join(where) if where else "")
+        count_params = list(params)
+
+        if cursor:
+            value, last_filename = decode_cursor(cursor, sort)
+            operator = "<" if descending else ">"
+            if sort == "filename":
+                where.append(f"filename {operator} ?")
+                params.append(last_filename)
+            else:
+                where.append(f"({expression}, filename) {operator} (?, ?)")
+                params += [value, last_filename]
+        direction = "DESC" if descending else "ASC"
+        sql = (
+            f"SELECT *, {expression} AS sort_value FROM recordings"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY {expression} {direction}, filename {direction} LIMIT ?"
+        )
+        with self._lock:
+            total = self._conn.execute(count_sql, count_params).fetchone()[0]
+            rows = self._conn.execute(sql, params + [limit + 1]).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(sort, rows[-1]["sort_value"], rows[-1]["filename"])
+        recordings = []
+        for row in rows:
+            recording = _row_to_recording(row)
+            recording.pop("sort_value", None)
+            recordings.append(recording)
+        return recordings, total, next_cursor
+
+    def reconcile(self, directory: str) -> tuple[int, int]:
+        """Sync rows with the files on disk in one scan; returns (added_or_changed, removed)."""
+        on_disk = {}
+        if os.path.isdir(directory):
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(AUDIO_EXTENSIONS):
+                        on_disk[entry.name] = entry.stat()
+        with self._lock:
+            known = {
+                row["filename"]: (row["size"], row["mtime"])
+                for row in self._conn.execute("SELECT filename, size, mtime FROM recordings")
+            }
+            removed = [name for name in known if name not in on_disk]
+            changed = [
+                {
+                    "filename": name,
+                    "size": st.st_size,
+                    "duration_s": None,
+                    "sha256": None,
+                    "created_at": st.st_ctime,
+                    "mtime": st.st_mtime,
+                    "transcript_status": "none",
+                }
+                for name, st in on_disk.items()
+                if known.get(name) != (st.st_size, st.st_mtime)
+            ]
+            self._conn.executemany("DELETE FROM recordings WHERE filename = ?", [(name,) for name in removed])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO recordings"
+                " (filename, size, duration_s, sha256, created_at, mtime, transcript_status)"
+                " VALUES (:filename, :size, :duration_s, :sha256, :created_at, :mtime, :transcript_status)",
+                changed,
+            )
+            self._conn.commit()
+        return len(changed), len(removed)
+
+    def unhashed(self, limit: int = 100) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM recordings WHERE sha256 IS NULL LIMIT ?", (limit,)
+            ).fetchall()
+        return [row["filename"] for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class RecordingsIndex:
+    """Process-wide catalog bound to a recordings directory, with async helpers."""
+
+    def __init__(self, directory: str = RECORDINGS_DIR, db_path: str = RECORDINGS_DB_PATH):
+        self.directory = directory
+        self.db_path = db_path
+        self.catalog: Optional[RecordingCatalog] = None
+        self._backfill_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self.catalog = await asyncio.to_thread(RecordingCatalog, self.db_path)
+        added, removed = await asyncio.to_thread(self.catalog.reconcile, self.directory)
+        if added or removed:
+            logger.info(f"[RECORDINGS] Reconciled catalog: {added} added/changed, {removed} removed")
+        self._backfill_task = asyncio.create_task(self._backfill())
+
+    async def stop(self) -> None:
+        if self._backfill_task is not None:
+            self._backfill_task.cancel()
+            await asyncio.gather(self._backfill_task, return_exceptions=True)
+            self._backfill_task = None
+        if self.catalog is not None:
+            await asyncio.to_thread(self.catalog.close)
+            self.catalog = None
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    async def add(self, filename: str, sha256: Optional[str] = None, duration_s: Optional[float] = None) -> dict:
+        st = await asyncio.to_thread(os.stat, self.path(filename))
+        if duration_s is None:
+            duration_s = await asyncio.to_thread(probe_duration, self.path(filename))
+        recording = {
+            "filename": filename,
+            "size": st.st_size,
+            "duration_s": duration_s,
+            "sha256": sha256,
+            "created_at": st.st_ctime,
+            "mtime": st.st_mtime,
+        }
+        if self.catalog is not None:
+            await asyncio.to_thread(self.catalog.upsert, recording)
+        return recording
+
+    async def get(self, filename: str) -> Optional[dict]:
+        if self.catalog is None:
+            return None
+        return await asyncio.to_thread(self.catalog.get, filename)
+
+    async def remove(self, filename: str) -> None:
+        if self.catalog is not None:
+            await asyncio.to_thread(self.catalog.remove, filename)
+
+    async def page(self, **query) -> tuple[list[dict], int, Optional[str]]:
+        return await asyncio.to_thread(self.catalog.page, **query)
+
+    async def set_transcript_status(self, sha256: Optional[str], status: str) -> None:
+        if self.catalog is None or not sha256:
+            return
+        await asyncio.to_thread(self.catalog.set_transcript_status, sha256, status)
+
+    async def _backfill(self) -> None:
+        """Hash and probe rows the reconcile inserted without them."""
+        filled = 0
+        while True:
+            names = await asyncio.to_thread(self.catalog.unhashed)
+            if not names:
+                break
+            for name in names:
+                path = self.path(name)
+                try:
+                    sha256 = await asyncio.to_thread(hash_file, path)
+                    duration_s = await asyncio.to_thread(probe_duration, path)
+                except OSError:
+                    # Deleted since the scan.
+                    await asyncio.to_thread(self.catalog.remove, name)
+                    continue
+                await asyncio.to_thread(self.catalog.update, name, sha256=sha256, duration_s=duration_s)
+                filled += 1
+        if filled:
+            logger.info(f"[RECORDINGS] Backfilled hash/duration for {filled} recording(s)")
+
+
+_index: Optional[RecordingsIndex] = None
+
+
+def get_recordings_index() -> RecordingsIndex:
+    global _index
+    if _index is None:
+        _index = RecordingsIndex()
+    return _index
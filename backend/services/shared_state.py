@@ -0,0 +1,263 @@
+"""Key-value state shared by every worker process.
+
+With several uvicorn workers each process has its own memory, so caches
+filled in one worker are invisible to the others. `get_shared_state()`
+returns a small async key-value store with TTLs that all workers talk to:
+
+    sqlite:///path/to/file.sqlite3   one SQLite file (WAL) on local disk;
+                                     enough for all workers on one host
+    redis://host:6379/0              Redis (needs the `redis` package);
+                                     for several hosts
+
+Values are bytes; `get_json`/`set_json` wrap JSON. `add` is set-if-absent
+and doubles as a lease/lock. Unset SHARED_STATE_URL means single-process
+mode and `get_shared_state()` returns None.
+
+Configuration:
+    SHARED_STATE_URL     backend URL (default unset)
+    SHARED_STATE_PREFIX  key prefix, to share one Redis between apps (default ezigame:)
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from services.logger import logger
+
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "ezigame:")
+
+# Identifies this process in session routing and job ownership.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Expired SQLite rows are purged at most this often.
+PURGE_INTERVAL_S = 60.0
+
+
+class SharedState(ABC):
+    """Async key-value store interface; see the module docstring for backends."""
+
+    name = "base"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    async def add(self, key: str, value: bytes, ttl_s: Optional[float] = None) -> bool:
+        """Set only if the key is absent (or expired); True when this call set it."""
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    async def close(self) -> None:
+        pass
+
+    async def get_json(self, key: str) -> Any:
+        raw = await self.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set_json(self, key: str, value: Any, ttl_s: Optional[float] = None) -> None:
+        await self.set(key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ttl_s)
+
+
+class SQLiteSharedState(SharedState):
+    """Shared state in one SQLite file; safe across processes on the same host."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Several processes write this file; wait for their locks instead of failing.
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_expires ON kv (expires_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def _expiry(ttl_s: Optional[float]) -> Optional[float]:
+        return time.time() + ttl_s if ttl_s else None
+
+    def _get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def _set(self, key: str, value: bytes, ttl_s: Optional[float]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, self._expiry(ttl_s))
+            )
+            if now - self._last_purge > PURGE_INTERVAL_S:
+                self._last_purge = now
+                self._conn.execute("DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            self._conn.commit()
+
+    def _add(self, key: str, value: bytes, ttl_s: Optional[float]) -> bool:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM kv WHERE key = ? AND expires_at IS NOT NULL AND expires_at <= ?", (key, time.time())
+            )
+            inserted = self._conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, value, self._expiry(ttl_s))
+            ).rowcount
+            self._conn.commit()
+        return inserted > 0
+
+    def _delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+            self._conn.commit()
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value, ttl_s=None):
+        await asyncio.to_thread(self._set, key, value, ttl_s)
+
+    async def add(self, key, value, ttl_s=None):
+        return await asyncio.to_thread(self._add, key, value, ttl_s)
+
+    async def delete(self, key):
+        await asyncio.to_thread(self._delete, key)
+
+    async def close(self):
+        def _close():
+            with self._lock:
+                self._conn.close()
+        await asyncio.to_thread(_close)
+
+
+class RedisSharedState(SharedState):
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = SHARED_STATE_PREFIX):
+        import redis.asyncio as redis  # type: ignore
+
+        self._redis = redis.from_url(url)
+        self.prefix = prefix
+
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+
+    @staticmethod
+    def _px(ttl_s: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl_s * 1000)) if ttl_s else None
+
+    async def get(self, key):
+        return await self._redis.get(self._key(key))
+
+    async def set(self, key, value, ttl_s=None):
+        await self._redis.set(self._key(key), value, px=self._px(ttl_s))
+
+    async def add(self, key, value, ttl_s=None):
+        return bool(await self._redis.set(self._key(key), value, px=self._px(ttl_s), nx=True))
+
+    async def delete(self, key):
+        await self._redis.delete(self._key(key))
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def create_shared_state(url: str) -> Optional[SharedState]:
+    if not url:
+        return None
+    if url.startswith("sqlite:///"):
+        return SQLiteSharedState(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisSharedState(url)
+    raise ValueError(f"Unsupported SHARED_STATE_URL {url!r}; use sqlite:///path or redis://host")
+
+
+_state: Optional[SharedState] = None
+_state_created = False
+
+
+def get_shared_state() -> Optional[SharedState]:
+    """Process-wide shared state, or None in single-process mode."""
+    global _state, _state_created
+    if not _state_created:
+        _state_created = True
+        try:
+            _state = create_shared_state(SHARED_STATE_URL)
+        except Exception as e:
+            logger.error(f"[SHARED] Could not open shared state {SHARED_STATE_URL!r}: {e}")
+            _state = None
+        if _state is not None:
+            logger.info(f"[SHARED] Using {_state.name} shared state for worker {WORKER_ID}")
+    return _state
+
+
+async def close_shared_state() -> None:
+    global _state, _state_created
+    if _state is not None:
+        await _state.close()
+    _state = None
+    _state_created = False
+
+
+class SessionRouter:
+    """Records which worker holds each live streaming session.
+
+    Entries expire unless refreshed, so a crashed worker's sessions vanish
+    on their own. A proxy or another worker can `lookup` the owner to route
+    a reconnect back to the process that still has the session's state.
+    Backend errors are logged, never raised: routing is advisory.
+    """
+
+    def __init__(self, state: Optional[SharedState], ttl_s: float = 120.0):
+        self.state = state
+        self.ttl_s = ttl_s
+
+    async def register(self, session_id: str) -> None:
+        if self.state is None:
+            return
+        try:
+            await self.state.set(f"session:{session_id}", WORKER_ID.encode(), self.ttl_s)
+        except Exception as e:
+            logger.warning(f"[SHARED] Could not register session {session_id}: {e}")
+
+    async def unregister(self, session_id: str) -> None:
+        if self.state is None:
+            return
+        try:
+            await self.state.delete(f"session:{session_id}")
+        except Exception as e:
+            logger.warning(f"[SHARED] Could not unregister session {session_id}: {e}")
+
+    async def lookup(self, session_id: str) -> Optional[str]:
+        if self.state is None:
+            return None
+        try:
+            owner = await self.state.get(f"session:{session_id}")
+        except Exception as e:
+            logger.warning(f"[SHARED] Session lookup failed for {session_id}: {e}")
+            return None
+        return owner.decode() if owner is not None else None
+
+
+def get_session_router() -> SessionRouter:
+    return SessionRouter(get_shared_state())
@@ -0,0 +1,306 @@
+"""Registry of live streaming WebSocket connections with per-connection backpressure.
+
+Each connection gets an `Outbox` (a bounded queue of outbound messages) and a
+single writer task that drains it onto the socket, so a slow client only ever
+delays itself. The transcription session publishes into the outbox without
+waiting. When the client falls behind:
+
+- partial transcripts are expendable. With the "merge" policy a newer
+  partial for a segment replaces the one still queued; with "drop" partials
+  are discarded once the outbox is half full. A final always removes queued
+  partials of its segment, since they are stale by then;
+- finals and control messages are never dropped silently. If the outbox is
+  full the client is too slow to serve and the connection is closed with
+  1013 ("try again later"), as it is when one send takes longer than
+  STREAM_SEND_TIMEOUT_S.
+
+The writer sends a {"type": "heartbeat"} message whenever the connection has
+been quiet for STREAM_HEARTBEAT_S. The endpoint closes streams that send
+nothing for STREAM_IDLE_TIMEOUT_S. Sessions are keyed by id in a dict, so
+registering, looking up and removing a session cost the same with ten streams
+or ten thousand.
+
+Configuration:
+    STREAM_OUTBOX_SIZE       queued outbound messages per connection (default 64)
+    STREAM_PARTIAL_POLICY    "merge" or "drop" (default merge)
+    STREAM_SEND_TIMEOUT_S    longest a single send may take (default 10)
+    STREAM_HEARTBEAT_S       heartbeat after this much outbound silence, 0 disables (default 20)
+    STREAM_IDLE_TIMEOUT_S    close streams silent this long, 0 disables (default 60)
+    STREAM_MAX_SESSIONS      concurrent streams per worker, 0 for no limit (default 5000)
+"""
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from typing import Optional
+
+from services.logger import logger
+
+STREAM_OUTBOX_SIZE = int(os.getenv("STREAM_OUTBOX_SIZE", "64"))
+STREAM_PARTIAL_POLICY = os.getenv("STREAM_PARTIAL_POLICY", "merge")
+STREAM_SEND_TIMEOUT_S = float(os.getenv("STREAM_SEND_TIMEOUT_S", "10"))
+STREAM_HEARTBEAT_S = float(os.getenv("STREAM_HEARTBEAT_S", "20"))
+STREAM_IDLE_TIMEOUT_S = float(os.getenv("STREAM_IDLE_TIMEOUT_S", "60"))
+STREAM_MAX_SESSIONS = int(os.getenv("STREAM_MAX_SESSIONS", "5000"))
+
+PARTIAL_POLICIES = ("merge", "drop")
+
+# WebSocket close code for clients that cannot keep up or arrive when the worker is full.
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class SessionRejected(Exception):
+    pass
+
+
+class Outbox:
+    """Bounded outbound queue applying the partial-transcript policy.
+
+    Has the `put_nowait` of an asyncio.Queue so `StreamingSession` can publish
+    into it directly; `None` marks the end of the stream.
+    """
+
+    def __init__(self, capacity: int = STREAM_OUTBOX_SIZE, partial_policy: str = STREAM_PARTIAL_POLICY):
+        if partial_policy not in PARTIAL_POLICIES:
+            raise ValueError(f"Unknown partial policy {partial_policy!r}; expected one of {PARTIAL_POLICIES}")
+        self.capacity = max(1, capacity)
+        self.partial_policy = partial_policy
+        self._items: deque = deque()
+        self._partials: dict[int, dict] = {}  # seq -> queued partial message
+        self._waiter: Optional[asyncio.Future] = None
+        self.ended = False
+        self.overflowed = False
+        self.merged = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def _drop_stale_partials(self, seq: int) -> None:
+        for stale in [s for s in self._partials if s <= seq]:
+            message = self._partials.pop(stale)
+            self._items = deque(m for m in self._items if m is not message)
+            self.dropped += 1
+
+    def _put_partial(self, message: dict) -> None:
+        seq = message.get("seq")
+        queued = self._partials.get(seq)
+        if queued is not None and self.partial_policy == "merge":
+            queued.clear()
+            queued.update(message)
+            self.merged += 1
+            return
+        limit = self.capacity if self.partial_policy == "merge" else self.capacity // 2
+        if len(self._items) >= limit:
+            self.dropped += 1
+            return
+        self._items.append(message)
+        self._partials[seq] = message
+
+    def put_nowait(self, message: Optional[dict]) -> None:
+        if message is None:
+            self.ended = True
+        elif message.get("type") == "partial":
+            self._put_partial(message)
+        else:
+            if message.get("type") == "final" and self._partials:
+                self._drop_stale_partials(message.get("seq", -1))
+            if len(self._items) >= self.capacity:
+                self.overflowed = True
+            else:
+                self._items.append(message)
+        self._wake()
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next message; None at end of stream or on overflow.
+
+        Raises asyncio.TimeoutError when nothing arrives within `timeout`.
+        """
+        while not self._items or self.overflowed:
+            if self.ended or self.overflowed:
+                return None
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await asyncio.wait_for(self._waiter, timeout)
+            finally:
+                self._waiter = None
+        message = self._items.popleft()
+        if message.get("type") == "partial" and self._partials.get(message.get("seq")) is message:
+            del self._partials[message["seq"]]
+        return message
+
+
+class StreamConnection:
+    """One client stream: its socket, outbox, writer task and counters."""
+
+    def __init__(
+        self,
+        session_id: str,
+        websocket,
+        outbox_size: int = STREAM_OUTBOX_SIZE,
+        partial_policy: str = STREAM_PARTIAL_POLICY,
+        send_timeout_s: float = STREAM_SEND_TIMEOUT_S,
+        heartbeat_s: float = STREAM_HEARTBEAT_S,
+        idle_timeout_s: float = STREAM_IDLE_TIMEOUT_S,
+    ):
+        self.id = session_id
+        self.websocket = websocket
+        self.outbox = Outbox(outbox_size, partial_policy)
+        self.send_timeout_s = send_timeout_s
+        self.heartbeat_s = heartbeat_s
+        self.idle_timeout_s = idle_timeout_s
+        self.created_at = time.monotonic()
+        self.last_received = self.created_at
+        self.close_reason: Optional[str] = None
+        self.received = 0
+        self.bytes_in = 0
+        self.sent = 0
+        self.heartbeats = 0
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, message: dict) -> None:
+        """Queue a message for the client; never waits."""
+        self.outbox.put_nowait(message)
+
+    def touch(self, nbytes: int = 0) -> None:
+        self.last_received = time.monotonic()
+        self.received += 1
+        self.bytes_in += nbytes
+
+    @property
+    def writer_done(self) -> bool:
+        return self._writer is not None and self._writer.done()
+
+    async def _write_loop(self) -> None:
+        while True:
+            try:
+                message = await self.outbox.get(self.heartbeat_s or None)
+            except asyncio.TimeoutError:
+                message = {"type": "heartbeat", "ts": round(time.time(), 3)}
+                self.heartbeats += 1
+            if message is None:
+                if self.outbox.overflowed:
+                    await self._close_slow("slow_consumer")
+                return
+            try:
+                await asyncio.wait_for(self.websocket.send_text(json.dumps(message)), self.send_timeout_s)
+            except asyncio.TimeoutError:
+                await self._close_slow("send_timeout")
+                return
+            except Exception as e:
+                logger.warning(f"[STREAM] Send to session {self.id} failed, dropping remaining results: {e}")
+                self.close_reason = self.close_reason or "send_failed"
+                return
+            self.sent += 1
+
+    async def _close_slow(self, reason: str) -> None:
+        self.close_reason = reason
+        logger.warning(f"[STREAM] Closing session {self.id}: {reason} ({len(self.outbox)} messages queued)")
+        try:
+            await self.websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        except Exception:
+            pass
+
+    async def finish(self, abort: bool = False) -> None:
+        """Wait for the writer to flush the outbox (or cancel it when aborting)."""
+        if self._writer is None:
+            return
+        if abort:
+            self._writer.cancel()
+        await asyncio.gather(self._writer, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "session_id": self.id,
+            "age_s": round(time.monotonic() - self.created_at, 1),
+            "idle_s": round(time.monotonic() - self.last_received, 1),
+            "received": self.received,
+            "bytes_in": self.bytes_in,
+            "sent": self.sent,
+            "queued": len(self.outbox),
+            "partials_merged": self.outbox.merged,
+            "partials_dropped": self.outbox.dropped,
+            "heartbeats": self.heartbeats,
+        }
+
+
+class StreamRegistry:
+    """Live connections of this worker, keyed by session id."""
+
+    def __init__(self, max_sessions: int = STREAM_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions: dict[str, StreamConnection] = {}
+        self.accepted = 0
+        self.rejected = 0
+        self.closed: dict[str, int] = {}
+        self._totals = {"sent": 0, "partials_merged": 0, "partials_dropped": 0, "heartbeats": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def register(self, conn: StreamConnection) -> None:
+        if conn.id in self._sessions:
+            self.rejected += 1
+            raise SessionRejected(f"Session {conn.id} is already streaming")
+        if self.max_sessions and len(self._sessions) >= self.max_sessions:
+            self.rejected += 1
+            raise SessionRejected(f"Worker is at its limit of {self.max_sessions} streams")
+        self._sessions[conn.id] = conn
+        self.accepted += 1
+
+    def unregister(self, conn: StreamConnection, reason: str) -> None:
+        """Remove a connection; safe to call more than once."""
+        if self._sessions.get(conn.id) is not conn:
+            return
+        del self._sessions[conn.id]
+        reason = conn.close_reason or reason
+        self.closed[reason] = self.closed.get(reason, 0) + 1
+        stats = conn.stats()
+        for name in self._totals:
+            self._totals[name] += stats[name]
+
+    def get(self, session_id: str) -> Optional[StreamConnection]:
+        return self._sessions.get(session_id)
+
+    def broadcast(self, message: dict) -> int:
+        """Queue `message` on every live connection; returns how many got it."""
+        for conn in list(self._sessions.values()):
+            conn.send(dict(message))
+        return len(self._sessions)
+
+    def stats(self) -> dict:
+        totals = dict(self._totals)
+        queued = 0
+        for conn in self._sessions.values():
+            queued += len(conn.outbox)
+            totals["sent"] += conn.sent
+            totals["partials_merged"] += conn.outbox.merged
+            totals["partials_dropped"] += conn.outbox.dropped
+            totals["heartbeats"] += conn.heartbeats
+        return {
+            "active": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "closed": dict(self.closed),
+            "queued": queued,
+            **totals,
+        }
+
+
+_registry: Optional[StreamRegistry] = None
+
+
+def get_stream_registry() -> StreamRegistry:
+    global _registry
+    if _registry is None:
+        _registry = StreamRegistry()
+    return _registry
@@ -1,59 +1,369 @@
 import asyncio
+import os
+import time
 from typing import Optional
 import numpy as np
-import torch
-import torchaudio
 from services.logger import logger
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
+from services.audio_utils import pcm_to_wav_bytes, frame_rms
+from services.metrics import AUDIO_SECONDS
 
-load_dotenv()
+# Incoming audio is raw little-endian float32 mono PCM at this rate unless the
+# client passes ?sample_rate=... on the WebSocket URL.
+STREAM_SAMPLE_RATE = int(os.getenv("STREAM_SAMPLE_RATE", "16000"))
+# How much recent audio the ring buffer keeps (must cover the longest segment).
+STREAM_RING_SECONDS = float(os.getenv("STREAM_RING_SECONDS", "60"))
+# Finished segments transcribed at the same time per connection.
+STREAM_MAX_CONCURRENCY = int(os.getenv("STREAM_MAX_CONCURRENCY", "3"))
+# Emit an interim transcript of the open segment this often (0 disables).
+STREAM_PARTIAL_INTERVAL_S = float(os.getenv("STREAM_PARTIAL_INTERVAL_S", "2.0"))
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+# Voice activity detection
+VAD_FRAME_MS = int(os.getenv("STREAM_VAD_FRAME_MS", "30"))
+VAD_ENERGY_THRESHOLD = float(os.getenv("STREAM_VAD_THRESHOLD", "0.01"))
+VAD_MIN_SPEECH_MS = int(os.getenv("STREAM_VAD_MIN_SPEECH_MS", "150"))
+VAD_MIN_SILENCE_MS = int(os.getenv("STREAM_VAD_MIN_SILENCE_MS", "600"))
+VAD_MAX_SEGMENT_S = float(os.getenv("STREAM_VAD_MAX_SEGMENT_S", "15"))
+VAD_PRE_ROLL_MS = int(os.getenv("STREAM_VAD_PRE_ROLL_MS", "200"))
 
-async def process_streaming_audio(audio_chunk: bytes) -> Optional[str]:
-    """
-    Process a chunk of audio data and return the transcription.
+
+class PCMRingBuffer:
+    """Fixed-capacity float32 ring buffer addressed by absolute sample index."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buf = np.zeros(capacity, dtype=np.float32)
+        self.end = 0  # absolute index one past the newest sample
+
+    @property
+    def start(self) -> int:
+        """Absolute index of the oldest sample still held."""
+        return max(0, self.end - self.capacity)
+
+    def write(self, samples: np.ndarray) -> None:
+        n = len(samples)
+        if n > self.capacity:
+            # Only the newest `capacity` samples survive anyway.
+            self.end += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        pos = self.end % self.capacity
+        first = min(n, self.capacity - pos)
+        self._buf[pos:pos + first] = samples[:first]
+        if first < n:
+            self._buf[:n - first] = samples[first:]
+        self.end += n
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """Copy out samples in [start, end), clipped to what is still buffered."""
+        start = max(start, self.start)
+        end = min(end, self.end)
+        if end <= start:
+            return np.zeros(0, dtype=np.float32)
+        s = start % self.capacity
+        e = s + (end - start)
+        if e <= self.capacity:
+            return self._buf[s:e].copy()
+        return np.concatenate((self._buf[s:], self._buf[:e - self.capacity]))
+
+
+class EnergyVAD:
+    """Frame-energy voice activity detector that cuts speech into segments.
+
+    `process()` consumes new samples and returns the `(start, end)` absolute
+    sample ranges of segments that finished, either after `min_silence_ms` of
+    silence or when a segment reaches `max_segment_s`.
     """
-    try:
-        # Validate buffer size
-        if len(audio_chunk) % 4 != 0:  # Assuming float32 (4 bytes per element)
-            raise ValueError("Buffer size must be a multiple of element size (4 bytes for float32)")
 
-        # Convert bytes to numpy array
-        audio_np = np.frombuffer(audio_chunk, dtype=np.float32)
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_ms: int = VAD_FRAME_MS,
+        threshold: float = VAD_ENERGY_THRESHOLD,
+        min_speech_ms: int = VAD_MIN_SPEECH_MS,
+        min_silence_ms: int = VAD_MIN_SILENCE_MS,
+        max_segment_s: float = VAD_MAX_SEGMENT_S,
+        pre_roll_ms: int = VAD_PRE_ROLL_MS,
+    ):
+        self.frame_len = max(1, sample_rate * frame_ms // 1000)
+        self.threshold = threshold
+        self.min_speech = sample_rate * min_speech_ms // 1000
+        self.min_silence = sample_rate * min_silence_ms // 1000
+        self.max_segment = int(sample_rate * max_segment_s)
+        self.pre_roll = sample_rate * pre_roll_ms // 1000
 
-        # Ensure the NumPy array is writable
-        if not audio_np.flags.writeable:
-            audio_np = np.copy(audio_np)
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pos = 0  # absolute index one past the last scanned frame
+        self._voiced_run = 0
+        self.in_speech = False
+        self.speech_start = 0
+        self.last_voice_end = 0
 
-        # Convert to tensor
-        audio_tensor = torch.from_numpy(audio_np)
+    @property
+    def active_start(self) -> Optional[int]:
+        """Start of the segment currently being spoken, if any."""
+        return self.speech_start if self.in_speech else None
 
-        # Process with Gemini (or your preferred STT service)
-        response = await process_with_gemini(audio_tensor)
+    def process(self, samples: np.ndarray) -> list[tuple[int, int]]:
+        segments: list[tuple[int, int]] = []
+        if len(self._pending):
+            # Complete the frame left over from the previous chunk first so the
+            # rest of this chunk can be framed in place without concatenating.
+            need = self.frame_len - len(self._pending)
+            if len(samples) < need:
+                self._pending = np.concatenate((self._pending, samples))
+                return segments
+            self._scan(frame_rms(np.concatenate((self._pending, samples[:need])), self.frame_len), segments)
+            samples = samples[need:]
+        energies = frame_rms(samples, self.frame_len)
+        self._scan(energies, segments)
+        self._pending = samples[len(energies) * self.frame_len:].copy()
+        return segments
 
-        return response
-    except ValueError as ve:
-        logger.error(f"ValueError: {str(ve)}")
-        return None
-    except Exception as e:
-        logger.error(f"Error processing streaming audio: {str(e)}")
-        return None
+    def _scan(self, energies: np.ndarray, segments: list[tuple[int, int]]) -> None:
+        for energy in energies:
+            self._pos += self.frame_len
+            frame_end = self._pos
+            voiced = energy >= self.threshold
+            if not self.in_speech:
+                self._voiced_run = self._voiced_run + 1 if voiced else 0
+                if self._voiced_run * self.frame_len >= self.min_speech:
+                    onset = frame_end - self._voiced_run * self.frame_len
+                    self.in_speech = True
+                    self.speech_start = max(0, onset - self.pre_roll)
+                    self.last_voice_end = frame_end
+                continue
 
-async def process_with_gemini(audio_tensor) -> str:
+            if voiced:
+                self.last_voice_end = frame_end
+            if frame_end - self.speech_start >= self.max_segment:
+                # Hard cut; keep listening for the rest of the utterance.
+                segments.append((self.speech_start, frame_end))
+                self.speech_start = frame_end
+                self.last_voice_end = frame_end
+                if not voiced:
+                    self.in_speech = False
+                    self._voiced_run = 0
+            elif frame_end - self.last_voice_end >= self.min_silence:
+                segments.append((self.speech_start, min(frame_end, self.last_voice_end + self.pre_roll)))
+                self.in_speech = False
+                self._voiced_run = 0
+
+    def flush(self, end: int) -> Optional[tuple[int, int]]:
+        """Close the open segment at `end` (used when the stream finishes)."""
+        if not self.in_speech:
+            return None
+        self.in_speech = False
+        self._voiced_run = 0
+        return (self.speech_start, end)
+
+
+class GeminiSTTBackend:
+    """Transcribes finished PCM segments with Gemini (inline WAV)."""
+
+    def __init__(self, genai_client=None, model: Optional[str] = None):
+        self.genai_client = genai_client
+        self.model = model or os.getenv("GEMINI_STT_MODEL")
+
+    async def transcribe(self, samples: np.ndarray, sample_rate: int) -> str:
+        from google.genai import types
+        from services.genai_async import generate_content
+        from services.genai_client import get_default_client
+
+        if not self.model:
+            raise RuntimeError("GEMINI_STT_MODEL not configured")
+        client = self.genai_client or get_default_client()
+        if client is None:
+            raise RuntimeError("GenAI client unavailable")
+        audio_part = types.Part.from_bytes(
+            data=pcm_to_wav_bytes(samples, sample_rate), mime_type="audio/wav"
+        )
+        response = await generate_content(
+            client,
+            model=self.model,
+            contents=["Transcribe this audio verbatim. Return only the transcript.", audio_part],
+            config=types.GenerateContentConfig(max_output_tokens=512, temperature=0.0),
+        )
+        return (getattr(response, "text", None) or "").strip()
+
+
+class FakeSTTBackend:
+    """Local stand-in for Gemini used in development and tests.
+
+    Sleeps for `latency_s` and returns a deterministic description of the
+    segment, so the pipeline can be exercised without network or quota.
     """
-    Process audio with Gemini API.
-    Note: This is a simplified version. You'll need to implement the actual
-    Gemini streaming API integration based on their documentation.
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls = 0
+
+    async def transcribe(self, samples: np.ndarray, sample_rate: int) -> str:
+        self.calls += 1
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        return f"[speech {len(samples) / sample_rate:.2f}s]"
+
+
+def get_stt_backend():
+    """Backend selected by STREAMING_STT_BACKEND (`gemini` by default, or `fake`)."""
+    if os.getenv("STREAMING_STT_BACKEND", "gemini").lower() == "fake":
+        return FakeSTTBackend(latency_s=float(os.getenv("STREAMING_FAKE_LATENCY_S", "0.2")))
+    return GeminiSTTBackend()
+
+
+class StreamingSession:
+    """Incremental STT pipeline for one audio stream.
+
+    `feed()` only buffers and segments audio, so chunk reception never waits
+    on transcription. Finished segments are transcribed concurrently (bounded
+    by `max_concurrency`) and results are published on `messages` as dicts:
+
+        {"type": "partial", "seq": n, "interim": text}
+        {"type": "final", "seq": n, "final": text, "start": s, "end": s}
+
+    Finals are released strictly in `seq` order; a partial for a segment is
+    dropped once that segment's final exists. `None` marks the end of stream.
+    Pass `messages` to publish into another sink with `put_nowait` (e.g. a
+    connection's bounded outbox) instead of an unbounded asyncio.Queue.
     """
-    try:
-        # Convert tensor to appropriate format for Gemini
-        # Implement actual Gemini streaming API call here
-        # This is a placeholder
-        return "Transcription result would go here"
-    except Exception as e:
-        logger.error(f"Error with Gemini API: {str(e)}")
-        return ""
+
+    def __init__(
+        self,
+        backend,
+        sample_rate: int = STREAM_SAMPLE_RATE,
+        max_concurrency: int = STREAM_MAX_CONCURRENCY,
+        partial_interval_s: float = STREAM_PARTIAL_INTERVAL_S,
+        vad: Optional[EnergyVAD] = None,
+        messages=None,
+    ):
+        self.backend = backend
+        self.sample_rate = sample_rate
+        self.ring = PCMRingBuffer(int(sample_rate * STREAM_RING_SECONDS))
+        self.vad = vad or EnergyVAD(sample_rate)
+        self.messages = messages if messages is not None else asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._carry = b""
+        self._next_seq = 0
+        self._next_emit = 0
+        self._ready: dict[int, dict] = {}
+        self._partial_interval = int(partial_interval_s * sample_rate)
+        self._last_partial_at: Optional[int] = None
+        self._partial_busy = False
+        self._finished = False
+        self.stats = {"chunks": 0, "samples": 0, "segments": 0, "partials": 0, "errors": 0}
+
+    def feed(self, chunk) -> None:
+        """Accept a chunk of float32 PCM (bytes/bytearray/memoryview, any length).
+
+        Never blocks and never copies the chunk: samples are viewed in place
+        with `np.frombuffer` and copied once, into the ring buffer. A trailing
+        partial sample is carried over to the next chunk.
+        """
+        if self._finished:
+            return
+        view = memoryview(chunk).cast("B")
+        if self._carry:
+            need = 4 - len(self._carry)
+            if len(view) < need:
+                self._carry += bytes(view)
+                return
+            self._push(np.frombuffer(self._carry + bytes(view[:need]), dtype=np.float32))
+            view = view[need:]
+            self._carry = b""
+        usable = len(view) - len(view) % 4
+        if usable < len(view):
+            self._carry = bytes(view[usable:])
+        if usable:
+            self._push(np.frombuffer(view[:usable], dtype=np.float32))
+        self.stats["chunks"] += 1
+        self._maybe_start_partial()
+
+    def _push(self, samples: np.ndarray) -> None:
+        self.stats["samples"] += len(samples)
+        AUDIO_SECONDS.inc(len(samples) / self.sample_rate, path="stream")
+        self.ring.write(samples)
+        for start, end in self.vad.process(samples):
+            self._start_final(start, end)
+
+    async def close(self) -> None:
+        """Flush the open segment, wait for pending transcriptions, end the stream."""
+        if self._finished:
+            return
+        self._finished = True
+        segment = self.vad.flush(self.ring.end)
+        if segment:
+            self._start_final(*segment)
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        self.messages.put_nowait(None)
+
+    async def abort(self) -> None:
+        """Drop pending work (e.g. the client went away) and end the stream."""
+        self._finished = True
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+        self.messages.put_nowait(None)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_backend(self, samples: np.ndarray) -> str:
+        async with self._semaphore:
+            return await self.backend.transcribe(samples, self.sample_rate)
+
+    def _start_final(self, start: int, end: int) -> None:
+        seq = self._next_seq
+        self._next_seq += 1
+        self._last_partial_at = None
+        self.stats["segments"] += 1
+        self._spawn(self._transcribe_final(seq, start, end, self.ring.read(start, end)))
+
+    def _maybe_start_partial(self) -> None:
+        start = self.vad.active_start
+        if start is None or self._partial_interval <= 0 or self._partial_busy:
+            return
+        anchor = self._last_partial_at if self._last_partial_at is not None else start
+        if self.ring.end - anchor < self._partial_interval:
+            return
+        self._last_partial_at = self.ring.end
+        self._partial_busy = True
+        self._spawn(self._transcribe_partial(self._next_seq, self.ring.read(start, self.ring.end)))
+
+    async def _transcribe_partial(self, seq: int, samples: np.ndarray) -> None:
+        try:
+            text = await self._run_backend(samples)
+        except Exception as e:
+            logger.warning(f"[STREAM] Partial transcription failed: {e}")
+            return
+        finally:
+            self._partial_busy = False
+        # Stale once the final for this segment has been produced.
+        if text and seq >= self._next_emit and seq not in self._ready:
+            self.stats["partials"] += 1
+            self.messages.put_nowait({"type": "partial", "seq": seq, "interim": text})
+
+    async def _transcribe_final(self, seq: int, start: int, end: int, samples: np.ndarray) -> None:
+        message = {
+            "type": "final",
+            "seq": seq,
+            "start": round(start / self.sample_rate, 3),
+            "end": round(end / self.sample_rate, 3),
+        }
+        t0 = time.perf_counter()
+        try:
+            message["final"] = await self._run_backend(samples)
+        except Exception as e:
+            logger.error(f"[STREAM] Segment {seq} transcription failed: {e}")
+            self.stats["errors"] += 1
+            message["final"] = ""
+            message["error"] = str(e)
+        message["latency_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        self._ready[seq] = message
+        while self._next_emit in self._ready:
+            self.messages.put_nowait(self._ready.pop(self._next_emit))
+            self._next_emit += 1
@@ -0,0 +1,244 @@
+"""Content-addressed cache for conversation analysis results.
+
+Entries are keyed by the SHA-256 of the audio bytes plus the STT and LLM model
+names, so re-analyzing the same recording (UI refresh, retried summary/SOAP
+steps) returns the stored transcript and speaker timeline without calling
+Gemini. There is an in-memory LRU tier and an optional on-disk tier with
+size-based eviction. When several workers run (`SHARED_STATE_URL` is set),
+entries are also written to the shared state so every worker can serve them.
+
+Configuration:
+    TRANSCRIPT_CACHE_ENABLED      "0" disables the cache (default "1")
+    TRANSCRIPT_CACHE_MAX_ENTRIES  in-memory LRU capacity (default 256)
+    TRANSCRIPT_CACHE_DIR          directory for the disk tier; unset disables it
+    TRANSCRIPT_CACHE_MAX_BYTES    disk tier budget in bytes (default 256 MiB)
+    TRANSCRIPT_CACHE_SHARED_TTL_S lifetime of shared-state entries (default 86400)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from services.logger import logger
+from services.shared_state import SharedState, get_shared_state
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """SHA-256 of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_key(audio_sha256: str, stt_model: Optional[str], llm_model: Optional[str]) -> str:
+    raw = f"{audio_sha256}|stt={stt_model or ''}|llm={llm_model or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranscriptCache:
+    def __init__(
+        self,
+        max_entries: int = 256,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = 256 * 1024 * 1024,
+        shared: Optional[SharedState] = None,
+        shared_ttl_s: float = 86400.0,
+    ):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.shared = shared
+        self.shared_ttl_s = shared_ttl_s
+        self._memory: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._disk_entries())
+
+    # -- memory tier -------------------------------------------------------
+
+    def _memory_get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+            return value
+
+    def _memory_put(self, key: str, value: dict) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    # -- disk tier ---------------------------------------------------------
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _disk_entries(self) -> list[tuple[float, str, int]]:
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        return entries
+
+    def _disk_get(self, key: str) -> Optional[dict]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)  # mtime doubles as the LRU clock for eviction
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"[CACHE] Dropping unreadable transcript cache entry {path}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _disk_put(self, key: str, value: dict) -> None:
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_bytes += os.path.getsize(path) - old_size
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_bytes = total
+
+    # -- shared tier -------------------------------------------------------
+
+    async def _shared_get(self, key: str) -> Optional[dict]:
+        try:
+            return await self.shared.get_json(f"transcript:{key}")
+        except Exception as e:
+            logger.warning(f"[CACHE] Shared transcript cache lookup failed: {e}")
+            return None
+
+    async def _shared_put(self, key: str, value: dict) -> None:
+        try:
+            await self.shared.set_json(f"transcript:{key}", value, self.shared_ttl_s)
+        except Exception as e:
+            logger.warning(f"[CACHE] Could not write shared transcript cache entry: {e}")
+
+    # -- public API --------------------------------------------------------
+
+    def get(self, key: str) -> Optional[dict]:
+        value = self._memory_get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        if self.disk_dir:
+            value = self._disk_get(key)
+            if value is not None:
+                self.hits += 1
+                self.disk_hits += 1
+                self._memory_put(key, value)
+                return value
+        self.misses += 1
+        return None
+
+    def put(self, key: str, value: dict) -> None:
+        self._memory_put(key, value)
+        if self.disk_dir:
+            try:
+                self._disk_put(key, value)
+            except OSError as e:
+                logger.warning(f"[CACHE] Could not write transcript cache entry: {e}")
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """`get` that keeps disk reads off the event loop and also asks the shared tier."""
+        value = self._memory_get(key)
+        if value is None and self.disk_dir:
+            value = await asyncio.to_thread(self._disk_get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self._memory_put(key, value)
+        if value is None and self.shared is not None:
+            value = await self._shared_get(key)
+            if value is not None:
+                self.shared_hits += 1
+                self._memory_put(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def aput(self, key: str, value: dict) -> None:
+        if self.disk_dir:
+            await asyncio.to_thread(self.put, key, value)
+        else:
+            self.put(key, value)
+        if self.shared is not None:
+            await self._shared_put(key, value)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+            "disk_bytes": self._disk_bytes if self.disk_dir else None,
+        }
+
+
+_cache: Optional[TranscriptCache] = None
+
+
+def get_transcript_cache() -> Optional[TranscriptCache]:
+    """Process-wide cache, or None when TRANSCRIPT_CACHE_ENABLED=0."""
+    global _cache
+    if os.getenv("TRANSCRIPT_CACHE_ENABLED", "1") == "0":
+        return None
+    if _cache is None:
+        _cache = TranscriptCache(
+            max_entries=int(os.getenv("TRANSCRIPT_CACHE_MAX_ENTRIES", "256")),
+            disk_dir=os.getenv("TRANSCRIPT_CACHE_DIR") or None,
+            disk_max_bytes=int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+            shared=get_shared_state(),
+            shared_ttl_s=float(os.getenv("TRANSCRIPT_CACHE_SHARED_TTL_S", "86400")),
+        )
+    return _cache
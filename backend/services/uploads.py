@@ -0,0 +1,154 @@
+"""Chunked, non-blocking upload sink.
+
+`save_upload` streams a FastAPI `UploadFile` to disk in fixed-size blocks,
+so memory per request stays flat no matter how long the recording is. File
+writes and hashing run off the event loop, the size limit is enforced while
+streaming, and the SHA-256 and (for WAV) duration are computed on the fly.
+
+Configuration:
+    UPLOAD_CHUNK_SIZE  block size in bytes (default 1 MiB)
+    UPLOAD_MAX_BYTES   largest accepted upload in bytes (default 500 MiB)
+"""
+import asyncio
+import hashlib
+import os
+import struct
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from services.metrics import stage
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(500 * 1024 * 1024)))
+
+
+def temp_upload_path(prefix: str, filename: Optional[str]) -> str:
+    """Unique scratch path for an upload, keeping the client's extension (decoders use it).
+
+    Never derived from the client's file name, so concurrent uploads of
+    `recording.wav` cannot overwrite each other.
+    """
+    ext = os.path.splitext(os.path.basename(filename or ""))[1] or ".wav"
+    return f"{prefix}_{uuid.uuid4().hex}{ext}"
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Upload exceeds the maximum size of {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+@dataclass
+class SavedUpload:
+    path: str
+    size: int
+    sha256: str
+    duration_seconds: Optional[float] = None
+
+
+class WavDurationProbe:
+    """Derive a WAV file's duration from its header as bytes stream past.
+
+    Only the first few KB are buffered. Streaming encoders sometimes write a
+    placeholder data size, in which case the size of what actually followed
+    the header is used instead.
+    """
+
+    HEADER_LIMIT = 64 * 1024
+
+    def __init__(self):
+        self._head = bytearray()
+        self._done = False
+        self.byte_rate: Optional[int] = None
+        self.data_offset: Optional[int] = None
+        self.data_size: Optional[int] = None
+
+    def feed(self, chunk: bytes) -> None:
+        if self._done:
+            return
+        self._head += chunk[: self.HEADER_LIMIT - len(self._head)]
+        self._parse()
+        if self.data_offset is not None or len(self._head) >= self.HEADER_LIMIT:
+            self._done = True
+            self._head = bytearray()
+
+    def _parse(self) -> None:
+        head = bytes(self._head)
+        if len(head) < 12:
+            return
+        if head[:4] != b"RIFF" or head[8:12] != b"WAVE":
+            self._done = True
+            return
+        pos = 12
+        while pos + 8 <= len(head):
+            chunk_id, size = head[pos:pos + 4], struct.unpack("<I", head[pos + 4:pos + 8])[0]
+            body = pos + 8
+            if chunk_id == b"fmt " and body + 12 <= len(head):
+                self.byte_rate = struct.unpack("<I", head[body + 8:body + 12])[0]
+            elif chunk_id == b"data":
+                self.data_offset = body
+                self.data_size = size
+                return
+            pos = body + size + (size & 1)
+
+    def duration(self, total_size: int) -> Optional[float]:
+        if not self.byte_rate or self.data_offset is None:
+            return None
+        available = max(0, total_size - self.data_offset)
+        data_size = self.data_size if self.data_size and self.data_size <= available else available
+        return round(data_size / self.byte_rate, 3)
+
+
+def _write_block(f, digest, block: bytes) -> None:
+    f.write(block)
+    digest.update(block)
+
+
+def _discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+async def save_upload(
+    upload,
+    dest_path: str,
+    max_bytes: int = UPLOAD_MAX_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> SavedUpload:
+    """Stream `upload` to `dest_path`; raises `UploadTooLarge` past `max_bytes`.
+
+    A partially written file is removed on any failure.
+    """
+    with stage("upload"):
+        return await _save_upload(upload, dest_path, max_bytes, chunk_size)
+
+
+async def _save_upload(upload, dest_path: str, max_bytes: int, chunk_size: int) -> SavedUpload:
+    digest = hashlib.sha256()
+    probe = WavDurationProbe()
+    size = 0
+    f = await asyncio.to_thread(open, dest_path, "wb")
+    try:
+        while True:
+            block = await upload.read(chunk_size)
+            if not block:
+                break
+            size += len(block)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            probe.feed(block)
+            await asyncio.to_thread(_write_block, f, digest, block)
+    except BaseException:
+        await asyncio.to_thread(f.close)
+        await asyncio.to_thread(_discard, dest_path)
+        raise
+    await asyncio.to_thread(f.close)
+    return SavedUpload(
+        path=dest_path,
+        size=size,
+        sha256=digest.hexdigest(),
+        duration_seconds=probe.duration(size),
+    )
@@ -1,13 +1,82 @@
 import os
-import logging
-import json
+import asyncio
+import time
 from .gemini_stt import transcribe_audio
+from .genai_async import generate_content, stream_content
+from .genai_client import get_default_client
+from .transcript_cache import get_transcript_cache, hash_file, make_key
+from .llm_cache import cached_llm_call, lookup_llm_response, store_llm_response
+from .json_stream import JsonFieldStream
+from .prompts.registry import generate_from_template, get_context_caches, prepare_request
+from .genai_limits import is_retryable
+from .rate_limit import CircuitOpenError
+from .llm_schemas import LLMOutputError, STRUCTURED_OUTPUT, parse_llm_json, structured_config
+from .long_audio import is_long_audio, transcribe_long_audio, strip_overlap
+from .audio_utils import probe_duration
+from .audio_preprocess import try_normalize_for_stt
+from .metrics import AUDIO_SECONDS, stage, timed
 from services.logger import logger
 
-async def analyze_speakers_with_llm(transcript, genai_client=None, model=None):
+# Bump when a prompt changes so cached responses from the old prompt are not reused.
+SUMMARY_PROMPT_VERSION = "summary-v1"
+AI_EDIT_PROMPT_VERSION = "ai-edit-v1"
+
+# Pipelined analysis: speaker separation runs on each transcript segment as
+# soon as it is transcribed instead of waiting for the whole transcript.
+# Recordings at least ANALYZE_PIPELINED_MIN_S long are segmented for this
+# even when they are below the long-audio threshold. Opt-in: per-segment
+# analysis sees only the previous segment's tail, so its speaker split can
+# differ from a single whole-transcript call.
+ANALYZE_PIPELINED = os.getenv("ANALYZE_PIPELINED", "0") == "1"
+ANALYZE_PIPELINED_MIN_S = float(os.getenv("ANALYZE_PIPELINED_MIN_S", "120"))
+ANALYZE_PIPELINED_SEGMENT_S = float(os.getenv("ANALYZE_PIPELINED_SEGMENT_S", "30"))
+# Tail of the previous segment shown to the LLM so speaker roles carry over.
+PIPELINE_CONTEXT_CHARS = 400
+
+def _conversation_text(data) -> str:
+    """Text the summary/SOAP prompts are built from: timeline if present, else transcript."""
+    transcript = data.get("transcript", "")
+    timeline = data.get("timeline", [])
+    if timeline and isinstance(timeline, list):
+        return " ".join([seg.get("text", "") for seg in timeline])
+    return transcript
+
+SPEAKER_ROLE_PROMPT = (
+    "You are a medical conversation separator. Your ONLY job is to separate doctor and patient speech. "
+)
+
+def _speaker_request(transcript, context=None, structured=None):
+    """Contents and generation config for speaker separation.
+
+    With structured output the JSON shape is sent as response_schema; without
+    it the schema is spelled out in the system prompt.
+    """
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    if structured:
+        prompt_system = SPEAKER_ROLE_PROMPT + "Label every timeline turn as doctor or patient."
+        config = structured_config("speakers")
+    else:
+        prompt_system = SPEAKER_ROLE_PROMPT + (
+            "Return STRICT JSON only matching the schema: {\n  \"doctor_parts\": string,\n  \"patient_parts\": string,\n  \"timeline\": [{\"speaker\": \"doctor|patient\", \"text\": string, \"timestamp\": string}],\n  \"confidence\": number\n}\nDo not add any explanatory text.\n"
+        )
+        config = {"response_mime_type": "application/json"}
+
+    prompt_user = f"TRANSCRIPT:\n{transcript}\n\nReturn JSON only."
+    if context:
+        prompt_user = (
+            "PRECEDING CONTEXT (already processed; use only to tell who is speaking, do not include it):\n"
+            f"{context}\n\n{prompt_user}"
+        )
+    return [prompt_system, prompt_user], config
+
+async def analyze_speakers_with_llm(transcript, genai_client=None, model=None, context=None):
     logger.info("Starting speaker analysis using LLM.")
     """
-    Analyze conversation transcript to identify speakers using LLM
+    Analyze conversation transcript to identify speakers using LLM.
+
+    `context` is optional preceding transcript (e.g. the end of the previous
+    segment) used only to keep speaker roles consistent across segments.
     """
     try:
         if not transcript:
@@ -20,23 +89,8 @@ async def analyze_speakers_with_llm(transcript, genai_client=None, model=None):
                 "confidence": 0.0,
             }
 
-        # Use injected client if provided, otherwise create one
-        client = genai_client
-        if client is None:
-            api_key = os.getenv("GEMINI_API_KEY")
-            logger.info(f" [LLM] GEMINI_API_KEY check: {'Found' if api_key else 'Missing'}")
-            if api_key:
-                logger.info(f" [LLM] GEMINI_API_KEY starts with: {api_key[:10]}...")
-            import google.genai as genai
-            client = genai.Client(api_key=api_key)
-
-        # Primary prompt: request strict JSON and set response_mime_type to application/json
-        prompt_system = (
-            "You are a medical conversation separator. Your ONLY job is to separate doctor and patient speech. "
-            "Return STRICT JSON only matching the schema: {\n  \"doctor_parts\": string,\n  \"patient_parts\": string,\n  \"timeline\": [{\"speaker\": \"doctor|patient\", \"text\": string, \"timestamp\": string}],\n  \"confidence\": number\n}\nDo not add any explanatory text.\n"
-        )
-
-        prompt_user = f"TRANSCRIPT:\n{transcript}\n\nReturn JSON only."
+        # Use injected client if provided, otherwise the shared pooled client
+        client = genai_client or get_default_client()
 
         if model is None:
             model = os.getenv("GEMINI_LLM_MODEL")
@@ -46,75 +100,57 @@ async def analyze_speakers_with_llm(transcript, genai_client=None, model=None):
                     "error": "GEMINI_LLM_MODEL not configured",
                 }
 
+        # Primary request: JSON output constrained by the response schema
+        contents, config = _speaker_request(transcript, context)
         try:
-            response = client.models.generate_content(
+            response = await generate_content(
+                client,
                 model=model,
-                contents=[prompt_system, prompt_user],
-                config={
-                    "response_mime_type": "application/json",
-                    # keep other generation defaults
-                },
+                contents=contents,
+                config=config,
             )
         except Exception as e:
+            if is_retryable(e) or isinstance(e, CircuitOpenError):
+                # Quota / availability failure already retried by the limiter; a
+                # looser request would not fare any better.
+                raise
             logger.warning(f"[LLM] First attempt failed: {e}. Retrying without response_mime_type.")
-            response = client.models.generate_content(
+            response = await generate_content(
+                client,
                 model=model,
-                contents=[prompt_system, prompt_user],
+                contents=_speaker_request(transcript, context, structured=False)[0],
             )
 
         llm_response = getattr(response, "text", None) or str(response)
         logger.info(f" [LLM] Received analysis (truncated): {llm_response[:300]}")
 
-        # If the SDK returned JSON directly (response.text possibly already JSON string), attempt parse
+        # Parse, repairing fences/trailing commas/truncation, and validate the schema
         try:
-            analysis = json.loads(llm_response)
-            logger.info(" [LLM] Successfully parsed JSON response")
-        except json.JSONDecodeError:
-            # Last resort: try to extract JSON substring
-            start = llm_response.find('{')
-            end = llm_response.rfind('}')
-            if start != -1 and end != -1 and end > start:
-                candidate = llm_response[start:end+1]
-                try:
-                    analysis = json.loads(candidate)
-                    logger.info(" [LLM] Parsed JSON after extracting substring")
-                except Exception as e:
-                    logger.error(f" [LLM] Failed to parse JSON after extraction: {e}")
-                    return {
-                        "error": "Invalid JSON response",
-                        "doctor_parts": "",
-                        "patient_parts": "",
-                        "timeline": [],
-                        "confidence": 0.0,
-                    }
-            else:
-                logger.error(" [LLM] No JSON object found in LLM response")
-                return {
-                    "error": "Invalid JSON response",
-                    "doctor_parts": "",
-                    "patient_parts": "",
-                    "timeline": [],
-                    "confidence": 0.0,
-                }
+            analysis = parse_llm_json("speakers", llm_response)
+        except LLMOutputError as e:
+            logger.error(f" [LLM] Failed to parse JSON response: {e}")
+            return {
+                "error": "Invalid JSON response",
+                "doctor_parts": "",
+                "patient_parts": "",
+                "timeline": [],
+                "confidence": 0.0,
+            }
 
-        # Normalize analysis fields
-        doctor = analysis.get("doctor_parts", "")
-        patient = analysis.get("patient_parts", "")
-        timeline = analysis.get("timeline", []) or []
-        confidence = float(analysis.get("confidence", 0.0) or 0.0)
+        doctor = analysis["doctor_parts"]
+        patient = analysis["patient_parts"]
+        confidence = analysis["confidence"]
 
         # Clean timeline entries
         cleaned_timeline = []
-        for item in timeline:
-            if not isinstance(item, dict):
-                continue
-            text = (item.get("text") or "").strip()
-            speaker = (item.get("speaker") or "").lower()
+        for item in analysis["timeline"]:
+            text = item["text"].strip()
+            speaker = item["speaker"].lower()
             if text:
                 cleaned_timeline.append({
                     "speaker": "doctor" if speaker.startswith("doc") else "patient",
                     "text": text,
-                    "timestamp": item.get("timestamp", "")
+                    "timestamp": item["timestamp"]
                 })
 
         return {
@@ -134,20 +170,212 @@ async def analyze_speakers_with_llm(transcript, genai_client=None, model=None):
             "error": str(e),
         }
 
-async def process_conversation_audio(temp_path, genai_client=None, model=None):
+def _format_timestamp(seconds: float) -> str:
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+def _offset_timestamp(timestamp, offset_s: float) -> str:
+    """Shift a segment-relative "MM:SS"/"H:MM:SS" timestamp to recording time."""
+    if not timestamp:
+        return _format_timestamp(offset_s)
+    parts = str(timestamp).strip().split(":")
+    try:
+        values = [float(p) for p in parts]
+    except ValueError:
+        return timestamp
+    if len(values) not in (2, 3):
+        return timestamp
+    seconds = sum(v * 60 ** i for i, v in enumerate(reversed(values)))
+    return _format_timestamp(seconds + offset_s)
+
+SPEAKER_SWAP = {"doctor": "patient", "patient": "doctor"}
+
+def _labels_flipped(timeline: list, items: list) -> bool:
+    """True when a segment opens by repeating the previous turn's words under the other label.
+
+    Segments overlap, so the first turn of a segment normally continues the
+    last turn of the previous one; the same words attributed to the other
+    speaker mean the LLM swapped the roles for the whole segment.
+    """
+    if not timeline or not items:
+        return False
+    last, first = timeline[-1], items[0]
+    if first.get("speaker") not in SPEAKER_SWAP or first["speaker"] == last["speaker"]:
+        return False
+    return strip_overlap(last["text"], first.get("text", "")) != first.get("text", "")
+
+async def _merge_segment_analyses(segment_analyses: dict, offset_s: float = 0.0) -> dict:
+    """Merge per-segment speaker analyses into one timeline, in segment order.
+
+    Words repeated across segment overlaps are dropped, a segment whose
+    speaker labels came back swapped is flipped back, and timestamps are
+    shifted by the segment start plus `offset_s` (silence trimmed before
+    transcription). Confidence is weighted by segment length.
+    """
+    indices = sorted(segment_analyses)
+    analyses = await asyncio.gather(*(segment_analyses[i][1] for i in indices))
+    timeline, doctor_parts, patient_parts = [], "", ""
+    weighted_confidence, total_weight, failed = 0.0, 0, 0
+    for idx, analysis in zip(indices, analyses):
+        segment = segment_analyses[idx][0]
+        if analysis.get("error"):
+            failed += 1
+            logger.warning(f" [ANALYZE] Speaker analysis failed for segment {idx}: {analysis['error']}")
+            continue
+        items = analysis.get("timeline", [])
+        doctor = analysis.get("doctor_parts", "")
+        patient = analysis.get("patient_parts", "")
+        if _labels_flipped(timeline, items):
+            logger.info(f" [ANALYZE] Speaker labels swapped in segment {idx}; reconciling")
+            items = [{**item, "speaker": SPEAKER_SWAP.get(item["speaker"], item["speaker"])} for item in items]
+            doctor, patient = patient, doctor
+        for n, item in enumerate(items):
+            text = item["text"]
+            if n == 0 and timeline:
+                text = strip_overlap(" ".join(t["text"] for t in timeline[-3:]), text)
+            if not text:
+                continue
+            timeline.append({
+                "speaker": item["speaker"],
+                "text": text,
+                "timestamp": _offset_timestamp(item.get("timestamp"), segment["start"] + offset_s),
+            })
+        if doctor:
+            doctor = strip_overlap(doctor_parts, doctor) if doctor_parts else doctor
+            doctor_parts = f"{doctor_parts} {doctor}".strip()
+        if patient:
+            patient = strip_overlap(patient_parts, patient) if patient_parts else patient
+            patient_parts = f"{patient_parts} {patient}".strip()
+        weight = max(1, len(segment.get("text", "")))
+        weighted_confidence += analysis.get("confidence", 0.0) * weight
+        total_weight += weight
+
+    if failed == len(indices):
+        return {
+            "error": "Speaker analysis failed for all segments",
+            "doctor_parts": "",
+            "patient_parts": "",
+            "timeline": [],
+            "confidence": 0.0,
+        }
+    return {
+        "doctor_parts": doctor_parts,
+        "patient_parts": patient_parts,
+        "timeline": timeline,
+        "confidence": round(weighted_confidence / total_weight, 3) if total_weight else 0.0,
+    }
+
+def _cancel_segment_analyses(segment_analyses: dict) -> None:
+    for _, task in segment_analyses.values():
+        task.cancel()
+
+async def process_conversation_audio(temp_path, genai_client=None, model=None, audio_sha256=None, on_progress=None, pipelined=None):
     logger.info(f"Processing audio file: {temp_path}")
     """
     Process audio file for conversation analysis. Accept optional injected
     `genai_client` and `model` for DI/testing.
+
+    Results are cached by audio content hash plus model names; pass
+    `audio_sha256` when the caller already hashed the upload. `on_progress`
+    is an optional async callback receiving the stage name
+    ("transcribing", "diarizing") as the analysis advances.
+
+    When `pipelined` (default ANALYZE_PIPELINED) applies and the recording is
+    segmented, speaker analysis runs per segment while the remaining segments
+    are still being transcribed, so only the last segment's small LLM call is
+    left once transcription finishes.
+
+    The audio is normalized (16 kHz mono, silence trimmed) once before any
+    transcription; the size/time savings are returned under
+    "audio_preprocessing".
     """
+    segment_analyses = {}
+    transcripts = {}
+    normalized = None
     try:
+        cache = get_transcript_cache()
+        cache_key = None
+        if cache is not None:
+            if audio_sha256 is None:
+                audio_sha256 = await asyncio.to_thread(hash_file, temp_path)
+            cache_key = make_key(
+                audio_sha256,
+                os.getenv("GEMINI_STT_MODEL"),
+                model or os.getenv("GEMINI_LLM_MODEL"),
+            )
+            cached = await cache.aget(cache_key)
+            if cached is not None:
+                logger.info(f" [ANALYZE] Transcript cache hit for {audio_sha256[:12]}")
+                return {**cached, "cached": True}
+
         logger.info(" [ANALYZE] Starting Gemini transcription...")
-        full_transcript = transcribe_audio(temp_path)
+        if on_progress is not None:
+            await on_progress("transcribing")
+        transcript_segments = None
+        with stage("preprocess"):
+            normalized = await asyncio.to_thread(try_normalize_for_stt, temp_path)
+        stt_path = normalized.path if normalized is not None else temp_path
+        duration = await asyncio.to_thread(probe_duration, stt_path)
+        if duration:
+            AUDIO_SECONDS.inc(duration, path="conversation")
+        if pipelined is None:
+            pipelined = ANALYZE_PIPELINED
+        long_audio = is_long_audio(duration)
+        pipelined = pipelined and duration is not None and (long_audio or duration >= ANALYZE_PIPELINED_MIN_S)
+        with stage("stt"):
+            if long_audio or pipelined:
+                # Split into segments transcribed in parallel; in pipelined mode each
+                # segment goes to speaker analysis as soon as its text arrives.
+                if pipelined:
+                    def transcript_of(index):
+                        if index not in transcripts:
+                            transcripts[index] = asyncio.get_running_loop().create_future()
+                        return transcripts[index]
+
+                    async def analyze_segment(segment):
+                        # Segments finish in any order; wait for the previous one's
+                        # text so every analysis sees where the conversation left off.
+                        previous = await transcript_of(segment["index"] - 1) if segment["index"] > 0 else ""
+                        return await analyze_speakers_with_llm(
+                            segment["text"], genai_client=genai_client, model=model,
+                            context=previous[-PIPELINE_CONTEXT_CHARS:],
+                        )
+
+                    async def _publish_segment(segment):
+                        future = transcript_of(segment["index"])
+                        if not future.done():
+                            future.set_result(segment["text"])
+                        if not segment["text"].strip():
+                            return
+                        segment_analyses[segment["index"]] = (segment, asyncio.create_task(analyze_segment(segment)))
+
+                long_result = await transcribe_long_audio(
+                    stt_path,
+                    genai_client=genai_client,
+                    on_segment=_publish_segment if pipelined else None,
+                    **({} if long_audio else {"segment_s": ANALYZE_PIPELINED_SEGMENT_S}),
+                )
+                for future in transcripts.values():
+                    if not future.done():
+                        future.set_result("")
+                full_transcript = long_result["text"] if long_result else None
+                transcript_segments = long_result["segments"] if long_result else None
+                if transcript_segments and normalized is not None and normalized.trimmed_leading_s:
+                    # Keep timestamps relative to the original recording.
+                    offset = normalized.trimmed_leading_s
+                    for segment in transcript_segments:
+                        segment["start"] = round(segment["start"] + offset, 2)
+                        segment["end"] = round(segment["end"] + offset, 2)
+            else:
+                full_transcript = await transcribe_audio(stt_path, genai_client=genai_client, normalize=False)
         logger.info(f" [ANALYZE] Full transcript obtained: {str(full_transcript)[:200]}...")
 
         # If transcription failed (None), return structured error response and skip LLM call
         if full_transcript is None:
             logger.warning(" [ANALYZE] Transcription failed or empty - skipping LLM analysis")
+            _cancel_segment_analyses(segment_analyses)
             return {
                 "error": "Transcription failed",
                 "transcript": "",
@@ -160,6 +388,7 @@ async def process_conversation_audio(temp_path, genai_client=None, model=None):
         # Check if transcript is empty or too short
         if not full_transcript or len(full_transcript.strip()) < 10:
             logger.warning(" [ANALYZE] Transcript too short or empty, skipping LLM analysis")
+            _cancel_segment_analyses(segment_analyses)
             return {
                 "transcript": full_transcript,
                 "doctor_transcript": "No sufficient audio detected",
@@ -169,7 +398,15 @@ async def process_conversation_audio(temp_path, genai_client=None, model=None):
             }
 
         logger.info(" [ANALYZE] Sending to LLM for speaker analysis...")
-        analyzed_conversation = await analyze_speakers_with_llm(full_transcript, genai_client=genai_client, model=model)
+        if on_progress is not None:
+            await on_progress("diarizing")
+        with stage("diarization"):
+            if segment_analyses:
+                # Same shift as transcript_segments, so both use recording time.
+                lead_in = normalized.trimmed_leading_s if normalized is not None else 0.0
+                analyzed_conversation = await _merge_segment_analyses(segment_analyses, offset_s=lead_in or 0.0)
+            else:
+                analyzed_conversation = await analyze_speakers_with_llm(full_transcript, genai_client=genai_client, model=model)
 
         logger.info(f" [ANALYZE] LLM Analysis result keys: {list(analyzed_conversation.keys())}")
         logger.info(f" [ANALYZE] Doctor parts length: {len(analyzed_conversation.get('doctor_parts', ''))}")
@@ -183,12 +420,20 @@ async def process_conversation_audio(temp_path, genai_client=None, model=None):
             "full_conversation": analyzed_conversation.get("timeline", []),
             "analysis_confidence": analyzed_conversation.get("confidence", 0.8)
         }
+        if transcript_segments is not None:
+            result["transcript_segments"] = transcript_segments
 
         logger.info(f" [ANALYZE] Final result keys: {list(result.keys())}")
+        # Only complete analyses are worth replaying
+        if cache_key is not None and "error" not in analyzed_conversation:
+            await cache.aput(cache_key, dict(result))
+        if normalized is not None:
+            result["audio_preprocessing"] = normalized.stats()
         logger.info("Audio processing and analysis completed successfully.")
         return result
 
     except Exception as e:
+        _cancel_segment_analyses(segment_analyses)
         logger.error(f"Error during audio processing: {str(e)}", exc_info=True)
         return {
             "error": str(e),
@@ -197,26 +442,29 @@ async def process_conversation_audio(temp_path, genai_client=None, model=None):
             "patient_transcript": "",
             "full_conversation": []
         }
+    finally:
+        if normalized is not None and os.path.exists(normalized.path):
+            os.remove(normalized.path)
 
 async def generate_conversation_summary(data, genai_client=None, model=None):
     """
-    Generate AI summary of conversation
+    Generate AI summary of conversation.
+
+    Identical requests are served from the response cache or coalesced onto
+    the call already in flight.
     """
-    try:
-        transcript = data.get("transcript", "")
-        timeline = data.get("timeline", [])
-
-        if timeline and isinstance(timeline, list):
-            conversation_text = " ".join([seg.get("text", "") for seg in timeline])
-        else:
-            conversation_text = transcript
-
-        # Use injected client if provided, else create one
-        client = genai_client
-        if client is None:
-            import google.genai as genai
-            client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        prompt = f"""
+    model = model or os.getenv("GEMINI_LLM_MODEL")
+    return await cached_llm_call(
+        "summary",
+        model,
+        SUMMARY_PROMPT_VERSION,
+        _conversation_text(data),
+        lambda: _generate_conversation_summary_impl(data, genai_client=genai_client, model=model),
+        cacheable=lambda result: not result.get("error"),
+    )
+
+def _summary_contents(conversation_text: str) -> list:
+    prompt = f"""
 You are a medical conversation summarizer. Read the following conversation and provide a concise, clear summary of the main points, symptoms, diagnosis, and advice given. Use simple language.
 
 CONVERSATION:
@@ -224,17 +472,29 @@ CONVERSATION:
 
 SUMMARY:
 """
+    return [
+        "You are a medical conversation summarizer. Always respond with a clear summary only.",
+        prompt,
+    ]
+
+async def _generate_conversation_summary_impl(data, genai_client=None, model=None):
+    """
+    Generate AI summary of conversation
+    """
+    try:
+        conversation_text = _conversation_text(data)
+
+        # Use injected client if provided, else the shared pooled client
+        client = genai_client or get_default_client()
         if model is None:
             model = os.getenv("GEMINI_LLM_MODEL")
             if not model:
                 logger.error("GEMINI_LLM_MODEL not set in environment; please set it in backend/.env")
                 return {"summary": "", "error": "GEMINI_LLM_MODEL not configured"}
-        response = client.models.generate_content(
+        response = await generate_content(
+            client,
             model=model,
-            contents=[
-                "You are a medical conversation summarizer. Always respond with a clear summary only.",
-                prompt,
-            ],
+            contents=_summary_contents(conversation_text),
         )
         summary = getattr(response, "text", "").strip()
         return {"summary": summary}
@@ -247,10 +507,19 @@ async def generate_soap_note(data, genai_client=None, model=None):
     """Generate SOAP note JSON via LLM and render HTML.
 
     Accepts an optional injected `genai_client` and `model` to make the service
-    testable and configurable via dependency injection.
+    testable and configurable via dependency injection. Identical requests
+    are served from the response cache or coalesced onto the call in flight.
     """
     try:
-        return await _generate_soap_note_impl(data, genai_client=genai_client, model=model)
+        model = model or os.getenv("GEMINI_LLM_MODEL")
+        return await cached_llm_call(
+            "soap",
+            model,
+            _soap_prompt_version(),
+            _conversation_text(data),
+            lambda: _generate_soap_note_impl(data, genai_client=genai_client, model=model),
+            cacheable=lambda result: not result.get("error"),
+        )
     except Exception as e:
         logger.error(f"Error generating SOAP: {e}")
         return {"soap_html": "", "soap_json": {}, "error": str(e)}
@@ -260,23 +529,13 @@ async def _generate_soap_note_impl(data, genai_client=None, model=None):
     Generate SOAP note JSON via LLM and render HTML.
     """
     try:
-        transcript = data.get("transcript", "")
-        timeline = data.get("timeline", [])
-        if timeline and isinstance(timeline, list):
-            conversation_text = " ".join([seg.get("text", "") for seg in timeline])
-        else:
-            conversation_text = transcript
+        conversation_text = _conversation_text(data)
 
         if not conversation_text or not conversation_text.strip():
             return {"soap_html": "", "soap_json": {}, "error": "No conversation text provided"}
 
-        from services.prompts.soap import build_messages
-
-        # Use injected client if provided, else create one
-        client = genai_client
-        if client is None:
-            from google import genai
-            client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+        # Use injected client if provided, else the shared pooled client
+        client = genai_client or get_default_client()
 
         if model is None:
             model = os.getenv("GEMINI_LLM_MODEL")
@@ -284,62 +543,95 @@ async def _generate_soap_note_impl(data, genai_client=None, model=None):
                 logger.error("GEMINI_LLM_MODEL not set in environment; please set it in backend/.env")
                 return {"soap_html": "", "soap_json": {}, "error": "GEMINI_LLM_MODEL not configured"}
 
-        messages = build_messages(conversation_text)
-
-        # build_messages returns a list of dicts with 'role' and 'content'; extract contents
-        contents_list = [m.get("content") if isinstance(m, dict) else str(m) for m in messages]
-        response = client.models.generate_content(
-            model=model,
-            contents=contents_list,
+        # Constant prompt prefix is served from a server-side context cache when available
+        response = await generate_from_template(
+            client,
+            model,
+            _soap_template(),
+            config=_soap_config(),
+            conversation=conversation_text,
         )
         content = getattr(response, "text", "").strip()
 
-        import json as _json
         try:
-            data_json = _json.loads(content)
-        except Exception:
-            # Second attempt: ask for JSON only
-            if isinstance(messages[-1], dict):
-                messages[-1]["content"] = messages[-1].get("content", "") + \
-                                          "\n\nIMPORTANT: Return STRICT JSON only."
-            retry_contents = [m.get("content") if isinstance(m, dict) else str(m) for m in messages]
-            retry_resp = client.models.generate_content(
-                model=model,
-                contents=retry_contents,
-            )
-            content = getattr(retry_resp, "text", "").strip()
-            data_json = _json.loads(content)
-
-        # Normalize fields
-        def norm(x, default=None):
-            return x if (x is not None and str(x).strip() != "") else default
-
-        subj = data_json.get("subjective") or []
-        obj = data_json.get("objective") or {}
-        vit = obj.get("vitals") or {"Temp": None, "BP": None, "HR": None, "RR": None, "SpO2": None}
-        exam = obj.get("exam_findings") or []
-        labs = obj.get("labs_imaging") or []
-        assess = data_json.get("assessment") or []
-        plan = data_json.get("plan") or []
-
-        patient_name = norm(data_json.get("patient_name"), "Not discussed")
-        date = norm(data_json.get("date"), "Not discussed")
-        age_gender = norm(data_json.get("age_gender"), "Not discussed")
-        reason = norm(data_json.get("reason_for_visit"), "Not discussed")
-
-        # Render HTML
-        def bullets(items):
-            if not items:
-                return "<div>Not discussed</div>"
-            return "".join([f"<div>• {str(i)}</div>" for i in items])
-
-        vitals_line = []
-        for k in ["Temp", "BP", "HR", "RR", "SpO2"]:
-            if vit.get(k):
-                vitals_line.append(f"{k}: {vit[k]}")
-        vitals_html = f"<div>{' ; '.join(vitals_line)}</div>" if vitals_line else "<div>Not discussed</div>"
-
-        soap_html = f"""
+            data_json = parse_llm_json("soap", content)
+        except LLMOutputError:
+            # Unrepairable or off-schema: last resort is a second call asking for JSON only
+            data_json = await _request_strict_soap_json(client, model, conversation_text)
+
+        return {"soap_html": render_soap_html(data_json), "soap_json": data_json}
+
+    except Exception as e:
+        logger.error(f"Error generating SOAP: {e}")
+        return {"soap_html": "", "soap_json": {}, "error": str(e)}
+
+def _soap_prompt_version() -> str:
+    return _soap_template().version
+
+def _soap_config(structured=None):
+    """Native structured output (response_schema), or None for the prose-schema prompt."""
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    return structured_config("soap") if structured else None
+
+def _soap_template(structured=None):
+    from services.prompts.soap import PROSE_TEMPLATE, STRUCTURED_TEMPLATE
+
+    if structured is None:
+        structured = STRUCTURED_OUTPUT
+    return STRUCTURED_TEMPLATE if structured else PROSE_TEMPLATE
+
+def _soap_contents(conversation_text: str, structured=None) -> list:
+    """Full (uncached) contents of a SOAP request."""
+    return _soap_template(structured).render(conversation=conversation_text)
+
+async def _request_strict_soap_json(client, model, conversation_text: str) -> dict:
+    from services.prompts.soap import PROSE_TEMPLATE, STRICT_JSON_SUFFIX
+
+    # The strict retry always spells the schema out in the prompt as well.
+    response = await generate_from_template(
+        client,
+        model,
+        PROSE_TEMPLATE,
+        config=_soap_config(),
+        extra=STRICT_JSON_SUFFIX,
+        conversation=conversation_text,
+    )
+    return parse_llm_json("soap", getattr(response, "text", "").strip(), retry=True)
+
+@timed("html_render")
+def render_soap_html(data_json: dict) -> str:
+    """Render a SOAP note JSON object as the HTML fragment shown in the UI."""
+    # Normalize fields
+    def norm(x, default=None):
+        return x if (x is not None and str(x).strip() != "") else default
+
+    subj = data_json.get("subjective") or []
+    obj = data_json.get("objective") or {}
+    vit = obj.get("vitals") or {"Temp": None, "BP": None, "HR": None, "RR": None, "SpO2": None}
+    exam = obj.get("exam_findings") or []
+    labs = obj.get("labs_imaging") or []
+    assess = data_json.get("assessment") or []
+    plan = data_json.get("plan") or []
+
+    patient_name = norm(data_json.get("patient_name"), "Not discussed")
+    date = norm(data_json.get("date"), "Not discussed")
+    age_gender = norm(data_json.get("age_gender"), "Not discussed")
+    reason = norm(data_json.get("reason_for_visit"), "Not discussed")
+
+    # Render HTML
+    def bullets(items):
+        if not items:
+            return "<div>Not discussed</div>"
+        return "".join([f"<div>• {str(i)}</div>" for i in items])
+
+    vitals_line = []
+    for k in ["Temp", "BP", "HR", "RR", "SpO2"]:
+        if vit.get(k):
+            vitals_line.append(f"{k}: {vit[k]}")
+    vitals_html = f"<div>{' ; '.join(vitals_line)}</div>" if vitals_line else "<div>Not discussed</div>"
+
+    soap_html = f"""
         <div><strong>Patient Name:</strong> {patient_name}</div>
         <div><strong>Date:</strong> {date}</div>
         <div><strong>Age/Gender:</strong> {age_gender}</div>
@@ -358,40 +650,72 @@ async def _generate_soap_note_impl(data, genai_client=None, model=None):
         </div>
         """
 
-        return {"soap_html": soap_html, "soap_json": data_json}
+    return soap_html
 
-    except Exception as e:
-        logger.error(f"Error generating SOAP: {e}")
-        return {"soap_html": "", "soap_json": {}, "error": str(e)}
+
+def build_batch_request(task: str, data) -> dict:
+    """Contents/config of one summary or SOAP request for provider batch mode."""
+    conversation_text = _conversation_text(data)
+    if task == "summary":
+        return {"contents": _summary_contents(conversation_text)}
+    request = {"contents": _soap_contents(conversation_text)}
+    if _soap_config() is not None:
+        request["config"] = _soap_config()
+    return request
+
+def parse_batch_response(task: str, text: str) -> dict:
+    """Turn one provider-batch response into the payload the direct call returns."""
+    if task == "summary":
+        return {"summary": (text or "").strip()}
+    try:
+        data_json = parse_llm_json("soap", text)
+    except LLMOutputError as e:
+        return {"soap_html": "", "soap_json": {}, "error": f"Invalid JSON response: {e}"}
+    return {"soap_html": render_soap_html(data_json), "soap_json": data_json}
 
 
 async def generate_ai_edit(transcript: str, genai_client=None, model=None):
-    """Call LLM to edit/clean the transcript for clarity while preserving clinical meaning."""
+    """Call LLM to edit/clean the transcript for clarity while preserving clinical meaning.
+
+    Identical requests are served from the response cache or coalesced onto
+    the call already in flight.
+    """
+    model = model or os.getenv("GEMINI_LLM_MODEL")
+    return await cached_llm_call(
+        "ai_edit",
+        model,
+        AI_EDIT_PROMPT_VERSION,
+        transcript or "",
+        lambda: _generate_ai_edit_impl(transcript, genai_client=genai_client, model=model),
+        cacheable=lambda result: bool(result) and not result.startswith("Error:"),
+    )
+
+def _ai_edit_contents(transcript: str) -> list:
+    prompt_system = (
+        "You are a helpful clinical editor. Improve clarity, grammar, and formatting of the transcript while preserving all clinical facts. "
+        "Return the edited transcript as plain text only (no commentary)."
+    )
+
+    prompt_user = f"TRANSCRIPT:\n{transcript}\n\nProvide the edited transcript only."
+    return [prompt_system, prompt_user]
+
+async def _generate_ai_edit_impl(transcript: str, genai_client=None, model=None):
     try:
         if not transcript or not str(transcript).strip():
             return ""
 
-        # Use injected client if provided, else create one
-        client = genai_client
-        if client is None:
-            import google.genai as genai
-            client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-
-        prompt_system = (
-            "You are a helpful clinical editor. Improve clarity, grammar, and formatting of the transcript while preserving all clinical facts. "
-            "Return the edited transcript as plain text only (no commentary)."
-        )
-
-        prompt_user = f"TRANSCRIPT:\n{transcript}\n\nProvide the edited transcript only."
+        # Use injected client if provided, else the shared pooled client
+        client = genai_client or get_default_client()
 
         if model is None:
             model = os.getenv("GEMINI_LLM_MODEL")
             if not model:
                 logger.error("GEMINI_LLM_MODEL not set in environment; please set it in backend/.env")
                 return ""
-        response = client.models.generate_content(
+        response = await generate_content(
+            client,
             model=model,
-            contents=[prompt_system, prompt_user],
+            contents=_ai_edit_contents(transcript),
         )
 
         edited = getattr(response, "text", "").strip()
@@ -399,3 +723,140 @@ async def generate_ai_edit(transcript: str, genai_client=None, model=None):
     except Exception as e:
         logger.error(f"generate_ai_edit error: {e}")
         return f"Error: {str(e)}"
+
+
+# Streaming variants. Each is an async generator of events for the SSE
+# endpoints: incremental events first, then one "done" event carrying the same
+# payload the non-streaming function returns, or a single "error" event.
+# Completed results go into the same response cache as the non-streaming calls.
+
+async def _stream_text(client, model, contents, label, config=None):
+    """Yield non-empty text deltas from a streamed generation."""
+    started = time.monotonic()
+    first = True
+    async for chunk in stream_content(client, model=model, contents=contents, config=config):
+        text = getattr(chunk, "text", None)
+        if not text:
+            continue
+        if first:
+            logger.info(f" [STREAM] {label} first token after {time.monotonic() - started:.2f}s")
+            first = False
+        yield text
+
+async def stream_conversation_summary(data, genai_client=None, model=None):
+    """Stream the summary as {"type": "delta", "text"} events, then {"type": "done", "summary"}."""
+    model = model or os.getenv("GEMINI_LLM_MODEL")
+    if not model:
+        logger.error("GEMINI_LLM_MODEL not set in environment; please set it in backend/.env")
+        yield {"type": "error", "error": "GEMINI_LLM_MODEL not configured"}
+        return
+    conversation_text = _conversation_text(data)
+    cached = lookup_llm_response("summary", model, SUMMARY_PROMPT_VERSION, conversation_text)
+    if cached is not None:
+        yield {"type": "delta", "text": cached["summary"]}
+        yield {"type": "done", **cached}
+        return
+
+    client = genai_client or get_default_client()
+    parts = []
+    try:
+        async for text in _stream_text(client, model, _summary_contents(conversation_text), "summary"):
+            parts.append(text)
+            yield {"type": "delta", "text": text}
+    except Exception as e:
+        logger.error(f"Error streaming summary: {e}")
+        yield {"type": "error", "error": str(e)}
+        return
+    result = {"summary": "".join(parts).strip()}
+    store_llm_response("summary", model, SUMMARY_PROMPT_VERSION, conversation_text, result)
+    yield {"type": "done", **result}
+
+async def stream_ai_edit(transcript: str, genai_client=None, model=None):
+    """Stream the edited transcript as {"type": "delta", "text"} events, then {"type": "done", "edited"}."""
+    model = model or os.getenv("GEMINI_LLM_MODEL")
+    if not model:
+        logger.error("GEMINI_LLM_MODEL not set in environment; please set it in backend/.env")
+        yield {"type": "error", "error": "GEMINI_LLM_MODEL not configured"}
+        return
+    if not transcript or not str(transcript).strip():
+        yield {"type": "done", "edited": ""}
+        return
+    cached = lookup_llm_response("ai_edit", model, AI_EDIT_PROMPT_VERSION, transcript)
+    if cached is not None:
+        yield {"type": "delta", "text": cached}
+        yield {"type": "done", "edited": cached}
+        return
+
+    client = genai_client or get_default_client()
+    parts = []
+    try:
+        async for text in _stream_text(client, model, _ai_edit_contents(transcript), "ai_edit"):
+            parts.append(text)
+            yield {"type": "delta", "text": text}
+    except Exception as e:
+        logger.error(f"Error streaming AI edit: {e}")
+        yield {"type": "error", "error": str(e)}
+        return
+    edited = "".join(parts).strip()
+    if edited:
+        store_llm_response("ai_edit", model, AI_EDIT_PROMPT_VERSION, transcript, edited)
+    yield {"type": "done", "edited": edited}
+
+async def stream_soap_note(data, genai_client=None, model=None):
+    """Stream a SOAP note section by section.
+
+    Emits {"type": "section", "name", "value"} as soon as each top-level JSON
+    field (subjective, objective, assessment, plan, ...) is complete, then
+    {"type": "done", "soap_html", "soap_json"}. If the streamed text had to be
+    repaired, or could not be and the strict-JSON retry of `generate_soap_note`
+    was used, every section not yet sent is emitted before "done".
+    """
+    prompt_version = _soap_prompt_version()
+    model = model or os.getenv("GEMINI_LLM_MODEL")
+    if not model:
+        logger.error("GEMINI_LLM_MODEL not set in environment; please set it in backend/.env")
+        yield {"type": "error", "error": "GEMINI_LLM_MODEL not configured"}
+        return
+    conversation_text = _conversation_text(data)
+    if not conversation_text or not conversation_text.strip():
+        yield {"type": "error", "error": "No conversation text provided"}
+        return
+    cached = lookup_llm_response("soap", model, prompt_version, conversation_text)
+    if cached is not None:
+        for name, value in cached["soap_json"].items():
+            yield {"type": "section", "name": name, "value": value}
+        yield {"type": "done", **cached}
+        return
+
+    client = genai_client or get_default_client()
+    parser = JsonFieldStream()
+    emitted = set()
+    cache_name = None
+    try:
+        contents, config, cache_name = await prepare_request(
+            client, model, _soap_template(), config=_soap_config(), conversation=conversation_text
+        )
+        async for text in _stream_text(client, model, contents, "soap", config):
+            for name, value in parser.feed(text):
+                emitted.add(name)
+                yield {"type": "section", "name": name, "value": value}
+        try:
+            data_json = parse_llm_json("soap", parser.text)
+        except LLMOutputError:
+            logger.warning(" [STREAM] SOAP stream was not usable JSON; retrying with strict JSON prompt")
+            data_json = await _request_strict_soap_json(client, model, conversation_text)
+        # Fields the incremental parser could not read (or that the repair or
+        # retry produced) still reach the client before "done".
+        for name, value in data_json.items():
+            if name not in emitted:
+                yield {"type": "section", "name": name, "value": value}
+        result = {"soap_html": render_soap_html(data_json), "soap_json": data_json}
+    except Exception as e:
+        logger.error(f"Error streaming SOAP: {e}")
+        if cache_name is not None:
+            # The context cache may have expired server-side; recreate it next time
+            get_context_caches().invalidate(model, _soap_template())
+        yield {"type": "error", "error": str(e)}
+        return
+    store_llm_response("soap", model, prompt_version, conversation_text, result)
+    yield {"type": "done", **result}
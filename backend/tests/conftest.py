@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Run from backend/ like the app itself: services and api are top-level packages.
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Keep test runs out of the checked-in log file.
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(prefix="ezigame-tests-"), "backend.log"))
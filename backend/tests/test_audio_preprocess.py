@@ -0,0 +1,73 @@
+import wave
+
+import numpy as np
+import pytest
+
+from services.audio_preprocess import StreamResampler, normalize_for_stt
+
+
+def tone(freq, rate, seconds, amplitude=0.5):
+    return (amplitude * np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate)).astype(np.float32)
+
+
+def resample_in_blocks(signal, source_rate, target_rate, sizes):
+    resampler = StreamResampler(source_rate, target_rate)
+    out, start, i = [], 0, 0
+    while start < len(signal):
+        size = sizes[i % len(sizes)]
+        out.append(resampler.process(signal[start:start + size]))
+        start += size
+        i += 1
+    out.append(resampler.process(np.zeros(0, dtype=np.float32), final=True))
+    return np.concatenate(out)
+
+
+@pytest.mark.parametrize("source_rate", [48000, 44100, 8000])
+def test_block_wise_output_matches_whole_signal(source_rate):
+    signal = np.random.default_rng(1).normal(0, 0.3, source_rate * 2).astype(np.float32)
+    whole = StreamResampler(source_rate, 16000).process(signal, final=True)
+    blocks = resample_in_blocks(signal, source_rate, 16000, [1, 37, 4800, 5, 1023])
+    assert len(whole) == -(-len(signal) * 16000 // source_rate)
+    np.testing.assert_allclose(blocks, whole, atol=1e-6)
+
+
+def test_passband_tone_is_preserved_and_aligned():
+    out = StreamResampler(48000, 16000).process(tone(1000, 48000, 1.0), final=True)
+    expected = tone(1000, 16000, 1.0)
+    # Away from the edges, where the filter sees zeros outside the signal.
+    middle = slice(200, -200)
+    assert np.max(np.abs(out[middle] - expected[middle])) < 0.01
+
+
+def test_tone_above_the_new_nyquist_is_filtered_out():
+    # 12 kHz would alias to 4 kHz at 16 kHz without the anti-aliasing filter.
+    out = StreamResampler(48000, 16000).process(tone(12000, 48000, 1.0), final=True)
+    assert np.sqrt(np.mean(out[200:-200] ** 2)) < 0.005
+
+
+def test_same_rate_passes_through():
+    signal = tone(440, 16000, 0.1)
+    assert StreamResampler(16000, 16000).process(signal) is signal
+
+
+def test_normalize_resamples_and_trims_silence(tmp_path):
+    rate = 44100
+    silence = np.zeros(rate, dtype=np.float32)
+    signal = np.concatenate([silence, tone(440, rate, 2.0), silence])
+    path = str(tmp_path / "visit.wav")
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((signal * 32767).astype("<i2").tobytes())
+
+    normalized = normalize_for_stt(path, sample_rate=16000, trim_silence=True)
+    with wave.open(normalized.path, "rb") as w:
+        assert w.getframerate() == 16000
+        assert w.getnchannels() == 1
+        frames = w.getnframes()
+    assert normalized.original_sample_rate == rate
+    assert normalized.duration_s == pytest.approx(2.5, abs=0.05)
+    assert normalized.trimmed_leading_s == pytest.approx(0.75, abs=0.05)
+    assert frames == pytest.approx(2.5 * 16000, abs=0.05 * 16000)
+    assert normalized.saved_bytes > 0
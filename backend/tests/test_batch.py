@@ -0,0 +1,128 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import dependencies
+from api.summary import router as summary_router
+from benchmarks.fake_genai import FakeGenAIClient, FakeGenAIConfig
+from services.batch import ConcurrentBatchBackend, GeminiBatchBackend
+
+
+class StubBatchBackend:
+    """Answers in reverse order, like a backend whose items finish out of order."""
+
+    name = "stub"
+
+    def __init__(self):
+        self.calls = []
+
+    async def run(self, task, items, genai_client=None, model=None):
+        self.calls.append((task, len(items), model))
+        for index in reversed(range(len(items))):
+            if index == 1:
+                yield index, {"summary": "", "error": "boom"}
+            else:
+                yield index, {"summary": f"summary {index}"}
+
+
+@pytest.fixture
+def client():
+    backend = StubBatchBackend()
+    app = FastAPI()
+    app.include_router(summary_router, prefix="/api/v1/summary")
+    app.dependency_overrides[dependencies.get_batch_backend] = lambda: backend
+    app.dependency_overrides[dependencies.get_genai_client] = lambda: None
+    app.dependency_overrides[dependencies.get_settings] = lambda: {"GEMINI_LLM_MODEL": "test-model"}
+    with TestClient(app) as test_client:
+        yield test_client, backend
+
+
+def visit(i):
+    return {"doctor_conversation": f"doctor {i}", "patient_conversation": f"patient {i}", "full_transcript": f"visit {i}"}
+
+
+def test_batch_endpoint_streams_ndjson_in_completion_order(client):
+    test_client, backend = client
+    response = test_client.post(
+        "/api/v1/summary/generate_batch", json={"task": "summary", "items": [visit(i) for i in range(3)]}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["index"] for line in lines[:-1]] == [2, 1, 0]
+    assert lines[0]["result"] == {"summary": "summary 2"}
+    assert lines[-1]["done"] is True
+    assert lines[-1]["count"] == 3
+    assert lines[-1]["failed"] == 1
+    assert backend.calls == [("summary", 3, "test-model")]
+
+
+def test_batch_endpoint_rejects_empty_batches(client):
+    test_client, backend = client
+    response = test_client.post("/api/v1/summary/generate_batch", json={"task": "soap", "items": []})
+    assert response.status_code == 400
+    assert backend.calls == []
+
+
+def test_concurrent_backend_with_fake_client(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("PROMPT_CONTEXT_CACHE", "0")
+    fake = FakeGenAIClient(FakeGenAIConfig(latency_s=0.01, jitter_s=0, seed=7))
+    items = [{"transcript": f"Doctor: how are you? Patient: cough for {i} days."} for i in range(4)]
+
+    async def collect():
+        backend = ConcurrentBatchBackend(concurrency=2, rate_per_s=1000)
+        return [pair async for pair in backend.run("soap", items, genai_client=fake, model="fake-model")]
+
+    results = asyncio.run(collect())
+    assert sorted(index for index, _ in results) == [0, 1, 2, 3]
+    for _, result in results:
+        assert "error" not in result
+        assert set(result["soap_json"]) >= {"subjective", "objective", "assessment", "plan"}
+        assert result["soap_html"]
+    assert fake.stats.calls == 4
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} upstream error")
+        self.code = code
+
+
+class FailingBatchAPI:
+    def __init__(self, fail_on):
+        self.fail_on = fail_on
+        self.polls = 0
+
+    async def create_batch(self, client, model, requests, config=None):
+        if self.fail_on == "create":
+            raise UpstreamError(429)
+        return SimpleNamespace(name="batches/1", state=SimpleNamespace(value="JOB_STATE_RUNNING"))
+
+    async def get_batch(self, client, name):
+        self.polls += 1
+        raise UpstreamError(503)
+
+
+@pytest.mark.parametrize("fail_on", ["create", "poll"])
+def test_gemini_backend_reports_provider_errors_per_item(monkeypatch, fail_on):
+    from services import genai_async
+
+    api = FailingBatchAPI(fail_on)
+    monkeypatch.setattr(genai_async, "create_batch", api.create_batch)
+    monkeypatch.setattr(genai_async, "get_batch", api.get_batch)
+
+    async def collect():
+        backend = GeminiBatchBackend(poll_interval_s=0, timeout_s=60)
+        items = [{"transcript": f"visit {i}"} for i in range(3)]
+        return [pair async for pair in backend.run("soap", items, genai_client=object(), model="m")]
+
+    results = asyncio.run(collect())
+    assert sorted(index for index, _ in results) == [0, 1, 2]
+    expected = "429 upstream error" if fail_on == "create" else "503 upstream error"
+    assert all(result["error"] == expected and result["soap_json"] == {} for _, result in results)
+    assert api.polls == (1 if fail_on == "poll" else 0)
@@ -0,0 +1,192 @@
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import dependencies
+from api.conversation import router as conversation_router
+from services import job_queue, voice_to_text_service
+from services.job_queue import JobQueue, JobStore, QueueFull
+
+
+def new_job(job_id, created_at):
+    return {
+        "id": job_id,
+        "status": "queued",
+        "stage": "queued",
+        "audio_path": f"{job_id}.wav",
+        "audio_sha256": None,
+        "filename": None,
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+def test_claim_takes_oldest_job_once_across_stores(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = JobStore(path), JobStore(path)
+    first.insert(new_job("b", 2.0))
+    first.insert(new_job("a", 1.0))
+    claimed = [first.claim_next("transcribing"), second.claim_next("transcribing")]
+    assert [job["id"] for job in claimed] == ["a", "b"]
+    assert all(job["status"] == "running" and job["stage"] == "transcribing" for job in claimed)
+    assert first.claim_next("transcribing") is None
+    assert second.counts() == {"queued": 0, "running": 2}
+
+
+def test_requeue_only_resets_stale_running_jobs(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    for job_id in ("old", "live"):
+        store.insert(new_job(job_id, time.time()))
+        store.claim_next("transcribing")
+    # update() stamps updated_at itself; backdate "old" directly.
+    store._conn.execute("UPDATE jobs SET updated_at = 0 WHERE id = 'old'")
+    store._conn.commit()
+    assert store.requeue_interrupted(stale_before=time.time() - 60) == 1
+    assert store.get("old")["status"] == "queued"
+    assert store.get("live")["status"] == "running"
+    # Single-process mode: every running job was interrupted.
+    assert store.requeue_interrupted() == 1
+    assert store.counts() == {"queued": 2, "running": 0}
+
+
+class StubRecordings:
+    def __init__(self):
+        self.statuses = []
+
+    async def set_transcript_status(self, sha256, status):
+        self.statuses.append(status)
+
+
+@pytest.fixture
+def run_queue(tmp_path, monkeypatch):
+    recordings = StubRecordings()
+    monkeypatch.setattr(job_queue, "get_recordings_index", lambda: recordings)
+    monkeypatch.setattr(job_queue, "get_shared_state", lambda: None)
+
+    def run(scenario, **options):
+        async def main():
+            queue = JobQueue(
+                db_path=str(tmp_path / "jobs.sqlite3"), audio_dir=str(tmp_path / "audio"), **options
+            )
+            await queue.start()
+            try:
+                return await scenario(queue)
+            finally:
+                await queue.stop()
+
+        return asyncio.run(main())
+
+    return run
+
+
+async def submit_audio(queue):
+    path = queue.new_audio_path("visit.wav")
+    with open(path, "wb") as f:
+        f.write(b"RIFF")
+    return path, await queue.submit(path, filename="visit.wav")
+
+
+async def wait_terminal(queue, job_id):
+    for _ in range(200):
+        job = await queue.get(job_id)
+        if job["status"] in job_queue.TERMINAL_STATUSES:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def test_job_runs_to_done_and_removes_audio(run_queue, monkeypatch):
+    async def analyze(path, audio_sha256=None, on_progress=None):
+        await on_progress("transcribing")
+        return {"transcript": "hello"}
+
+    monkeypatch.setattr(voice_to_text_service, "process_conversation_audio", analyze)
+
+    async def scenario(queue):
+        path, job = await submit_audio(queue)
+        return path, await wait_terminal(queue, job["id"])
+
+    path, job = run_queue(scenario, workers=1)
+    assert job["status"] == "done"
+    assert job["result"] == {"transcript": "hello", "success": True}
+    assert not os.path.exists(path)
+
+
+def test_crashed_job_fails_and_removes_audio(run_queue, monkeypatch):
+    async def analyze(path, audio_sha256=None, on_progress=None):
+        raise RuntimeError("decoder exploded")
+
+    monkeypatch.setattr(voice_to_text_service, "process_conversation_audio", analyze)
+
+    async def scenario(queue):
+        path, job = await submit_audio(queue)
+        return path, await wait_terminal(queue, job["id"])
+
+    path, job = run_queue(scenario, workers=1)
+    assert job["status"] == "failed"
+    assert job["error"] == "decoder exploded"
+    assert not os.path.exists(path)
+
+
+def test_submit_refuses_past_max_depth(run_queue):
+    async def scenario(queue):
+        await submit_audio(queue)
+        with pytest.raises(QueueFull):
+            await submit_audio(queue)
+        return queue.stats()
+
+    stats = run_queue(scenario, workers=0, max_depth=1)
+    assert stats["queued"] == 1
+
+
+def test_stop_drains_running_job(run_queue, monkeypatch):
+    started = asyncio.Event()
+
+    async def analyze(path, audio_sha256=None, on_progress=None):
+        started.set()
+        await asyncio.sleep(0.1)
+        return {"transcript": "late"}
+
+    monkeypatch.setattr(voice_to_text_service, "process_conversation_audio", analyze)
+
+    async def scenario(queue):
+        _, job = await submit_audio(queue)
+        await started.wait()
+        await queue.stop()
+        # stop() closed the store; reopen it to read the outcome.
+        return JobStore(queue.db_path).get(job["id"])
+
+    job = run_queue(scenario, workers=1, drain_timeout_s=5)
+    assert job["status"] == "done"
+
+
+class FailingSubmitQueue:
+    def __init__(self, audio_dir):
+        self.audio_dir = audio_dir
+        self.paths = []
+
+    def new_audio_path(self, filename):
+        path = os.path.join(self.audio_dir, "upload.wav")
+        self.paths.append(path)
+        return path
+
+    async def submit(self, audio_path, audio_sha256=None, filename=None):
+        raise RuntimeError("database is locked")
+
+
+def test_failed_submit_removes_saved_upload(tmp_path):
+    queue = FailingSubmitQueue(str(tmp_path))
+    app = FastAPI()
+    app.include_router(conversation_router, prefix="/api/v1/conversation")
+    app.dependency_overrides[dependencies.get_job_queue] = lambda: queue
+    with TestClient(app) as client:
+        response = client.post(
+            "/api/v1/conversation/analyze-conversation/jobs/", files={"audio": ("visit.wav", b"RIFF" * 10, "audio/wav")}
+        )
+    assert response.status_code == 500
+    assert response.json() == {"success": False, "error": "database is locked"}
+    assert queue.paths and not os.path.exists(queue.paths[0])
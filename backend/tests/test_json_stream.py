@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from services.json_stream import JsonFieldStream, loads_lenient, repair_json
+from services.llm_schemas import LLMOutputError, parse_llm_json
+
+
+def feed_in_chunks(text, size):
+    parser = JsonFieldStream()
+    fields = []
+    for i in range(0, len(text), size):
+        fields.extend(parser.feed(text[i:i + size]))
+    return parser, fields
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_fields_complete_independently_of_chunking(size):
+    text = '```json\n{"subjective": ["a, b"], "objective": {"vitals": {"BP": "120/80"}}, "plan": "rest"}\n```'
+    parser, fields = feed_in_chunks(text, size)
+    assert fields == [
+        ("subjective", ["a, b"]),
+        ("objective", {"vitals": {"BP": "120/80"}}),
+        ("plan", "rest"),
+    ]
+    assert parser.done
+
+
+def test_field_is_reported_as_soon_as_it_closes():
+    parser = JsonFieldStream()
+    assert parser.feed('Here you go: {"subjective": "cough", "pl') == [("subjective", "cough")]
+    assert parser.feed('an": "rest"}') == [("plan", "rest")]
+
+
+def test_escaped_quotes_and_braces_inside_strings():
+    _, fields = feed_in_chunks('{"a": "say \\"}\\" now", "b": 1}', 2)
+    assert fields == [("a", 'say "}" now'), ("b", 1)]
+
+
+def test_trailing_commas_do_not_drop_fields():
+    _, fields = feed_in_chunks('{"subjective": ["a"], "plan": ["c",], "objective": {"labs": [],},}', 4)
+    assert fields == [("subjective", ["a"]), ("plan", ["c"]), ("objective", {"labs": []})]
+
+
+def test_repair_strips_fences_prose_and_trailing_commas():
+    text = 'Sure!\n```json\n{"plan": ["a", "b",], "x": {"y": 1,},}\n```\nAnything else?'
+    assert json.loads(repair_json(text)) == {"plan": ["a", "b"], "x": {"y": 1}}
+
+
+def test_repair_closes_truncated_output():
+    assert json.loads(repair_json('{"subjective": ["cough"], "plan": ["rest", "flu')) == {
+        "subjective": ["cough"],
+        "plan": ["rest", "flu"],
+    }
+    assert json.loads(repair_json('{"a": 1, "b":')) == {"a": 1, "b": None}
+
+
+def test_repair_backs_off_to_last_complete_element():
+    assert json.loads(repair_json('{"a": [1, 2], "b": tru')) == {"a": [1, 2]}
+
+
+def test_loads_lenient_reports_repairs():
+    assert loads_lenient('{"a": 1}') == ({"a": 1}, False)
+    assert loads_lenient('{"a": 1,}') == ({"a": 1}, True)
+    with pytest.raises(ValueError):
+        loads_lenient("no json here")
+
+
+def test_parse_llm_json_validates_and_fills_defaults():
+    note = parse_llm_json("soap", '```json\n{"subjective": ["cough"], "plan": ["rest",]}\n```')
+    assert note["subjective"] == ["cough"]
+    assert note["plan"] == ["rest"]
+    assert note["assessment"] == []
+    assert note["objective"]["vitals"]["BP"] is None
+
+
+def test_parse_llm_json_rejects_non_objects():
+    with pytest.raises(LLMOutputError):
+        parse_llm_json("soap", '["not", "an", "object"]')
@@ -0,0 +1,112 @@
+import asyncio
+
+from services.llm_cache import ResponseCache, make_key
+
+
+def test_key_ignores_whitespace_but_not_content():
+    assert make_key("soap", "m", "v1", "Patient:  cough\n") == make_key("soap", "m", "v1", "Patient: cough")
+    assert make_key("soap", "m", "v1", "cough") != make_key("soap", "m", "v2", "cough")
+    assert make_key("soap", "m", "v1", "cough") != make_key("summary", "m", "v1", "cough")
+
+
+def test_identical_concurrent_calls_share_one_upstream_call():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return {"summary": "s"}
+
+    async def scenario():
+        cache = ResponseCache()
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"summary": "s"}] * 5
+    # Every caller owns its copy.
+    results[0]["summary"] = "edited"
+    assert results[1]["summary"] == "s"
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["coalesced"] == 4
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_entries_expire_after_ttl():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        cache = ResponseCache(ttl_s=0.05)
+        first = await cache.get_or_compute("k", compute)
+        cached = await cache.get_or_compute("k", compute)
+        await asyncio.sleep(0.06)
+        fresh = await cache.get_or_compute("k", compute)
+        return cache, (first, cached, fresh)
+
+    cache, values = asyncio.run(scenario())
+    assert values == (1, 1, 2)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_uncacheable_results_are_shared_but_not_stored():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"error": "quota"}
+
+    async def scenario():
+        cache = ResponseCache()
+        not_error = lambda value: not value.get("error")  # noqa: E731
+        await asyncio.gather(*(cache.get_or_compute("k", compute, not_error) for _ in range(3)))
+        await cache.get_or_compute("k", compute, not_error)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+
+
+def test_failures_propagate_to_every_waiter_and_are_not_cached():
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    async def scenario():
+        cache = ResponseCache()
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(3)), return_exceptions=True)
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert cache.stats()["entries"] == 0
+
+
+def test_cancelled_waiter_does_not_cancel_the_shared_call():
+    async def compute():
+        await asyncio.sleep(0.03)
+        return "done"
+
+    async def scenario():
+        cache = ResponseCache()
+        impatient = asyncio.create_task(cache.get_or_compute("k", compute))
+        patient = asyncio.create_task(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0.01)
+        impatient.cancel()
+        return await patient
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_lru_capacity():
+    cache = ResponseCache(max_entries=2)
+    for key in ("a", "b", "c"):
+        cache.put(key, key)
+    assert cache.peek("a") is None
+    assert cache.peek("c") == "c"
+    assert cache.stats()["evictions"] == 1
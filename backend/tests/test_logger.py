@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import queue
+import time
+
+from services.logger import NonBlockingQueueHandler
+
+
+def record(level, msg="x"):
+    return logging.LogRecord("test", level, __file__, 1, msg, None, None)
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1), full_wait_s=0.01)
+    handler.emit(record(logging.INFO, "kept"))
+    started = time.perf_counter()
+    for _ in range(20):
+        handler.emit(record(logging.INFO))
+        handler.emit(record(logging.ERROR))
+    # 20 errors waited at most 10 ms each; nothing waited for the writer indefinitely.
+    assert time.perf_counter() - started < 1.0
+    assert handler.dropped == {"INFO": 20, "ERROR": 20}
+    assert handler.stats() == {"queued": 1, "capacity": 1, "dropped": {"INFO": 20, "ERROR": 20}}
+    assert handler.queue.get_nowait().msg == "kept"
+
+
+def test_warning_gets_in_once_the_writer_makes_room():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1), full_wait_s=0)
+    handler.emit(record(logging.WARNING, "first"))
+    handler.queue.get_nowait()
+    handler.emit(record(logging.WARNING, "second"))
+    assert handler.dropped == {}
+    assert handler.queue.get_nowait().msg == "second"
+
+
+def test_queue_depth_and_drops_are_exported(monkeypatch):
+    from api.metrics import prometheus_metrics
+    from services.logger import queue_handler
+
+    monkeypatch.setattr(queue_handler, "dropped", {"ERROR": 3})
+    text = asyncio.run(prometheus_metrics()).body.decode()
+    assert "ezigame_log_queue_records " in text
+    assert 'ezigame_log_records_dropped_total{level="ERROR"} 3' in text
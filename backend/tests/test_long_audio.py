@@ -0,0 +1,77 @@
+import asyncio
+import wave
+
+import numpy as np
+
+from services import long_audio
+from services.long_audio import plan_segments, stitch_segments, strip_overlap
+
+SR = 1000
+FRAME = 50
+
+
+def energies_with_quiet_frames(total_s, quiet_at_s):
+    energies = np.ones(int(total_s * SR) // FRAME)
+    for t in quiet_at_s:
+        energies[int(t * SR) // FRAME] = 0.0
+    return energies
+
+
+def test_segments_tile_the_recording_and_cut_at_silence():
+    energies = energies_with_quiet_frames(200, [63, 118])
+    plan = plan_segments(energies, FRAME, 200 * SR, SR, segment_s=60, overlap_s=1.5, search_s=10)
+    assert [seg["index"] for seg in plan] == [0, 1, 2, 3]
+    assert plan[0]["start"] == 0 and plan[-1]["end"] == 200 * SR
+    for previous, current in zip(plan, plan[1:]):
+        assert current["start"] == previous["end"]
+        assert current["read_start"] == current["start"] - int(1.5 * SR)
+    assert plan[0]["read_start"] == 0
+    # Cuts land in the middle of the quiet frames.
+    assert plan[1]["start"] == 63 * SR + FRAME // 2
+    assert plan[2]["start"] == 118 * SR + FRAME // 2
+
+
+def test_short_recording_is_one_segment():
+    plan = plan_segments(np.ones(40), FRAME, 2 * SR, SR, segment_s=60)
+    assert plan == [{"index": 0, "start": 0, "end": 2 * SR, "read_start": 0}]
+
+
+def test_strip_overlap_drops_repeated_words_case_and_punctuation_insensitively():
+    previous = "the patient reports a mild headache since yesterday"
+    assert strip_overlap(previous, "Since yesterday, and some nausea.") == "and some nausea."
+    assert strip_overlap(previous, "no repetition here") == "no repetition here"
+
+
+def test_stitch_orders_segments_and_skips_empty_ones():
+    segments = [
+        {"index": 2, "text": "follow up next week"},
+        {"index": 0, "text": "hello doctor I have a cough"},
+        {"index": 1, "text": "a cough for three days"},
+        {"index": 3, "text": ""},
+    ]
+    text, stitched = stitch_segments(segments)
+    assert text == "hello doctor I have a cough\nfor three days\nfollow up next week"
+    assert [seg["index"] for seg in stitched] == [0, 1, 2, 3]
+
+
+def test_segment_start_is_the_overlap_read_point(tmp_path, monkeypatch):
+    path = str(tmp_path / "long.wav")
+    rate = 8000
+    with wave.open(path, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes((np.random.default_rng(0).normal(0, 3000, rate * 150)).astype(np.int16).tobytes())
+
+    async def transcribe(client, model, wav_bytes):
+        return "words"
+
+    monkeypatch.setenv("GEMINI_STT_MODEL", "stt-model")
+    monkeypatch.setattr(long_audio, "transcribe_wav_bytes", transcribe)
+    result = asyncio.run(long_audio.transcribe_long_audio(path, genai_client=object(), segment_s=60))
+    segments = result["segments"]
+    assert len(segments) == 3
+    assert segments[0]["start"] == 0
+    for previous, current in zip(segments, segments[1:]):
+        # Timestamps inside a segment are relative to where its audio was read.
+        assert current["start"] == round(previous["end"] - long_audio.LONG_AUDIO_OVERLAP_S, 2)
@@ -0,0 +1,86 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services import metrics
+from services.metrics import Counter, Gauge, Histogram, MetricsMiddleware, Registry
+
+
+def samples(text):
+    """{series: value} for every non-comment line of an exposition."""
+    result = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            result[series] = value
+    return result
+
+
+def test_counter_and_gauge_exposition():
+    registry = Registry()
+    requests = registry.register(Counter("things_total", "Things done", ("kind",)))
+    depth = registry.register(Gauge("queue_depth", "Items waiting"))
+    requests.inc(kind="a")
+    requests.inc(2.5, kind='say "hi"\\\n')
+    depth.inc(3)
+    depth.dec()
+    text = registry.render()
+    assert text.startswith("# HELP ezigame_things_total Things done\n# TYPE ezigame_things_total counter\n")
+    assert "# TYPE ezigame_queue_depth gauge" in text
+    assert samples(text) == {
+        'ezigame_things_total{kind="a"}': "1",
+        'ezigame_things_total{kind="say \\"hi\\"\\\\\\n"}': "2.5",
+        "ezigame_queue_depth": "2",
+    }
+    assert text.endswith("\n")
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = Registry()
+    latency = registry.register(Histogram("op_seconds", "Op latency", ("op",), buckets=(0.1, 1, 5)))
+    for value in (0.05, 0.1, 0.5, 3, 60):
+        latency.observe(value, op="x")
+    assert samples(registry.render()) == {
+        'ezigame_op_seconds_bucket{op="x",le="0.1"}': "2",
+        'ezigame_op_seconds_bucket{op="x",le="1"}': "3",
+        'ezigame_op_seconds_bucket{op="x",le="5"}': "4",
+        'ezigame_op_seconds_bucket{op="x",le="+Inf"}': "5",
+        'ezigame_op_seconds_sum{op="x"}': "63.65",
+        'ezigame_op_seconds_count{op="x"}': "5",
+    }
+
+
+def test_collectors_share_one_header_and_a_broken_one_is_skipped():
+    registry = Registry()
+
+    def cache_stats():
+        yield "cache_hits_total", "counter", "Cache hits", {"cache": "llm"}, 4
+        yield "cache_hits_total", "counter", "Cache hits", {"cache": "transcript"}, 1
+
+    def broken():
+        raise RuntimeError("not started")
+
+    registry.add_collector(broken)
+    registry.add_collector(cache_stats)
+    text = registry.render()
+    assert text.count("# TYPE ezigame_cache_hits_total counter") == 1
+    assert samples(text) == {
+        'ezigame_cache_hits_total{cache="llm"}': "4",
+        'ezigame_cache_hits_total{cache="transcript"}': "1",
+    }
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    with TestClient(app) as client:
+        for item_id in (1, 2, 3):
+            client.get(f"/items/{item_id}")
+    series = samples("\n".join(metrics.HTTP_LATENCY.render()))
+    assert series['ezigame_http_request_seconds_count{method="GET",route="/items/{item_id}",status="200"}'] == "3"
+    assert not any('route="/items/1"' in key for key in series)
+    assert samples("\n".join(metrics.HTTP_IN_FLIGHT.render()))["ezigame_http_requests_in_flight"] == "0"
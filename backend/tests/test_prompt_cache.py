@@ -0,0 +1,148 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.fake_genai import FakeAPIError
+from services.prompts import registry
+from services.prompts.registry import ContextCacheManager, PromptTemplate, close_context_caches
+
+TEMPLATE = PromptTemplate(
+    name="test", version="v1", system="You are a scribe.", prefix="Rules...\n", suffix="Conversation:\n{conversation}"
+)
+
+
+class FakeCacheAPI:
+    def __init__(self, create_errors=(), update_error=None, update_delay=0.0):
+        self.create_errors = list(create_errors)
+        self.update_error = update_error
+        self.update_delay = update_delay
+        self.created = []
+        self.updated = []
+
+    async def create_cache(self, client, model, config):
+        await asyncio.sleep(0.01)
+        if self.create_errors:
+            raise self.create_errors.pop(0)
+        self.created.append((model, config))
+        return SimpleNamespace(name=f"cachedContents/{len(self.created)}")
+
+    async def update_cache(self, client, name, config):
+        await asyncio.sleep(self.update_delay)
+        if self.update_error is not None:
+            raise self.update_error
+        self.updated.append((name, config))
+
+
+@pytest.fixture
+def api(monkeypatch):
+    def install(**kwargs):
+        fake = FakeCacheAPI(**kwargs)
+        monkeypatch.setattr(registry, "create_cache", fake.create_cache)
+        monkeypatch.setattr(registry, "update_cache", fake.update_cache)
+        return fake
+
+    return install
+
+
+def test_concurrent_requests_create_one_cache(api):
+    fake = api()
+
+    async def scenario():
+        caches = ContextCacheManager()
+        names = await asyncio.gather(*(caches.get(object(), "m", TEMPLATE) for _ in range(5)))
+        return caches, names
+
+    caches, names = asyncio.run(scenario())
+    assert names == ["cachedContents/1"] * 5
+    assert len(fake.created) == 1
+    model, config = fake.created[0]
+    assert model == "m"
+    assert config["system_instruction"] == TEMPLATE.system
+    assert config["contents"] == [TEMPLATE.prefix]
+    assert config["display_name"] == "test:v1"
+    assert caches.stats()["created"] == 1
+    assert caches.stats()["hits"] == 4
+
+
+def test_transient_failure_is_not_remembered(api):
+    fake = api(create_errors=[FakeAPIError(503)])
+
+    async def scenario():
+        caches = ContextCacheManager()
+        return caches, await caches.get(object(), "m", TEMPLATE), await caches.get(object(), "m", TEMPLATE)
+
+    caches, first, second = asyncio.run(scenario())
+    assert first is None
+    assert second == "cachedContents/1"
+    assert caches._refused_until == {}
+    assert caches.stats()["failures"] == 1
+    assert len(fake.created) == 1
+
+
+def test_refused_caching_backs_off_until_retry_time(api):
+    fake = api(create_errors=[FakeAPIError(400, "cached content is too small")])
+
+    async def scenario():
+        caches = ContextCacheManager(retry_s=0.05)
+        first = await caches.get(object(), "m", TEMPLATE)
+        during_backoff = await caches.get(object(), "m", TEMPLATE)
+        await asyncio.sleep(0.06)
+        after_backoff = await caches.get(object(), "m", TEMPLATE)
+        return first, during_backoff, after_backoff
+
+    assert asyncio.run(scenario()) == (None, None, "cachedContents/1")
+    assert len(fake.created) == 1
+
+
+def test_cache_is_extended_before_it_expires(api):
+    fake = api()
+
+    async def scenario():
+        caches = ContextCacheManager(ttl_s=0.2, refresh_s=0.15)
+        await caches.get(object(), "m", TEMPLATE)
+        await asyncio.sleep(0.1)
+        name = await caches.get(object(), "m", TEMPLATE)
+        await asyncio.gather(*caches._tasks)
+        return caches, name
+
+    caches, name = asyncio.run(scenario())
+    assert name == "cachedContents/1"
+    assert fake.updated == [("cachedContents/1", {"ttl": "0s"})]
+    assert caches.stats()["refreshed"] == 1
+
+
+def test_failed_extension_drops_the_entry(api):
+    fake = api(update_error=FakeAPIError(404, "not found"))
+
+    async def scenario():
+        caches = ContextCacheManager(ttl_s=0.2, refresh_s=0.15)
+        await caches.get(object(), "m", TEMPLATE)
+        await asyncio.sleep(0.1)
+        await caches.get(object(), "m", TEMPLATE)
+        await asyncio.gather(*caches._tasks)
+        return caches, await caches.get(object(), "m", TEMPLATE)
+
+    caches, name = asyncio.run(scenario())
+    assert name == "cachedContents/2"
+    assert len(fake.created) == 2
+    assert caches.stats()["failures"] == 1
+
+
+def test_shutdown_cancels_pending_refreshes(api, monkeypatch):
+    api(update_delay=10.0)
+
+    async def scenario():
+        caches = ContextCacheManager(ttl_s=0.2, refresh_s=0.15)
+        monkeypatch.setattr(registry, "_caches", caches)
+        await caches.get(object(), "m", TEMPLATE)
+        await asyncio.sleep(0.1)
+        await caches.get(object(), "m", TEMPLATE)
+        tasks = list(caches._tasks)
+        await close_context_caches(None)
+        return caches, tasks
+
+    caches, tasks = asyncio.run(scenario())
+    assert len(tasks) == 1 and tasks[0].cancelled()
+    assert caches._tasks == set()
+    assert caches.stats()["refreshed"] == 0
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+import pytest
+
+from services.genai_limits import GenAILimiter
+from services.rate_limit import CircuitBreaker, CircuitOpenError, TokenBucket, backoff_delay
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} upstream error")
+        self.code = code
+
+
+def test_token_bucket_allows_burst_then_paces():
+    async def scenario():
+        bucket = TokenBucket(rate=50, burst=3)
+        waits = [await bucket.acquire() for _ in range(5)]
+        return waits
+
+    waits = asyncio.run(scenario())
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert all(w > 0 for w in waits[3:])
+    assert sum(waits) == pytest.approx(2 / 50, abs=0.01)
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, 0.5, 4.0) <= min(4.0, 0.5 * 2 ** attempt)
+
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker("m", threshold=2, reset_s=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.rejected == 1
+
+
+def test_breaker_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker("m", threshold=1, reset_s=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker("m", threshold=5, reset_s=0.01)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def _limiter(**overrides):
+    options = dict(rate_per_s=1000, burst=1000, max_retries=3, backoff_base_s=0.001, backoff_max_s=0.001)
+    options.update(overrides)
+    return GenAILimiter(**options)
+
+
+def test_limiter_retries_transient_errors():
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise UpstreamError(503)
+        return "ok"
+
+    limiter = _limiter()
+    assert asyncio.run(limiter.run("m", flaky)) == "ok"
+    assert len(attempts) == 3
+    assert limiter.stats()["models"]["m"]["retries"] == 2
+    assert limiter._state("m").breaker.failures == 0
+
+
+def test_limiter_does_not_retry_client_errors():
+    attempts = []
+
+    async def bad_request():
+        attempts.append(1)
+        raise UpstreamError(400)
+
+    limiter = _limiter()
+    with pytest.raises(UpstreamError):
+        asyncio.run(limiter.run("m", bad_request))
+    assert len(attempts) == 1
+    assert limiter._state("m").breaker.failures == 0
+
+
+def test_limiter_counts_one_breaker_failure_per_call():
+    attempts = []
+
+    async def down():
+        attempts.append(1)
+        raise UpstreamError(503)
+
+    async def scenario(limiter):
+        for _ in range(2):
+            with pytest.raises(UpstreamError):
+                await limiter.run("m", down)
+
+    limiter = _limiter(breaker_threshold=2, breaker_reset_s=60)
+    asyncio.run(scenario(limiter))
+    # Two calls of four attempts each open a breaker with threshold 2.
+    assert len(attempts) == 8
+    assert limiter._state("m").breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(limiter.run("m", down))
+    assert len(attempts) == 8
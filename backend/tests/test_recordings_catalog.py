@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from services.recordings_catalog import InvalidCursor, RecordingCatalog, encode_cursor
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = RecordingCatalog(str(tmp_path / "catalog.sqlite3"))
+    # Sizes repeat so pages have to break ties on filename.
+    for i in range(25):
+        catalog.upsert({
+            "filename": f"rec_{i:02d}.wav",
+            "size": 1000 * (i % 4),
+            "duration_s": None if i % 5 == 0 else float(i),
+            "created_at": 1_700_000_000 + i,
+            "mtime": 1_700_000_000 + i,
+            "transcript_status": "done" if i % 3 == 0 else "none",
+        })
+    yield catalog
+    catalog.close()
+
+
+def walk(catalog, **query):
+    pages, cursor = [], None
+    while True:
+        rows, total, cursor = catalog.page(cursor=cursor, **query)
+        pages.append([row["filename"] for row in rows])
+        if cursor is None:
+            return pages, total
+
+
+@pytest.mark.parametrize("sort", ["created_at", "size", "duration", "filename"])
+@pytest.mark.parametrize("descending", [True, False])
+def test_cursor_pages_cover_every_row_once_in_order(catalog, sort, descending):
+    pages, total = walk(catalog, limit=7, sort=sort, descending=descending)
+    names = [name for page in pages for name in page]
+    assert total == 25
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert len(set(names)) == 25
+
+    def key(name):
+        row = catalog.get(name)
+        value = {"created_at": row["created_at"], "size": row["size"], "filename": name,
+                 "duration": -1 if row["duration_s"] is None else row["duration_s"]}[sort]
+        return value, name
+
+    assert names == sorted(names, key=key, reverse=descending)
+
+
+def test_filters_apply_to_pages_and_total(catalog):
+    pages, total = walk(catalog, limit=3, transcript_status="done", min_duration_s=4.0)
+    names = [name for page in pages for name in page]
+    assert names == ["rec_24.wav", "rec_21.wav", "rec_18.wav", "rec_12.wav", "rec_09.wav", "rec_06.wav"]
+    assert total == 6
+    rows, total, cursor = catalog.page(prefix="rec_1", sort="filename", descending=False)
+    assert [row["filename"] for row in rows] == [f"rec_{i}.wav" for i in range(10, 20)]
+    assert cursor is None
+    assert "sort_value" not in rows[0]
+
+
+def test_cursor_for_another_sort_or_malformed_is_rejected(catalog):
+    _, _, cursor = catalog.page(limit=5, sort="size")
+    with pytest.raises(InvalidCursor):
+        catalog.page(limit=5, sort="created_at", cursor=cursor)
+    with pytest.raises(InvalidCursor):
+        catalog.page(cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        catalog.page(sort="mtime")
+    # A cursor past the end yields an empty last page.
+    rows, _, cursor = catalog.page(sort="filename", cursor=encode_cursor("filename", None, "rec_00.wav"))
+    assert rows == [] and cursor is None
+
+
+def test_reconcile_adds_changed_files_and_drops_missing_ones(catalog, tmp_path):
+    directory = tmp_path / "recordings"
+    directory.mkdir()
+    (directory / "rec_00.wav").write_bytes(b"x" * 10)
+    (directory / "new.mp3").write_bytes(b"y" * 20)
+    (directory / "notes.txt").write_text("ignored")
+    added, removed = catalog.reconcile(str(directory))
+    assert (added, removed) == (2, 24)
+    assert catalog.get("rec_00.wav")["size"] == 10
+    assert catalog.get("rec_00.wav")["transcript_status"] == "none"
+    assert catalog.get("new.mp3")["sha256"] is None
+    assert catalog.reconcile(str(directory)) == (0, 0)
+    os.remove(directory / "new.mp3")
+    assert catalog.reconcile(str(directory)) == (0, 1)
@@ -0,0 +1,89 @@
+import asyncio
+
+from services.voice_to_text_service import _merge_segment_analyses, _offset_timestamp
+
+
+def analysis(timeline, doctor="", patient="", confidence=0.9):
+    return {"timeline": timeline, "doctor_parts": doctor, "patient_parts": patient, "confidence": confidence}
+
+
+def merge(segments, offset_s=0.0):
+    """`segments`: list of (segment dict, analysis dict) in any order."""
+
+    async def run():
+        pending = {}
+        for segment, result in segments:
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(result)
+            pending[segment["index"]] = (segment, future)
+        return await _merge_segment_analyses(pending, offset_s=offset_s)
+
+    return asyncio.run(run())
+
+
+def test_offset_timestamp_formats():
+    assert _offset_timestamp("00:05", 58.5) == "01:04"
+    assert _offset_timestamp("1:00:00", 30) == "1:00:30"
+    assert _offset_timestamp(None, 125) == "02:05"
+    assert _offset_timestamp("soon", 10) == "soon"
+
+
+def test_timestamps_shift_by_segment_start_and_trimmed_lead_in():
+    first = ({"index": 0, "start": 0.0, "text": "how are you"}, analysis(
+        [{"speaker": "doctor", "text": "How are you?", "timestamp": "00:02"}], doctor="How are you?"
+    ))
+    second = ({"index": 1, "start": 58.5, "text": "I have a cough"}, analysis(
+        [{"speaker": "patient", "text": "I have a cough.", "timestamp": "00:03"}], patient="I have a cough."
+    ))
+    merged = merge([second, first], offset_s=4.0)
+    assert [(t["speaker"], t["timestamp"]) for t in merged["timeline"]] == [("doctor", "00:06"), ("patient", "01:06")]
+    assert merged["doctor_parts"] == "How are you?"
+    assert merged["patient_parts"] == "I have a cough."
+
+
+def test_overlap_words_are_not_repeated():
+    first = ({"index": 0, "start": 0.0, "text": "x"}, analysis(
+        [{"speaker": "patient", "text": "it hurts when I swallow", "timestamp": "00:10"}], patient="it hurts when I swallow"
+    ))
+    second = ({"index": 1, "start": 60.0, "text": "x"}, analysis(
+        [
+            {"speaker": "patient", "text": "when I swallow", "timestamp": "00:00"},
+            {"speaker": "doctor", "text": "Since when?", "timestamp": "00:02"},
+        ],
+        doctor="Since when?",
+        patient="when I swallow",
+    ))
+    merged = merge([first, second])
+    assert [t["text"] for t in merged["timeline"]] == ["it hurts when I swallow", "Since when?"]
+    assert merged["patient_parts"] == "it hurts when I swallow"
+
+
+def test_swapped_labels_in_a_segment_are_flipped_back():
+    first = ({"index": 0, "start": 0.0, "text": "x"}, analysis(
+        [{"speaker": "doctor", "text": "take this twice a day", "timestamp": "00:50"}], doctor="take this twice a day"
+    ))
+    second = ({"index": 1, "start": 60.0, "text": "x"}, analysis(
+        [
+            {"speaker": "patient", "text": "twice a day with food", "timestamp": "00:00"},
+            {"speaker": "doctor", "text": "Okay, thank you.", "timestamp": "00:04"},
+        ],
+        doctor="Okay, thank you.",
+        patient="twice a day with food",
+    ))
+    merged = merge([first, second])
+    assert [(t["speaker"], t["text"]) for t in merged["timeline"]] == [
+        ("doctor", "take this twice a day"),
+        ("doctor", "with food"),
+        ("patient", "Okay, thank you."),
+    ]
+    assert merged["patient_parts"] == "Okay, thank you."
+
+
+def test_failed_segments_are_skipped_and_confidence_is_length_weighted():
+    ok_short = ({"index": 0, "start": 0.0, "text": "a" * 10}, analysis([], confidence=1.0))
+    ok_long = ({"index": 1, "start": 60.0, "text": "a" * 30}, analysis([], confidence=0.5))
+    failed = ({"index": 2, "start": 120.0, "text": "a" * 100}, {"error": "quota"})
+    merged = merge([ok_short, ok_long, failed])
+    assert merged["confidence"] == round((1.0 * 10 + 0.5 * 30) / 40, 3)
+    assert "error" not in merged
+    assert merge([failed])["error"] == "Speaker analysis failed for all segments"
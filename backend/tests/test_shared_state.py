@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+from services import shared_state
+from services.shared_state import SessionRouter, SQLiteSharedState, create_shared_state
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "state" / "shared.sqlite3")
+
+
+def test_get_set_and_json_round_trip(path):
+    async def scenario():
+        state = SQLiteSharedState(path)
+        await state.set("raw", b"\x00bytes")
+        await state.set_json("doc", {"text": "Ärztin", "n": [1, 2]})
+        result = await state.get("raw"), await state.get_json("doc"), await state.get("missing")
+        await state.delete("raw")
+        result += (await state.get("raw"),)
+        await state.close()
+        return result
+
+    assert asyncio.run(scenario()) == (b"\x00bytes", {"text": "Ärztin", "n": [1, 2]}, None, None)
+
+
+def test_add_is_set_if_absent_across_connections(path):
+    async def scenario():
+        first, second = SQLiteSharedState(path), SQLiteSharedState(path)
+        results = await asyncio.gather(*(
+            state.add("lease", name.encode(), ttl_s=30) for state, name in ((first, "a"), (second, "b")) * 3
+        ))
+        owner = await first.get("lease")
+        await first.close()
+        await second.close()
+        return results, owner
+
+    results, owner = asyncio.run(scenario())
+    assert results.count(True) == 1
+    assert owner == [b"a", b"b"][results.index(True) % 2]
+
+
+def test_entries_expire_and_expired_keys_can_be_added_again(path):
+    async def scenario():
+        state = SQLiteSharedState(path)
+        await state.set("short", b"1", ttl_s=0.05)
+        await state.set("forever", b"2")
+        assert await state.add("lease", b"old", ttl_s=0.05)
+        assert not await state.add("lease", b"new", ttl_s=0.05)
+        await asyncio.sleep(0.06)
+        result = (
+            await state.get("short"),
+            await state.get("forever"),
+            await state.add("lease", b"new"),
+            await state.get("lease"),
+        )
+        await state.close()
+        return result
+
+    assert asyncio.run(scenario()) == (None, b"2", True, b"new")
+
+
+def test_writes_purge_expired_rows(path, monkeypatch):
+    monkeypatch.setattr(shared_state, "PURGE_INTERVAL_S", 0.0)
+
+    async def scenario():
+        state = SQLiteSharedState(path)
+        await state.set("stale", b"x", ttl_s=0.01)
+        await asyncio.sleep(0.02)
+        await state.set("fresh", b"y")
+        rows = state._conn.execute("SELECT key FROM kv").fetchall()
+        await state.close()
+        return rows
+
+    assert asyncio.run(scenario()) == [("fresh",)]
+
+
+def test_backend_is_chosen_from_the_url(path):
+    assert create_shared_state("") is None
+    state = create_shared_state(f"sqlite:///{path}")
+    assert isinstance(state, SQLiteSharedState) and state.path == path
+    asyncio.run(state.close())
+    with pytest.raises(ValueError):
+        create_shared_state("memcached://localhost")
+
+
+class BrokenState:
+    async def set(self, *args):
+        raise ConnectionError("down")
+
+    async def get(self, *args):
+        raise ConnectionError("down")
+
+    async def delete(self, *args):
+        raise ConnectionError("down")
+
+
+def test_session_router_records_owner_and_expires(path):
+    async def scenario():
+        state = SQLiteSharedState(path)
+        router = SessionRouter(state, ttl_s=0.05)
+        await router.register("s1")
+        await router.register("s2")
+        owner = await router.lookup("s1")
+        await router.unregister("s1")
+        gone = await router.lookup("s1")
+        await asyncio.sleep(0.06)
+        expired = await router.lookup("s2")
+        await state.close()
+        return owner, gone, expired
+
+    assert asyncio.run(scenario()) == (shared_state.WORKER_ID, None, None)
+
+
+def test_session_router_is_advisory():
+    async def scenario():
+        broken = SessionRouter(BrokenState())
+        await broken.register("s1")
+        await broken.unregister("s1")
+        return await broken.lookup("s1"), await SessionRouter(None).lookup("s1")
+
+    assert asyncio.run(scenario()) == (None, None)
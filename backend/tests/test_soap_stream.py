@@ -0,0 +1,57 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from services.voice_to_text_service import stream_soap_note
+
+
+class ScriptedStreamClient:
+    """Minimal GenAI client whose streamed generation yields fixed text chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.aio = SimpleNamespace(models=SimpleNamespace(generate_content_stream=self._stream))
+
+    async def _stream(self, **kwargs):
+        async def chunks():
+            for text in self.chunks:
+                yield SimpleNamespace(text=text)
+        return chunks()
+
+
+@pytest.fixture(autouse=True)
+def no_caches(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "0")
+    monkeypatch.setenv("PROMPT_CONTEXT_CACHE", "0")
+
+
+def run_stream(chunks):
+    async def collect():
+        client = ScriptedStreamClient(chunks)
+        data = {"transcript": "Doctor: any cough? Patient: yes, for a week."}
+        return [event async for event in stream_soap_note(data, genai_client=client, model="test-model")]
+
+    return asyncio.run(collect())
+
+
+def test_sections_stream_before_done():
+    events = run_stream(['{"subjective": ["cough"], ', '"assessment": ["bronchitis"], "plan": ["rest"]}'])
+    sections = [(e["name"], e["value"]) for e in events if e["type"] == "section"]
+    assert sections[:3] == [("subjective", ["cough"]), ("assessment", ["bronchitis"]), ("plan", ["rest"])]
+    done = events[-1]
+    assert done["type"] == "done"
+    assert done["soap_json"]["plan"] == ["rest"]
+    # Fields the model left out arrive with their schema defaults, once each.
+    assert sorted(name for name, _ in sections) == sorted(done["soap_json"])
+
+
+def test_repaired_output_still_emits_every_section():
+    # Truncated mid-array: "plan" never completes in the stream and only the repair recovers it.
+    events = run_stream(['{"subjective": ["cough"], "plan": ["fluids", "re'])
+    sent = {e["name"]: e["value"] for e in events if e["type"] == "section"}
+    done = events[-1]
+    assert done["type"] == "done"
+    assert sent["plan"] == ["fluids", "re"]
+    assert set(sent) == set(done["soap_json"])
+    assert sum(1 for e in events if e["type"] == "section" and e["name"] == "subjective") == 1
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from services.stream_sessions import Outbox, SessionRejected, StreamConnection, StreamRegistry
+
+
+def partial(seq, text):
+    return {"type": "partial", "seq": seq, "interim": text}
+
+
+def final(seq, text):
+    return {"type": "final", "seq": seq, "final": text}
+
+
+def drain(outbox):
+    async def collect():
+        messages = []
+        while True:
+            message = await outbox.get(timeout=0.1)
+            if message is None:
+                return messages
+            messages.append(message)
+
+    outbox.put_nowait(None)
+    return asyncio.run(collect())
+
+
+def test_merge_policy_keeps_only_newest_partial_per_segment():
+    outbox = Outbox(capacity=8, partial_policy="merge")
+    outbox.put_nowait(partial(0, "he"))
+    outbox.put_nowait(partial(0, "hello"))
+    outbox.put_nowait(partial(1, "wor"))
+    assert drain(outbox) == [partial(0, "hello"), partial(1, "wor")]
+    assert outbox.merged == 1
+
+
+def test_final_removes_stale_partials():
+    outbox = Outbox(capacity=8, partial_policy="merge")
+    outbox.put_nowait(partial(0, "he"))
+    outbox.put_nowait(partial(1, "wor"))
+    outbox.put_nowait(final(0, "hello"))
+    assert drain(outbox) == [partial(1, "wor"), final(0, "hello")]
+    assert outbox.dropped == 1
+
+
+def test_drop_policy_sheds_partials_past_half_capacity():
+    outbox = Outbox(capacity=4, partial_policy="drop")
+    for seq in range(4):
+        outbox.put_nowait(partial(seq, "x"))
+    assert len(outbox) == 2
+    assert outbox.dropped == 2
+    outbox.put_nowait(final(5, "done"))
+    assert not outbox.overflowed
+
+
+def test_full_outbox_overflows_on_final_instead_of_dropping_it():
+    outbox = Outbox(capacity=2, partial_policy="drop")
+    outbox.put_nowait(final(0, "a"))
+    outbox.put_nowait(final(1, "b"))
+    outbox.put_nowait(final(2, "c"))
+    assert outbox.overflowed
+    assert asyncio.run(outbox.get(timeout=0.1)) is None
+
+
+def test_get_times_out_when_idle():
+    outbox = Outbox(capacity=2)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(outbox.get(timeout=0.01))
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        Outbox(partial_policy="keep")
+
+
+class FakeWebSocket:
+    def __init__(self, send_delay_s=0.0):
+        self.send_delay_s = send_delay_s
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, text):
+        await asyncio.sleep(self.send_delay_s)
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        self.close_code = code
+
+
+def test_connection_closes_slow_consumer_with_1013():
+    async def scenario():
+        ws = FakeWebSocket(send_delay_s=1.0)
+        conn = StreamConnection("s1", ws, send_timeout_s=0.01, heartbeat_s=0)
+        conn.start()
+        conn.send(final(0, "a"))
+        await conn.finish()
+        return ws, conn
+
+    ws, conn = asyncio.run(scenario())
+    assert conn.close_reason == "send_timeout"
+    assert ws.close_code == 1013
+
+
+def test_registry_limits_sessions_and_rejects_duplicates():
+    registry = StreamRegistry(max_sessions=1)
+    first = StreamConnection("a", FakeWebSocket())
+    registry.register(first)
+    with pytest.raises(SessionRejected):
+        registry.register(StreamConnection("a", FakeWebSocket()))
+    with pytest.raises(SessionRejected):
+        registry.register(StreamConnection("b", FakeWebSocket()))
+    registry.unregister(first, "done")
+    registry.unregister(first, "done")
+    stats = registry.stats()
+    assert stats["active"] == 0
+    assert stats["rejected"] == 2
+    assert stats["closed"] == {"done": 1}
@@ -0,0 +1,72 @@
+import asyncio
+
+import numpy as np
+
+from services.streaming_service import EnergyVAD, FakeSTTBackend, StreamingSession
+
+SR = 16000
+
+
+def tone(seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SR), dtype=np.float32) / SR
+    return (amplitude * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * SR), dtype=np.float32)
+
+
+async def run_session(audio, chunk_bytes, backend, **options):
+    session = StreamingSession(backend, sample_rate=SR, partial_interval_s=0, **options)
+    data = audio.tobytes()
+    for i in range(0, len(data), chunk_bytes):
+        session.feed(data[i:i + chunk_bytes])
+        await asyncio.sleep(0)
+    await session.close()
+    messages = []
+    while True:
+        message = await session.messages.get()
+        if message is None:
+            return session, messages
+        messages.append(message)
+
+
+def test_speech_segments_become_ordered_finals():
+    audio = np.concatenate([silence(0.5), tone(1.0), silence(1.0), tone(2.0), silence(1.0)])
+    backend = FakeSTTBackend()
+    # Odd chunk sizes split float32 samples across chunks.
+    session, messages = asyncio.run(run_session(audio, 1027, backend))
+    finals = [m for m in messages if m["type"] == "final"]
+    assert [m["seq"] for m in finals] == [0, 1]
+    assert all(m["final"].startswith("[speech ") for m in finals)
+    assert finals[0]["start"] < 0.5 < 1.5 < finals[0]["end"] < 2.0
+    assert finals[1]["start"] > finals[0]["end"]
+    assert session.stats["samples"] == len(audio)
+    assert backend.calls == 2
+
+
+def test_finals_are_released_in_order_when_backends_finish_out_of_order():
+    class SlowFirst(FakeSTTBackend):
+        async def transcribe(self, samples, sample_rate):
+            self.calls += 1
+            call = self.calls
+            await asyncio.sleep(0.05 if call == 1 else 0)
+            return f"segment {call}"
+
+    audio = np.concatenate([tone(0.5), silence(1.0), tone(0.5), silence(1.0)])
+    _, messages = asyncio.run(run_session(audio, 4096, SlowFirst()))
+    assert [(m["seq"], m["final"]) for m in messages if m["type"] == "final"] == [(0, "segment 1"), (1, "segment 2")]
+
+
+def test_silence_produces_no_segments():
+    backend = FakeSTTBackend()
+    _, messages = asyncio.run(run_session(silence(3.0), 4096, backend))
+    assert messages == []
+    assert backend.calls == 0
+
+
+def test_vad_cuts_long_speech_at_max_segment():
+    vad = EnergyVAD(SR, max_segment_s=1.0)
+    segments = vad.process(tone(2.5))
+    assert len(segments) == 2
+    assert all(end - start <= SR + vad.frame_len for start, end in segments)
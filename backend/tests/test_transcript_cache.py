@@ -0,0 +1,84 @@
+import asyncio
+import os
+
+from services.shared_state import SQLiteSharedState
+from services.transcript_cache import TranscriptCache, hash_file, make_key
+
+
+def test_key_depends_on_audio_and_models():
+    key = make_key("abc", "stt-1", "llm-1")
+    assert key == make_key("abc", "stt-1", "llm-1")
+    assert len({key, make_key("abd", "stt-1", "llm-1"), make_key("abc", "stt-2", "llm-1"), make_key("abc", "stt-1", None)}) == 4
+
+
+def test_hash_file_matches_content(tmp_path):
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    first.write_bytes(b"x" * 3_000_000)
+    second.write_bytes(b"x" * 3_000_000)
+    assert hash_file(str(first)) == hash_file(str(second))
+    second.write_bytes(b"y")
+    assert hash_file(str(first)) != hash_file(str(second))
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = TranscriptCache(max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+    assert cache.stats()["hits"] == 3
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_survives_a_new_instance(tmp_path):
+    TranscriptCache(max_entries=1, disk_dir=str(tmp_path)).put("key1", {"transcript": "hello"})
+    cache = TranscriptCache(max_entries=1, disk_dir=str(tmp_path))
+    assert cache.get("key1") == {"transcript": "hello"}
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_oldest_entries_over_budget(tmp_path):
+    entry = {"transcript": "x" * 1000}
+    cache = TranscriptCache(max_entries=1, disk_dir=str(tmp_path), disk_max_bytes=2500)
+    for i, key in enumerate(("k1", "k2", "k3")):
+        cache.put(key, entry)
+        path = cache._disk_path(key)
+        os.utime(path, (1000 + i, 1000 + i))
+    cache.put("k4", entry)
+    remaining = sorted(name for _, _, names in os.walk(tmp_path) for name in names)
+    assert remaining == ["k3.json", "k4.json"]
+    assert cache.stats()["disk_bytes"] <= 2500
+
+
+def test_unreadable_disk_entry_is_dropped(tmp_path):
+    cache = TranscriptCache(max_entries=1, disk_dir=str(tmp_path))
+    cache.put("bad", {"ok": True})
+    with open(cache._disk_path("bad"), "w") as f:
+        f.write("{not json")
+    cache._memory.clear()
+    assert cache.get("bad") is None
+    assert not os.path.exists(cache._disk_path("bad"))
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    async def scenario():
+        state = SQLiteSharedState(str(tmp_path / "shared.sqlite3"))
+        writer = TranscriptCache(shared=state)
+        reader = TranscriptCache(shared=state)
+        await writer.aput("key1", {"transcript": "shared"})
+        found = await reader.aget("key1")
+        # Served from memory on the second lookup.
+        again = await reader.aget("key1")
+        missing = await reader.aget("nope")
+        await state.close()
+        return reader.stats(), found, again, missing
+
+    stats, found, again, missing = asyncio.run(scenario())
+    assert found == again == {"transcript": "shared"}
+    assert missing is None
+    assert stats["shared_hits"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
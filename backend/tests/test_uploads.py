@@ -0,0 +1,76 @@
+import asyncio
+import hashlib
+import io
+import os
+import wave
+
+import numpy as np
+import pytest
+
+from services.uploads import UploadTooLarge, WavDurationProbe, save_upload, temp_upload_path
+
+
+class FakeUpload:
+    """Just the `read(n)` of a FastAPI UploadFile."""
+
+    def __init__(self, data: bytes):
+        self._data = io.BytesIO(data)
+        self.reads = 0
+
+    async def read(self, size: int) -> bytes:
+        self.reads += 1
+        return self._data.read(size)
+
+
+def wav_bytes(seconds: float, rate: int = 16000) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(np.zeros(int(seconds * rate), dtype=np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def test_streams_to_disk_in_blocks_with_hash_and_duration(tmp_path):
+    data = wav_bytes(2.5)
+    dest = str(tmp_path / "rec.wav")
+    upload = FakeUpload(data)
+    saved = asyncio.run(save_upload(upload, dest, chunk_size=4096))
+    assert saved.size == len(data)
+    assert saved.sha256 == hashlib.sha256(data).hexdigest()
+    assert saved.duration_seconds == 2.5
+    assert upload.reads == len(data) // 4096 + 2
+    with open(dest, "rb") as f:
+        assert f.read() == data
+
+
+def test_oversized_upload_is_rejected_and_removed(tmp_path):
+    dest = str(tmp_path / "big.wav")
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(save_upload(FakeUpload(b"x" * 10_000), dest, max_bytes=5000, chunk_size=1024))
+    assert not os.path.exists(dest)
+
+
+def test_upload_exactly_at_the_limit_is_accepted(tmp_path):
+    saved = asyncio.run(save_upload(FakeUpload(b"x" * 5000), str(tmp_path / "ok.bin"), max_bytes=5000))
+    assert saved.size == 5000
+    assert saved.duration_seconds is None
+
+
+def test_wav_probe_uses_actual_size_for_placeholder_headers():
+    data = bytearray(wav_bytes(1.0))
+    data[40:44] = (0xFFFFFFFF).to_bytes(4, "little")  # streaming encoders leave the size unset
+    probe = WavDurationProbe()
+    for i in range(0, len(data), 7):
+        probe.feed(bytes(data[i:i + 7]))
+    assert probe.duration(len(data)) == 1.0
+
+
+def test_temp_paths_are_unique_and_keep_only_the_extension():
+    first = temp_upload_path("temp_conversation", "../../etc/recording.webm")
+    second = temp_upload_path("temp_conversation", "../../etc/recording.webm")
+    assert first != second
+    assert first.startswith("temp_conversation_") and first.endswith(".webm")
+    assert "/" not in first and "recording" not in first
+    assert temp_upload_path("temp", None).endswith(".wav")